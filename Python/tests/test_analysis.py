@@ -0,0 +1,65 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import wrictools as wric
+
+# Checks that the energy expenditure of the aggregations is weighted by the minutes of each row: the example data
+# (1-minute rows) gives the same kcal as the same data sampled every 10 seconds.
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+EE = "Energy Expenditure (kcal/min)"
+
+def ten_seconds(df):
+    """
+    Every 1-minute row repeated as six 10-second rows with the same values (and protocol).
+    """
+    fine = df.loc[df.index.repeat(6)].reset_index(drop=True)
+    fine["datetime"] += pd.to_timedelta(np.tile(np.arange(6) * 10, len(df)), unit="s")
+    return fine
+
+@pytest.fixture(scope="module")
+def example():
+    # without the notes, the rows are on full minutes (no drift), so the 10-second rows of a minute stay in its bin
+    _, _, df_room1, _ = wric.preprocess_WRIC_file(os.path.join(EXAMPLE_PATH, "data.txt"), save_csv=False, qc=None)
+    _, protocol_lists = wric.protocol_events(os.path.join(EXAMPLE_PATH, "note.txt"))
+    df_room1 = wric.update_protocol(df_room1, protocol_lists[1])
+    return df_room1, ten_seconds(df_room1)
+
+def test_row_minutes():
+    datetimes = pd.to_datetime(["2023-11-13 12:00:00", "2023-11-13 12:00:10", "2023-11-13 12:00:30", None])
+    np.testing.assert_allclose(wric.row_minutes(datetimes), [1 / 6, 1 / 6, 1 / 3, np.nan])
+    np.testing.assert_allclose(wric.row_minutes(datetimes[:1]), [1.0])
+
+def test_resampled_energy_does_not_depend_on_the_sampling(example):
+    minute, fine = example
+    for by in ["clock", "hour_of_day"]:
+        expected, result = (wric.resample_data(df, "60min", by=by, columns=[EE, "VO2"]).set_index(["bin", "parameter"]) for df in (minute, fine))
+        pd.testing.assert_series_equal(result["value"], expected["value"])
+        pd.testing.assert_series_equal(result["minutes"], expected["minutes"])
+        assert (result["n_rows"] == 6 * expected["n_rows"]).all()
+
+def test_protocol_summary_does_not_depend_on_the_sampling(example, tmp_path):
+    minute, fine = example
+    for code, df in [("minute", minute), ("fine", fine)]:
+        df.to_csv(tmp_path / f"{code}_WRIC_data.csv", index=False)
+    summary = wric.summarize_protocols(str(tmp_path))
+    assert summary["protocol"].nunique() > 1
+    expected, result = (summary[summary["code"] == code].reset_index(drop=True) for code in ("minute", "fine"))
+    columns = ["protocol", "occurrence", "minutes", "energy_expenditure_kcal", "VO2", "RER"]
+    pd.testing.assert_frame_equal(result[columns], expected[columns])
+    assert expected["minutes"].sum() == len(minute)
+
+def test_store_summary_matches_the_file_summary(example, tmp_path):
+    minute, fine = example
+    fine.to_csv(tmp_path / "fine_WRIC_data.csv", index=False)
+    expected = wric.summarize_protocols(str(tmp_path))
+    with wric.StudyStore(str(tmp_path / "store.sqlite")) as store:
+        # the data in two chunks, as saved by preprocess_WRIC_file_chunked()
+        store.write(fine.iloc[:1000], "fine", "data", first_row=0)
+        store.write(fine.iloc[1000:], "fine", "data", first_row=1000)
+        store.write(wric.protocol_segments(fine, 1), "fine", "segments")
+        result = store.summarize_segments(columns=[EE, "VO2"])
+    np.testing.assert_allclose(result["minutes"], expected["minutes"])
+    np.testing.assert_allclose(result[EE], expected["energy_expenditure_kcal"])
+    np.testing.assert_allclose(result["VO2"], expected["VO2"])
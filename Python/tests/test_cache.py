@@ -0,0 +1,21 @@
+import os
+import pandas as pd
+import wrictools as wric
+
+# Checks that a result loaded from the cache is saved again, so that the saved files always match the returned data.
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+
+def test_cache_hit_replaces_the_files_of_other_parameters(tmp_path):
+    filepath = os.path.join(EXAMPLE_PATH, "data.txt")
+    cache_dir, path_to_save = str(tmp_path / "cache"), str(tmp_path / "processed")
+    os.mkdir(path_to_save)
+    saved = os.path.join(path_to_save, "a_WRIC_data.csv")
+    results = {}
+    for method in ["mean", "max", "mean"]:  # the second "mean" is loaded from the cache
+        _, _, df_room1, _ = wric.preprocess_WRIC_file(filepath, code="manual", manual=["a", "b"], path_to_save=path_to_save,
+                                                      method=method, cache_dir=cache_dir, qc=None)
+        results.setdefault(method, df_room1)
+        pd.testing.assert_series_equal(pd.read_csv(saved)["VO2"], df_room1["VO2"].reset_index(drop=True), check_exact=False)
+    assert not results["mean"]["VO2"].equals(results["max"]["VO2"])
+    pd.testing.assert_frame_equal(df_room1, results["mean"])
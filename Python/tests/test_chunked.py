@@ -0,0 +1,30 @@
+import os
+import pytest
+import wrictools as wric
+
+# Checks that the chunked processing within a small memory budget saves exactly the files of preprocess_WRIC_file().
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+NOTE = os.path.join(EXAMPLE_PATH, "note.txt")
+
+@pytest.mark.parametrize("kwargs", [
+    dict(),
+    dict(notefilepath=NOTE),
+    dict(notefilepath=NOTE, combine=False),
+    dict(notefilepath=NOTE, method="median", start="2023-11-13 12:00:00", end="2023-11-14 08:00:00"),
+], ids=["no_notes", "notes", "separate", "median_cut"])
+def test_chunked_matches_whole_file(tmp_path, kwargs):
+    filepath = os.path.join(EXAMPLE_PATH, "data.txt")
+    whole, chunked = tmp_path / "whole", tmp_path / "chunked"
+    whole.mkdir()
+    chunked.mkdir()
+    # the chunked processing does not run the quality control of the sensors, which needs the whole recording
+    _, _, df_room1, df_room2 = wric.preprocess_WRIC_file(filepath, code="manual", manual=["a", "b"], path_to_save=str(whole), qc=None, **kwargs)
+    # 0.4 MB gives chunks of 100 rows, so the example data is processed in 27 chunks
+    result = wric.preprocess_WRIC_file_chunked(filepath, code="manual", manual=["a", "b"], path_to_save=str(chunked), memory_budget_mb=0.4, **kwargs)
+
+    assert result[2:] == (len(df_room1), len(df_room2))
+    files = sorted(os.listdir(whole))
+    assert files == sorted(os.listdir(chunked))
+    for name in files:
+        assert (whole / name).read_bytes() == (chunked / name).read_bytes(), name
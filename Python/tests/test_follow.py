@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import wrictools as wric
+from wrictools.io import find_data_start
+
+# Checks that following a WRIC file while rows are appended yields each new row once, labelled and combined as by
+# preprocess_WRIC_file() on the final file, with running totals that match the totals of the final file.
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+DATA_PATH = os.path.join(EXAMPLE_PATH, "data.txt")
+NOTE_PATH = os.path.join(EXAMPLE_PATH, "note.txt")
+EE = "Energy Expenditure (kcal/min)"
+
+def append(filepath, content):
+    with open(filepath, "ab") as file:
+        file.write(content)
+
+@pytest.mark.parametrize("combine", [True, False])
+def test_increments_and_totals_match_preprocess(tmp_path, combine):
+    with open(DATA_PATH, "rb") as file:
+        lines = file.read().splitlines(keepends=True)
+    # the column names are followed by an empty line
+    header_end = find_data_start([line.decode("latin-1") for line in lines]) + 2
+    header, rows = b"".join(lines[:header_end]), lines[header_end:]
+    filepath = str(tmp_path / "Results_1m_0101_202311131110.txt")
+    append(filepath, header)
+
+    follow = wric.follow_WRIC_file(filepath, NOTE_PATH, combine=combine, poll_interval=0, timeout=0)
+    increments = {1: [], 2: []}
+    # steps of different sizes; the last row of a step is written in two parts, so a line that is still written is not read
+    steps = [1, 2, 60, 700, 1, 1837]
+    assert sum(steps) == len(rows)
+    position = 0
+    for step in steps:
+        append(filepath, b"".join(rows[position:position + step - 1]) + rows[position + step - 1][:20])
+        if step > 1:
+            df_room1, df_room2, _ = next(follow)
+            assert len(df_room1) == len(df_room2) == step - 1
+            increments[1].append(df_room1)
+            increments[2].append(df_room2)
+        append(filepath, rows[position + step - 1][20:])
+        df_room1, df_room2, totals = next(follow)
+        assert len(df_room1) == len(df_room2) == 1
+        increments[1].append(df_room1)
+        increments[2].append(df_room2)
+        position += step
+        assert (totals["rows"] == position).all()
+    with pytest.raises(StopIteration):
+        next(follow)
+
+    # the whole recording, not cut to the stay in the chamber
+    _, _, df_room1, df_room2 = wric.preprocess_WRIC_file(filepath, notefilepath=NOTE_PATH, combine=combine, save_csv=False,
+                                                         start="2000-01-01", end="2100-01-01")
+    for room, expected in [(1, df_room1), (2, df_room2)]:
+        followed = pd.concat(increments[room], ignore_index=True)
+        pd.testing.assert_frame_equal(followed, expected.reset_index(drop=True), check_dtype=False)
+
+    # totals of the final file: each row counts for the minutes since the previous row
+    _, _, df_room1, df_room2 = wric.preprocess_WRIC_file(filepath, notefilepath=NOTE_PATH, save_csv=False, start="2000-01-01", end="2100-01-01")
+    for room, expected in [(1, df_room1), (2, df_room2)]:
+        minutes = expected["datetime"].diff().dt.total_seconds().to_numpy()[1:] / 60
+        assert totals.loc[room, "rows"] == len(expected)
+        assert totals.loc[room, "energy_expenditure_kcal"] == pytest.approx(np.nansum(expected[EE].to_numpy()[1:] * minutes))
+        assert totals.loc[room, "mean_RER"] == pytest.approx(expected["RER"].mean())
@@ -0,0 +1,14 @@
+import logging
+from wrictools import benchmark
+
+# Guards the peak memory of preprocess_WRIC_file() on a week-long recording, see benchmark.check_memory().
+
+def test_peak_memory_of_a_week_stays_within_twice_the_raw_data(tmp_path):
+    logger = logging.getLogger("wrictools")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        results = benchmark.check_memory(days=7, interval=10, factor=2.0, data_path=str(tmp_path))
+    finally:
+        logger.setLevel(level)
+    assert not results["exceeds"].any(), results.to_string()
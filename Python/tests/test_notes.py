@@ -0,0 +1,154 @@
+import os
+import re
+from datetime import datetime
+import pandas as pd
+import pytest
+import wrictools as wric
+
+# Checks that the vectorized note labelling (label_notes(), detect_start_end()) gives the protocol and the start and
+# end of the loops of the first version of WRIC_preprocessing.py, except for the intended handling of the first note.
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+HEADER = ("OmniCal software by ing.P.F.M.Schoffelen, Dept. of Human Biology, Maastricht University\n"
+          "file identifier is C:\\MI_Room_Calorimeter\\Notes\\example.txt\t\nDate\tTime\tComment\n\n")
+
+def save_dict(dict_protocol, participant, datetime, value):
+    if participant is not None:
+        dict_protocol[participant][datetime] = value
+    else:
+        dict_protocol[1][datetime] = value
+        dict_protocol[2][datetime] = value
+    return dict_protocol
+
+def protocol_events_loop(df_note, keywords_dict):
+    """
+    The row-by-row labelling of extract_note_info() of the first version of WRIC_preprocessing.py, returning the drift
+    and the protocol list of each room (with the drift added) instead of updating the data.
+    """
+    time_pattern = r"([0-9]|0[0-9]|1[0-9]|2[0-3]):[0-5]\d"
+    drift_pattern = r"^\d{2}:\d{2}(:\d{2})?$"
+    dict_protocol = {1:{}, 2:{}}
+    drift = None
+
+    for index, row in df_note.iterrows():
+        participant = None
+        if row["Comment"].startswith("1"):
+            participant = 1
+        elif row["Comment"].startswith("2"):
+            participant = 2
+        for category, (keywords, value) in keywords_dict.items():
+            # Multi-group check: at least one keyword from each sublist must match
+            if isinstance(keywords[0], list):
+                if all(any(word.lower() in row['Comment'].lower() for word in group) for group in keywords):
+                    match = re.search(time_pattern, row['Comment'])
+                    if match:
+                        time_str = match[0]
+                        date_str = row['datetime'].date()
+                        new_datetime = pd.Timestamp(datetime.combine(date_str, datetime.strptime(time_str, "%H:%M").time()))
+                        dict_protocol = save_dict(dict_protocol, participant, new_datetime, value)
+                    else:
+                        dict_protocol = save_dict(dict_protocol, participant, row["datetime"], value)
+            # Single-group check: only one keyword needs to match
+            elif any(word.lower() in row['Comment'].lower() for word in keywords):
+                    match = re.search(time_pattern, row['Comment'])
+                    if match:
+                        time_str = match[0]
+                        date_str = row['datetime'].date()
+                        new_datetime = pd.Timestamp(datetime.combine(date_str, datetime.strptime(time_str, "%H:%M").time()))
+                        dict_protocol = save_dict(dict_protocol, participant, new_datetime, value)
+                    else:
+                        dict_protocol = save_dict(dict_protocol, participant, row["datetime"], value)
+            # no keyword matches, but it is the first entry -> check for time drift parameter
+            elif index == 0:
+                if re.fullmatch(drift_pattern, row['Comment']):
+                    date_str = row['datetime'].date()
+                    new_datetime = pd.Timestamp(datetime.combine(date_str, pd.Timestamp(row["Comment"]).time()))
+                    drift = new_datetime - row["datetime"]
+                break
+
+    protocol_lists = {room: sorted(dict_protocol[room].items()) for room in (1, 2)}
+    if drift != None:
+        protocol_lists = {room: [(ts + drift, value) for ts, value in protocol_list] for room, protocol_list in protocol_lists.items()}
+    return drift, protocol_lists
+
+def detect_start_end_loop(df_note, keywords_dict):
+    """
+    The row-by-row detect_start_end() of the first version of WRIC_preprocessing.py.
+    """
+    start_end_times = {1: (None, None), 2: (None, None)}
+    for index, row in df_note.iterrows():
+        comment = row["Comment"].lower()
+        if comment.startswith("1"):
+            participants = [1]
+        elif comment.startswith("2"):
+            participants = [2]
+        else:
+            participants = [1,2]
+        for participant in participants:
+            if start_end_times[participant][0] is None and any(word in comment for word in keywords_dict['start']):
+                first_two = df_note.head(2)
+                if any(row["datetime"] == time for time in first_two['datetime']):
+                    start_end_times[participant] = (row["datetime"], start_end_times[participant][1])
+            elif start_end_times[participant][1] is None and any(word in comment for word in keywords_dict['end']):
+                last_two = df_note.tail(2)
+                if any(row["datetime"] == time for time in last_two['datetime']):
+                    start_end_times[participant] = (start_end_times[participant][0], row["datetime"])
+    return start_end_times
+
+def write_notes(path, notes):
+    path.write_text(HEADER + "".join(f"{timestamp}\t{comment}\n" for timestamp, comment in notes))
+    return str(path)
+
+def test_example_notes_match_the_loops():
+    notefilepath = os.path.join(EXAMPLE_PATH, "note.txt")
+    df_note = wric.read_note_file(notefilepath)
+    drift, protocol_lists = wric.protocol_events(notefilepath)
+    expected_drift, expected_lists = protocol_events_loop(df_note, wric.KEYWORDS_DICT)
+    assert drift == expected_drift == pd.Timedelta("00:01:21")
+    assert protocol_lists == expected_lists
+    assert wric.detect_start_end(notefilepath) == detect_start_end_loop(df_note, wric.START_END_KEYWORDS)
+
+@pytest.mark.parametrize("first_note", ["deltagere ind i kammer", "1 ind i kammer", "start maaltid", "21:15:29"])
+def test_notes_after_the_first_match_the_loops(tmp_path, first_note):
+    notefilepath = write_notes(tmp_path / "note.txt", [
+        ("11/13/23\t21:14:08", first_note),
+        ("11/13/23\t21:14:22", "2 ind i kammer"),
+        ("11/13/23\t22:39:53", "deltagere i seng"),
+        ("11/14/23\t06:57:11", "1 deltager vaagen 6:45 ca"),
+        ("11/14/23\t08:13:27", "start maaltid"),
+        ("11/14/23\t08:29:23", "faerdig 08:26"),
+        ("11/15/23\t06:35:48", "1 ud"),
+        ("11/15/23\t06:44:36", "2 exit"),
+    ])
+    df_note = wric.read_note_file(notefilepath)
+    drift, protocol_lists = wric.protocol_events(notefilepath)
+    expected_drift, expected_lists = protocol_events_loop(df_note, wric.KEYWORDS_DICT)
+    assert drift == expected_drift
+    later = df_note['datetime'].iloc[1]
+    for room in (1, 2):
+        assert [event for event in protocol_lists[room] if event[0] >= later] == [event for event in expected_lists[room] if event[0] >= later]
+    assert wric.detect_start_end(notefilepath) == detect_start_end_loop(df_note, wric.START_END_KEYWORDS)
+
+def test_first_note_is_matched_against_all_categories(tmp_path):
+    # the loop stopped at the first category that did not match ("sleeping"), so a meal in the first note was lost;
+    # like the R code, the first note is now checked for a drift time and labelled like every other note
+    notefilepath = write_notes(tmp_path / "note.txt", [
+        ("11/13/23\t21:14:08", "ind i kammer, start maaltid"),
+        ("11/13/23\t21:40:00", "faerdig"),
+    ])
+    df_note = wric.read_note_file(notefilepath)
+    start = pd.Timestamp("2023-11-13 21:14:08")
+    drift, protocol_lists = wric.protocol_events(notefilepath)
+    assert drift is None
+    assert protocol_lists[1] == protocol_lists[2] == [(start, 2), (pd.Timestamp("2023-11-13 21:40:00"), 0)]
+    _, expected_lists = protocol_events_loop(df_note, wric.KEYWORDS_DICT)
+    assert expected_lists[1] == [(pd.Timestamp("2023-11-13 21:40:00"), 0)]
+
+    # a first note that is only a time is the drift and no protocol
+    notefilepath = write_notes(tmp_path / "note.txt", [
+        ("11/13/23\t21:14:08", "21:15:29"),
+        ("11/13/23\t21:40:00", "start maaltid"),
+    ])
+    drift, protocol_lists = wric.protocol_events(notefilepath)
+    assert drift == pd.Timedelta("00:01:21")
+    assert protocol_lists[1] == [(pd.Timestamp("2023-11-13 21:41:21"), 2)]
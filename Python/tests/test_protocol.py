@@ -0,0 +1,46 @@
+import os
+import pandas as pd
+import pytest
+import wrictools as wric
+
+# Checks that the vectorized update_protocol() labels the rows like the row-by-row loop it replaced.
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+
+def update_protocol_loop(df, protocol_list):
+    """
+    The row-by-row update_protocol() of the first version of WRIC_preprocessing.py.
+    """
+    current_protocol = 0
+    current_index = 0
+    for index, row in df.iterrows():
+        while (current_index < len(protocol_list) and
+               row['datetime'] >= protocol_list[current_index][0]):
+            current_protocol = protocol_list[current_index][1]
+            current_index += 1
+        df.at[index, 'protocol'] = current_protocol
+    return df
+
+@pytest.fixture(scope="module")
+def example():
+    _, _, df_room1, df_room2 = wric.preprocess_WRIC_file(os.path.join(EXAMPLE_PATH, "data.txt"), save_csv=False, qc=None)
+    _, protocol_lists = wric.protocol_events(os.path.join(EXAMPLE_PATH, "note.txt"))
+    return {1: df_room1, 2: df_room2}, protocol_lists
+
+@pytest.mark.parametrize("room", [1, 2])
+def test_update_protocol_matches_the_loop(example, room):
+    data, protocol_lists = example
+    assert len(protocol_lists[room]) > 1
+    expected = update_protocol_loop(data[room].assign(protocol=0), protocol_lists[room])
+    result = wric.update_protocol(data[room].copy(), protocol_lists[room])
+    pd.testing.assert_series_equal(result["protocol"], expected["protocol"], check_dtype=False)
+
+def test_update_protocol_matches_the_loop_for_unsorted_and_missing_datetimes(example):
+    data, protocol_lists = example
+    df = data[1].copy()
+    # rows out of order never go back to an earlier protocol, missing datetimes keep the current one
+    df.loc[df.index[::50], "datetime"] = df["datetime"].iloc[0]
+    df.loc[df.index[25::100], "datetime"] = pd.NaT
+    expected = update_protocol_loop(df.assign(protocol=0), protocol_lists[1])
+    result = wric.update_protocol(df.copy(), protocol_lists[1])
+    pd.testing.assert_series_equal(result["protocol"], expected["protocol"], check_dtype=False)
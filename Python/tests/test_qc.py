@@ -0,0 +1,117 @@
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+import wrictools as wric
+from wrictools import synthetic
+
+# Checks the quality control of the sensors: a clean recording is not flagged, and one injected fault per check is
+# flagged at the rows it was injected (and masked by mask_qc()).
+
+ROWS = 600
+
+@pytest.fixture
+def clean():
+    """
+    A processed room of 10 hours of smooth, plausible measurements at 1-minute intervals.
+    """
+    t = np.arange(ROWS, dtype=np.float64)
+    vo2 = 300 + 30 * np.sin(2 * np.pi * t / 240)
+    vco2 = 0.85 * vo2 + 2 * np.sin(2 * np.pi * t / 97)
+    return pd.DataFrame({
+        "datetime": pd.date_range("2023-11-13 21:00:00", periods=ROWS, freq="1min"),
+        "VO2": vo2,
+        "VCO2": vco2,
+        "RER": vco2 / vo2,
+        "FiO2": 20.93 + 0.02 * np.sin(2 * np.pi * t / 300),
+        "FeO2": 20.0 + 0.1 * np.sin(t / 50),
+        "FiCO2": 0.04 + 0.002 * np.sin(2 * np.pi * t / 300),
+        "FeCO2": 0.9 + 0.05 * np.sin(t / 40),
+        "Flow": 80 + 2 * np.sin(t / 30),
+    })
+
+def intervals(flagged):
+    return list(zip(flagged["channel"], flagged["row_start"], flagged["row_stop"]))
+
+def test_clean_recording_is_not_flagged(clean):
+    flagged = wric.sensor_qc(clean, room=1)
+    assert flagged.empty, flagged.to_string()
+    assert list(flagged.columns) == ["room", "channel", "check", "row_start", "row_stop", "start", "end", "n_rows", "value"]
+
+def flatline(df):
+    df.loc[100:109, "VO2"] = df.loc[100, "VO2"]
+    return [("VO2", 100, 110)]
+
+def spike(df):
+    df.loc[200, "VO2"] += 200
+    return [("VO2", 200, 201)]
+
+def flow_drop(df):
+    df.loc[300:319, "Flow"] *= 0.5
+    return [("Flow", 300, 320)]
+
+def rer(df):
+    df.loc[50:69, "RER"] += 0.6
+    return [("RER", 50, 70)]
+
+def gap(df):
+    # 10 missing rows: the step from row 499 to 500 is 11 minutes
+    df.drop(index=range(500, 510), inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return [("datetime", 499, 501)]
+
+@pytest.mark.parametrize("check, inject", [("flatline", flatline), ("spike", spike), ("flow_drop", flow_drop), ("rer", rer), ("gap", gap)])
+def test_injected_fault_is_flagged(clean, check, inject):
+    expected = inject(clean)
+    flagged = wric.sensor_qc(clean, room=1)
+    assert set(flagged["check"]) == {check}, flagged.to_string()
+    assert intervals(flagged) == expected
+    assert (flagged["room"] == 1).all()
+    assert (flagged["start"] == clean["datetime"].iloc[flagged["row_start"]].to_numpy()).all()
+
+def test_injected_drift_is_flagged(clean):
+    clean.loc[400:, "FiO2"] += 0.5
+    flagged = wric.sensor_qc(clean, checks=["drift"])
+    assert len(flagged) == 1
+    row = flagged.iloc[0]
+    assert row["channel"] == "FiO2" and row["row_start"] < 400 and row["row_stop"] == ROWS
+    assert row["value"] == pytest.approx(0.5, abs=0.05)
+    # a tolerance above the drift does not flag it
+    assert wric.sensor_qc(clean, checks=["drift"], drift_tolerances={"FiO2": 1.0}).empty
+
+def test_mask_qc_removes_only_the_flagged_values(clean):
+    flatline(clean)
+    spike(clean)
+    gap(clean)
+    flagged = wric.sensor_qc(clean)
+    masked = wric.mask_qc(clean, flagged)
+    missing = masked.isna()
+    assert missing["VO2"].to_numpy().nonzero()[0].tolist() == list(range(100, 110)) + [200]
+    assert not missing.drop(columns="VO2").any().any()  # gaps have no values to mask
+    pd.testing.assert_frame_equal(masked[~missing["VO2"]], clean[~missing["VO2"]])
+    # only the spike
+    masked = wric.mask_qc(clean, flagged, checks=["spike"])
+    assert masked["VO2"].isna().to_numpy().nonzero()[0].tolist() == [200]
+
+def test_unsupported_check(clean):
+    with pytest.raises(ValueError):
+        wric.sensor_qc(clean, checks=["flatline", "noise"])
+
+def test_sensor_qc_folder(tmp_path, caplog):
+    synthetic.generate_wric_file(str(tmp_path / "Results_1m_a.txt"), days=0.5)
+    (tmp_path / "Results_1m_b.txt").write_text("not an OmniCal export\n")
+    with caplog.at_level(logging.WARNING, logger="wrictools"):
+        flagged = wric.sensor_qc_folder(str(tmp_path), checks=["flatline", "spike", "gap"])
+    assert "Results_1m_b.txt could not be checked" in caplog.text
+    _, df = wric.read_wric_file(str(tmp_path / "Results_1m_a.txt"))
+    expected = wric.sensor_qc(df, checks=["flatline", "spike", "gap"]).assign(file="Results_1m_a.txt")
+    pd.testing.assert_frame_equal(flagged, expected)
+    assert set(flagged["room"]) <= {1, 2}
+
+def test_quality_control_is_off_by_default(tmp_path):
+    filepath = str(tmp_path / "Results_1m_a.txt")
+    synthetic.generate_wric_file(filepath, days=0.5)
+    wric.preprocess_WRIC_file(filepath, code="manual", manual=["a", "b"], path_to_save=str(tmp_path))
+    assert not (tmp_path / "a_WRIC_qc.csv").exists()
+    wric.preprocess_WRIC_file(filepath, code="manual", manual=["a", "b"], path_to_save=str(tmp_path), qc="flag")
+    assert (tmp_path / "a_WRIC_qc.csv").exists()
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import wrictools as wric
+
+# Checks that a WRICRecording gives the DataFrames of preprocess_WRIC_file(), and that a recording of the cache is
+# memory-mapped with the values it was saved with.
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+DATA_PATH = os.path.join(EXAMPLE_PATH, "data.txt")
+NOTE_PATH = os.path.join(EXAMPLE_PATH, "note.txt")
+
+@pytest.mark.parametrize("combine, method", [(True, "mean"), (True, "median"), (True, "s2"), (False, "mean")])
+def test_to_dataframes_matches_preprocess(combine, method):
+    _, _, df_room1, df_room2 = wric.preprocess_WRIC_file(DATA_PATH, notefilepath=NOTE_PATH, combine=combine, method=method, save_csv=False)
+    recording = wric.WRICRecording.from_file(DATA_PATH, NOTE_PATH, dtype=np.float64)
+    for df, expected in zip(recording.to_dataframes(combine, method), [df_room1, df_room2]):
+        pd.testing.assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+def test_float32_recording_is_close_to_preprocess():
+    _, _, df_room1, df_room2 = wric.preprocess_WRIC_file(DATA_PATH, notefilepath=NOTE_PATH, save_csv=False)
+    recording = wric.WRICRecording.from_file(DATA_PATH, NOTE_PATH)
+    assert recording.values.dtype == np.float32
+    for df, expected in zip(recording.to_dataframes(), [df_room1, df_room2]):
+        pd.testing.assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False, rtol=1e-6)
+
+def test_cached_recording_is_memory_mapped(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    saved = wric.WRICRecording.read_raw(DATA_PATH, cache_dir=cache_dir)
+    assert not isinstance(saved.values, np.memmap)
+    assert len([name for name in os.listdir(cache_dir) if name.endswith(".json")]) == 1
+    loaded = wric.WRICRecording.read_raw(DATA_PATH, cache_dir=cache_dir)
+    assert isinstance(loaded.values, np.memmap)
+    assert not loaded.values.flags.writeable
+    np.testing.assert_array_equal(loaded.values, saved.values)
+    np.testing.assert_array_equal(loaded.datetimes, saved.datetimes)
+    assert (loaded.parameters, loaded.rooms, loaded.sets, loaded.windows) == (saved.parameters, saved.rooms, saved.sets, saved.windows)
+    for room in saved.rooms:
+        pd.testing.assert_frame_equal(loaded.metadata[room], saved.metadata[room])
+    # cut and labelled from the cache as from the file
+    for df, expected in zip(wric.WRICRecording.from_file(DATA_PATH, NOTE_PATH, cache_dir=cache_dir).to_dataframes(),
+                            wric.WRICRecording.from_file(DATA_PATH, NOTE_PATH).to_dataframes()):
+        pd.testing.assert_frame_equal(df, expected)
@@ -0,0 +1,91 @@
+import collections
+import http.server
+import logging
+import threading
+import urllib.parse
+import pytest
+from wrictools import redcap
+
+# Checks the REDCap client against a local stand-in server: retries of transient errors, the status per record
+# of bulk transfers and the HTTP status that is logged.
+
+pytest.importorskip("requests")
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers like the REDCap API: the file of a record, 429 or 503 for the first request of the records "busy"
+    and "unavailable", 400 for the record "missing".
+    """
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        fields = urllib.parse.parse_qs(body.decode(errors="ignore")) if self.headers["Content-Type"].startswith("application/x-www-form-urlencoded") else {}
+        record = fields.get("record", ["upload"])[0]
+        self.server.requests[record] += 1
+        if record == "missing":
+            status = 400
+        elif record in ("busy", "unavailable") and self.server.requests[record] == 1:
+            status = 429 if record == "busy" else 503
+        else:
+            status = 200
+        content = f"data of {record}".encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.requests = collections.Counter()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def client(server):
+    with redcap.RedcapClient(api_url=f"http://127.0.0.1:{server.server_address[1]}/api/", api_token="token", backoff=0) as client:
+        yield client
+
+@pytest.fixture
+def messages():
+    class Collect(logging.Handler):
+        def emit(self, record):
+            collected.append(record.getMessage())
+    collected, handler, level = [], Collect(), redcap.logger.level
+    redcap.logger.addHandler(handler)
+    redcap.logger.setLevel(logging.INFO)
+    yield collected
+    redcap.logger.removeHandler(handler)
+    redcap.logger.setLevel(level)
+
+@pytest.mark.parametrize("record", ["busy", "unavailable"])
+def test_transient_errors_are_retried(server, client, record):
+    assert client.export_file(record, "wric_raw", return_status=True) == (f"data of {record}".encode(), 200)
+    assert server.requests[record] == 2
+
+def test_bulk_export_reports_errors_per_record(server, client):
+    statuses = client.export_files(["1", "missing", "busy"], "wric_raw")
+    assert list(statuses) == ["1", "missing", "busy"]
+    assert statuses["1"]["status"] == "ok" and statuses["1"]["result"] == b"data of 1"
+    assert statuses["busy"]["status"] == "ok"
+    assert statuses["missing"]["status"] == "error" and "400" in statuses["missing"]["error"]
+    assert statuses["missing"]["result"] is None
+
+def test_logged_status(client, messages, monkeypatch, tmp_path):
+    import requests
+
+    monkeypatch.setattr(redcap, "get_redcap_client", lambda: client)
+    assert redcap.export_file_from_redcap("unavailable", "wric_raw") == b"data of unavailable"
+    assert messages[-1] == "HTTP Status: 200"
+    with pytest.raises(requests.HTTPError):
+        redcap.export_file_from_redcap("missing", "wric_raw")
+    assert messages[-1] == "HTTP Status: 400"
+    filepath = tmp_path / "1_WRIC_data.csv"
+    filepath.write_text("datetime,VO2\n")
+    redcap.upload_file_to_redcap(str(filepath), "1", "wric_processed")
+    assert messages[-1] == "HTTP Status: 200"
@@ -0,0 +1,45 @@
+import importlib
+
+# Preprocessing and analysis of whole-room indirect calorimetry (WRIC) data, e.g. `import wrictools as wric`.
+# The functions are imported from their module on first use, so importing the package does no work and
+# REDCap (the requests library and your config.py) is only loaded when it is used.
+
+__version__ = "0.1.0"
+
+# module -> functions, classes and constants it provides at the package level
+SUBMODULES = {
+    "io": ["WRIC_COLUMNS", "RAW_BLOCKS", "BLOCK_PATTERN", "METADATA_PATTERN", "check_code", "room_codes", "write_csv", "write_parquet",
+           "write_feather", "OUTPUT_WRITERS", "STORE_FILENAME", "OutputStream", "save_output", "output_path", "output_exists", "extract_meta_data", "extract_room_meta_data",
+           "read_room_metadata", "parse_layout", "header_rooms", "decode_bytes", "open_text", "open_file", "find_data_start",
+           "parse_wric_data", "parse_wric_values", "count_rows", "parse_wric_chunks", "raw_columns", "parse_datetimes", "read_wric_file", "read_header", "source_bytes"],
+    "notes": ["KEYWORDS_DICT", "START_END_KEYWORDS", "TIME_PATTERN", "DRIFT_PATTERN", "protocol_segments", "update_protocol",
+              "read_note_file", "parse_note_file", "parse_note_lines", "keyword_pattern", "compile_keywords", "note_participants",
+              "label_notes", "detect_drift", "detect_start_end", "extract_note_info", "protocol_events"],
+    "processing": ["ROW_BYTES", "add_relative_time", "cut_rows", "row_window", "create_wric_df", "split_rooms", "room_bounds", "process_room",
+                   "process_rooms", "check_discrepancies", "check_discrepancies_folder", "COMBINE_METHODS", "set_columns", "combine_measurements", "combine_rooms", "WRICRecording",
+                   "preprocess_WRIC_file", "preprocess_WRIC_rooms", "chunk_rows_for_budget", "iter_WRIC_chunks", "stitch_segments",
+                   "preprocess_WRIC_file_chunked", "follow_WRIC_file", "pair_wric_files", "job_result", "process_WRIC_job",
+                   "preprocess_WRIC_folder"],
+    "qc": ["QC_CHECKS", "QC_MODES", "SENSOR_PARAMETERS", "DRIFT_TOLERANCES", "CHANNEL_PATTERN", "channel_parameters", "runs", "run_maximum",
+           "nan_median", "rolling_mean", "sensor_qc", "mask_qc", "log_qc", "sensor_qc_folder"],
+    "store": ["DATETIME_FORMAT", "KEY_COLUMNS", "SQL_REDUCERS", "store_path", "split_code", "StudyStore"],
+    "cache": ["cache_key", "library_hash", "load_from_cache", "save_to_cache"],
+    "profiling": ["logger", "PrintHandler", "print_messages", "CURRENT_PROFILE", "StageProfiler", "log_stage", "profile_run", "timed_stage"],
+    "redcap": ["load_config", "RedcapClient", "get_redcap_client", "log_error_status", "export_file_from_redcap", "upload_file_to_redcap",
+               "timed_call", "process_record", "upload_record", "preprocess_WRIC_files"],
+    "analysis": ["protocol_dict", "data_file_endings", "read_processed_file", "read_cohort_dataset", "read_segments",
+                 "find_segment", "get_protocol_window", "row_minutes", "is_energy_rate", "default_reducer", "resample_data", "resample_folder", "file_code",
+                 "summarize_protocols", "tmp_func_name"],
+}
+LOCATIONS = {name: module for module, names in SUBMODULES.items() for name in names}
+__all__ = list(LOCATIONS)
+
+def __getattr__(name):
+    if name not in LOCATIONS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{LOCATIONS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(LOCATIONS))
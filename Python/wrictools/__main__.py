@@ -0,0 +1,5 @@
+from .cli import main
+
+# python -m wrictools path/to/folder (the same as wric-preprocess, see cli.py)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+import os
+import numpy as np
+import pandas as pd
+from .notes import protocol_segments
+from .processing import add_relative_time, cut_rows
+from .profiling import logger
+
+# This file includes helpful functions to process and analyze the data
+# It is important that you have preprocessed your WRIC data before by running preprocess_WRIC_file(filepath) to create the necessary processed files
+
+protocol_dict = {"normal" : 0, "sleep" : 1, "eat" : 2, "active" : 3, "ree" : 4}
+# endings of the processed data files written by preprocess_WRIC_file (see output_format)
+data_file_endings = ("_data.csv", "_data.parquet", "_data.feather")
+
+def read_processed_file(filepath, columns=None):
+    """
+    Reads a processed data file written by preprocess_WRIC_file (csv, parquet or feather).
+
+    Parameters:
+    ----------
+    filepath : str
+        Path to the processed file, or to a folder of a "parquet_dataset".
+    columns : list of str or None, optional
+        Only read these columns (e.g. ["datetime", "protocol", "VO2"]). Reads all columns if None.
+
+    Returns:
+    -------
+    pd.DataFrame
+        The processed data with "datetime" parsed as datetime64.
+    """
+    if filepath.endswith(".csv"):
+        usecols = None if columns is None else (lambda col: col in columns)
+        df = pd.read_csv(filepath, usecols=usecols)
+        if "datetime" in df.columns:
+            df["datetime"] = pd.to_datetime(df["datetime"])
+        return df
+    elif filepath.endswith(".feather"):
+        return pd.read_feather(filepath, columns=columns)
+    else:
+        return pd.read_parquet(filepath, columns=columns)
+
+def read_cohort_dataset(dataset_path, columns=None, codes=None):
+    """
+    Reads a cohort dataset written with output_format="parquet_dataset" (e.g. "processed/WRIC_data").
+
+    Parameters:
+    ----------
+    dataset_path : str
+        Path to the dataset folder (containing one "code=..." folder per subject).
+    columns : list of str or None, optional
+        Only read these columns. Reads all columns if None. The "code" column is always included.
+    codes : list of str or None, optional
+        Only read these subjects. Reads all subjects if None.
+
+    Returns:
+    -------
+    pd.DataFrame
+        The data of all (selected) subjects with a "code" column.
+    """
+    filters = [("code", "in", list(codes))] if codes is not None else None
+    if columns is not None and "code" not in columns:
+        columns = ["code"] + list(columns)
+    return pd.read_parquet(dataset_path, columns=columns, filters=filters)
+
+
+def read_segments(data_filepath, df=None):
+    """
+    Reads the protocol segments saved next to a processed data file (e.g. "XXXX_WRIC_segments.csv" for "XXXX_WRIC_data.csv").
+
+    Parameters:
+    ----------
+    data_filepath : str
+        Path to the processed data file.
+    df : pd.DataFrame or None, optional
+        The already loaded data. If there is no segments file (e.g. processed with an older version), 
+        the segments are computed from this DataFrame instead.
+
+    Returns:
+    -------
+    pd.DataFrame or None
+        The segment table (see protocol_segments()), None if neither is available.
+    """
+    segments_filepath = data_filepath.replace("_data.", "_segments.")
+    if os.path.exists(segments_filepath):
+        segments = read_processed_file(segments_filepath)
+        segments[["start", "end"]] = segments[["start", "end"]].apply(pd.to_datetime)
+        return segments
+    if df is not None and "protocol" in df.columns:
+        return protocol_segments(df)
+    return None
+
+def find_segment(segments, protocol_num, occurence=1):
+    """
+    Finds the segment of the n-th occurence (counting from 1) of a protocol in a segment table.
+
+    Returns:
+    -------
+    pd.Series
+        The row of the segment table.
+
+    Raises:
+    ------
+    IndexError
+        If the protocol does not occur that often.
+    """
+    matches = segments[(segments["protocol"] == protocol_num) & (segments["occurrence"] == occurence)]
+    if matches.empty:
+        raise IndexError(f"Only {(segments['protocol'] == protocol_num).sum()} transitions found, but occurrence {occurence} was requested.")
+    return matches.iloc[0]
+
+def get_protocol_window(df, protocol, occurence=1, add_start=0, add_end=0, segments=None):
+    """
+    Returns the rows of the n-th occurence of a protocol, optionally extended by some minutes before and after.
+
+    The segment is looked up in the segment table and the rows are found by binary search on the sorted
+    datetimes, so the result is a slice of `df` and not a copy. The window ends at the first row of the next
+    segment (when the protocol changed), as in tmp_func_name().
+
+    Parameters:
+    ----------
+    df : pd.DataFrame
+        Processed data of one room, sorted by datetime.
+    protocol : str
+        One of the protocols in protocol_dict, e.g. "sleep".
+    occurence : int, optional
+        Which occurence of the protocol, counting from 1. Default is 1.
+    add_start, add_end : float, optional
+        Minutes to add before the start and after the end. Default is 0.
+    segments : pd.DataFrame or None, optional
+        Segment table of `df` (see read_segments()). Computed from `df` if None.
+
+    Returns:
+    -------
+    pd.DataFrame
+        The rows of the window (limited to the recorded data).
+
+    Raises:
+    ------
+    IndexError
+        If the protocol does not occur that often.
+    """
+    segments = protocol_segments(df) if segments is None else segments
+    segment = find_segment(segments, protocol_dict[protocol], occurence)
+    start = segment["start"] - pd.Timedelta(minutes=add_start)
+    end = segment["end"] + pd.Timedelta(minutes=add_end)
+    return cut_rows(df, start, end)
+
+def row_minutes(datetimes):
+    """
+    Returns the minutes each row of a recording stands for: the time since the previous row, and for the first row
+    the time to the second (one minute if there is only one row). An energy expenditure per minute times these
+    minutes is the energy of the row, whatever the sampling interval (the row after a gap stands for the whole gap).
+
+    Parameters:
+    ----------
+    datetimes : pd.Series or array-like
+        Datetimes of the rows, in the order of the recording.
+
+    Returns:
+    -------
+    np.ndarray
+        Minutes of each row (NaN for missing datetimes).
+    """
+    datetimes = pd.to_datetime(pd.Series(datetimes)).to_numpy(dtype='datetime64[ns]')
+    minutes = np.diff(datetimes, prepend=datetimes[:1]) / np.timedelta64(1, 'm')
+    if len(minutes):
+        minutes[0] = minutes[1] if len(minutes) > 1 else 1.0
+    return minutes
+
+def is_energy_rate(column):
+    """
+    Helper Function that returns whether a column is an energy expenditure per minute (kcal/min or kJ/min),
+    which is weighted by row_minutes() before it is summed. Not intended for modular use.
+    """
+    return "Energy Expenditure" in column
+
+def default_reducer(column):
+    """
+    Returns how a parameter is aggregated over a time bin: energy expenditure is summed (kcal or kJ per bin, each row
+    weighted by its minutes, see row_minutes()), the Activity Monitor counts are summed and all other parameters
+    (e.g. VO2, VCO2, RER) are averaged.
+    """
+    if is_energy_rate(column) or "Activity Monitor" in column:
+        return "sum"
+    return "mean"
+
+def resample_data(df, freq="15min", by="clock", split_protocols=False, columns=None, reducers=None):
+    """
+    Aggregates the data of one room into time bins in one grouped pass. Summed energy expenditure is weighted by the
+    minutes of each row (see row_minutes()), so the bins hold kcal (or kJ) for any sampling interval.
+
+    Parameters:
+    ----------
+    df : pd.DataFrame
+        Processed data of one room (see preprocess_WRIC_file()).
+    freq : str or int, optional
+        Width of the bins, e.g. "5min", "15min", "30min", "60min" or "1h", or minutes as int. Default is "15min".
+        Not used for by="hour_of_day".
+    by : str, optional
+        - "clock": bins of the clock time, e.g. 08:00-08:15 (default).
+        - "relative": bins of the time since the start of the recording ('relative_time[min]').
+        - "hour_of_day": one bin per hour of the day over all days (an hourly profile).
+    split_protocols : bool, optional
+        If True, bins do not cross protocol boundaries: a bin is split where the protocol changes and the
+        'protocol' of each bin is reported. Default is False.
+    columns : list of str or None, optional
+        Parameters to aggregate. All measurement columns if None.
+    reducers : dict or None, optional
+        Aggregation per parameter (e.g. {"VO2": "max"}), any pandas aggregation name. Parameters not given
+        use default_reducer() (sum for energy expenditure and Activity Monitor, mean for all others).
+
+    Returns:
+    -------
+    pd.DataFrame
+        Tidy table with one row per bin and parameter: 'bin' (start of the bin as datetime, minutes since the
+        start or hour of the day), 'protocol' (if split_protocols), 'start' (first datetime in the bin),
+        'n_rows' (rows of data in the bin), 'minutes' (time the rows stand for), 'parameter', 'reducer' and 'value'.
+    """
+    if columns is None:
+        columns = [col for col in df.columns if col not in ("datetime", "relative_time[min]", "protocol") and pd.api.types.is_numeric_dtype(df[col])]
+    reducers = {col: (reducers or {}).get(col, default_reducer(col)) for col in columns}
+    minutes = freq if isinstance(freq, (int, float)) else pd.Timedelta(freq).total_seconds() / 60
+
+    datetimes = pd.to_datetime(df["datetime"])
+    if by == "clock":
+        bins = datetimes.dt.floor(pd.Timedelta(minutes=minutes))
+    elif by == "relative":
+        relative = df["relative_time[min]"] if "relative_time[min]" in df.columns else (datetimes - datetimes.iloc[0]).dt.total_seconds() / 60
+        bins = np.floor(relative / minutes) * minutes
+    elif by == "hour_of_day":
+        bins = datetimes.dt.hour
+    else:
+        raise ValueError(f"Binning by '{by}' is not supported. Use 'clock', 'relative' or 'hour_of_day'.")
+
+    keys = [bins.rename("bin")]
+    if split_protocols:
+        # consecutive rows with the same protocol form a segment; bins never span two segments
+        segment = df["protocol"].ne(df["protocol"].shift()).cumsum().rename("segment")
+        keys = [segment] + keys
+    data = df[columns].assign(start=datetimes, n_rows=1, minutes=row_minutes(datetimes))
+    for col, reducer in reducers.items():
+        if reducer == "sum" and is_energy_rate(col):
+            data[col] = data[col] * data["minutes"]
+    aggregations = dict(reducers, start="min", n_rows="sum", minutes="sum")
+    if split_protocols:
+        data["protocol"] = df["protocol"]
+        aggregations["protocol"] = "first"
+    binned = data.groupby(keys, sort=True).agg(aggregations).reset_index()
+
+    id_columns = ["bin"] + (["protocol"] if split_protocols else []) + ["start", "n_rows", "minutes"]
+    if by == "hour_of_day":
+        binned = binned.drop(columns="start")
+        id_columns.remove("start")
+    tidy = binned[id_columns + columns].melt(id_vars=id_columns, var_name="parameter", value_name="value")
+    tidy.insert(len(id_columns) + 1, "reducer", tidy["parameter"].map(reducers))
+    return tidy
+
+def resample_folder(folder_path, freq="15min", by="clock", split_protocols=False, columns=None, reducers=None):
+    """
+    Aggregates the data of all processed files in a folder into time bins (see resample_data()).
+
+    Parameters:
+    ----------
+    folder_path : str
+        Folder with the processed data files.
+    freq, by, split_protocols, columns, reducers :
+        See resample_data().
+
+    Returns:
+    -------
+    pd.DataFrame
+        Tidy table of all files with an additional 'code' column (the subject code of the file).
+    """
+    wric_files = sorted(f for f in os.listdir(folder_path) if f.endswith(data_file_endings))
+    read_columns = None
+    if columns is not None:
+        read_columns = ["datetime", "relative_time[min]"] + (["protocol"] if split_protocols else []) + list(columns)
+    tables = []
+    for file in wric_files:
+        df = read_processed_file(folder_path + "/" + file, read_columns)
+        table = resample_data(df, freq, by, split_protocols, columns, reducers)
+        table.insert(0, "code", file_code(file))
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+def file_code(file):
+    """
+    Returns the subject code of a processed file name, e.g. "1234_visit1" for "1234_visit1_WRIC_data.csv".
+    """
+    return file.rsplit("_WRIC_data.", 1)[0]
+
+def summarize_protocols(folder_path, protocols=None):
+    """
+    Summarizes every protocol segment of all processed files in a folder: one row per
+    (subject, visit, room, protocol, occurrence) with the total energy expenditure and mean measurements.
+
+    Each file is read once (only the needed columns) and all segments of all files are reduced in one grouped pass.
+
+    Parameters:
+    ----------
+    folder_path : str
+        Folder with the processed (combined) data files.
+    protocols : list of str or None, optional
+        Only keep these protocols of protocol_dict (e.g. ["sleep", "eat"]). All protocols if None.
+
+    Returns:
+    -------
+    pd.DataFrame
+        Columns 'code', 'subject', 'visit' (the code split at the first "_", e.g. "1234_visit1"), 'room' (if a segments
+        file exists), 'protocol', 'protocol_name', 'occurrence' (counting from 1), 'start' and 'end' (first and last datetime),
+        'minutes' (the time the rows stand for, see row_minutes()), 'energy_expenditure_kcal' (total, each row weighted
+        by its minutes, so also for a finer sampling than 1 minute), 'VO2', 'VCO2', 'RER' (means) and
+        'activity_counts' (total of the Activity Monitor).
+    """
+    ee = "Energy Expenditure (kcal/min)"
+    columns = ["datetime", "protocol", ee, "VO2", "VCO2", "RER", "Activity Monitor"]
+    wric_files = sorted(f for f in os.listdir(folder_path) if f.endswith(data_file_endings))
+
+    frames, rooms = [], {}
+    for file in wric_files:
+        try:
+            df = read_processed_file(folder_path + "/" + file, columns)
+        except (KeyError, ValueError):
+            df = pd.DataFrame()  # reported as missing columns below
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            logger.warning(f"{', '.join(missing)} missing in file: {file} (the data needs to be combined and have a protocol). This file will be skipped.")
+            continue
+        code = file_code(file)
+        segments = read_segments(folder_path + "/" + file)
+        rooms[code] = segments["room"].iloc[0] if segments is not None and len(segments) else None
+        # consecutive rows with the same protocol form a segment
+        df["segment"] = df["protocol"].ne(df["protocol"].shift()).cumsum()
+        df["minutes"] = row_minutes(df["datetime"])
+        df["energy_kcal"] = df[ee] * df["minutes"]
+        df["code"] = code
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+
+    summary = pd.concat(frames, ignore_index=True).groupby(["code", "segment"], sort=False).agg(
+        protocol=("protocol", "first"),
+        start=("datetime", "min"),
+        end=("datetime", "max"),
+        minutes=("minutes", "sum"),
+        energy_expenditure_kcal=("energy_kcal", "sum"),
+        VO2=("VO2", "mean"),
+        VCO2=("VCO2", "mean"),
+        RER=("RER", "mean"),
+        activity_counts=("Activity Monitor", "sum"),
+    ).reset_index()
+    summary["occurrence"] = summary.groupby(["code", "protocol"]).cumcount() + 1
+
+    protocol_names = {num: name for name, num in protocol_dict.items()}
+    summary["protocol_name"] = summary["protocol"].map(protocol_names)
+    if protocols is not None:
+        summary = summary[summary["protocol_name"].isin(protocols)]
+    codes = summary["code"].str.split("_", n=1, expand=True).reindex(columns=[0, 1])
+    summary["subject"] = codes[0]
+    summary["visit"] = codes[1]
+    summary["room"] = summary["code"].map(rooms)
+    return summary[["code", "subject", "visit", "room", "protocol", "protocol_name", "occurrence", "start", "end", "minutes",
+                    "energy_expenditure_kcal", "VO2", "VCO2", "RER", "activity_counts"]].reset_index(drop=True)
+
+# choose the protocol you want (takes first) and number, if there are multiple specify the occurence (@Nina: start counting at 1!)
+def tmp_func_name(folder_path, protocol, occurence = 1, add_start = 0, add_end = 0, save_path=None, columns=None):
+    # add_start, add_end in minutes
+    # columns: only read these columns from the processed files (datetime and protocol are always read), None reads all
+    wric_files = [f for f in os.listdir(folder_path) if f.endswith(data_file_endings)]
+    try:
+        protocol_num = protocol_dict[protocol]
+    except KeyError:
+        logger.error("Please provide a valid protocol instance: normal, sleep, eat, active, ree")
+        return
+    # create folder to save the new df to
+    folder = save_path if not pd.isna(save_path) else f'{folder_path}/{protocol}_{occurence}'
+    os.makedirs(folder, exist_ok=True)
+    
+    dfs = {}
+    if columns is not None:
+        columns = ["datetime", "protocol"] + [col for col in columns if col not in ("datetime", "protocol")]
+    
+    for file in wric_files:
+        df = read_processed_file(folder_path +"/" + file, columns)
+        
+        if "protocol" not in df.columns:
+            logger.warning(f"'protocol' column is missing in file: {file}. This file will be skipped.")
+            continue
+        # look up the protocol period in the precomputed segments instead of searching the whole file
+        segments = read_segments(folder_path + "/" + file, df)
+        try:
+            segment = find_segment(segments, protocol_num, occurence)
+        except IndexError as e:
+            raise IndexError(f"""{e} 
+                             Check wether your file {file} is empty, the protocol is properly documented in the corresponding note file 
+                             or you chose a protocol activity and/or number of ocurrence that does not exist.""")
+        
+        start = segment["start"] - pd.Timedelta(minutes=add_start)
+        end = segment["end"] + pd.Timedelta(minutes=add_end)
+        
+        # Check if start/end is earlier/later than the earliest/latest datetime in the DataFrame (sorted by datetime)
+        if start < df["datetime"].iloc[0]:
+            logger.warning(f"Start time {start} is earlier than the earliest data point. Using {df['datetime'].iloc[0]} instead.")
+            start = df["datetime"].iloc[0]
+        if end > df["datetime"].iloc[-1]:
+            logger.warning(f"End time {end} is later than the latest data point. Using {df['datetime'].iloc[-1]} instead.")
+            end = df["datetime"].iloc[-1]
+          
+        df = cut_rows(df, start, end)
+        if (set(df["protocol"].unique()) != {0, protocol_num}):
+            logger.warning(f"The time you specified ({start}, {end}) includes other protocols than normal and {protocol}. Be aware of that for your analysis!")
+
+        df = add_relative_time(df)
+        
+        # save as csv and append to dictionary
+        df.to_csv(f'{folder}/{file}_{protocol}_{occurence}' )
+        dfs[file[:7]] = df
+    
+    return dfs
+
+
+# output warning if changed to other protocol_num than 0 (interference)
+# extrcat and save them as new DataFrames
\ No newline at end of file
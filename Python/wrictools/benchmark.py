@@ -0,0 +1,343 @@
+import wrictools as wric
+from wrictools import analysis, synthetic
+import pandas as pd
+import numpy as np
+import argparse
+import contextlib
+import io
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# This file benchmarks the preprocessing on synthetic recordings of different lengths and checks that the
+# results are still the same as the reference outputs in example_data/reference and that the peak memory
+# of a file stays a small multiple of its raw data (--check-memory).
+# Run it from the Python folder, e.g.: python -m wrictools.benchmark --days 1 7 14 --output benchmark_results.csv
+
+REFERENCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data", "reference")
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "example_data")
+
+def prepare(data_path, days, interval=60, notes_per_day=4):
+    """
+    Helper Function for run_benchmarks() that generates a synthetic recording and the inputs of all stages.
+    Not intended for modular use.
+    """
+    filepath, notefilepath = synthetic.generate_recording(os.path.join(data_path, f"{days}d"), days, interval, notes_per_day)
+    lines = wric.open_file(filepath)
+    df_room1, df_room2 = wric.create_wric_df(filepath, lines, False, "1", "2", None, None, None, None)
+    _, protocol_lists = wric.protocol_events(notefilepath)
+    processed_path = os.path.join(data_path, f"{days}d", "processed")
+    os.makedirs(processed_path, exist_ok=True)
+    wric.preprocess_WRIC_file(filepath, code="manual", manual=["1_bench", "2_bench"], path_to_save=processed_path, notefilepath=notefilepath)
+    store_folder = os.path.join(data_path, f"{days}d", "store")
+    os.makedirs(store_folder, exist_ok=True)
+    wric.preprocess_WRIC_file(filepath, code="manual", manual=["1_bench", "2_bench"], path_to_save=store_folder, notefilepath=notefilepath, output_format="sqlite")
+    return dict(filepath=filepath, notefilepath=notefilepath, lines=lines, df_room1=df_room1, df_room2=df_room2,
+                combined=wric.combine_measurements(df_room1), protocol_list=protocol_lists[1],
+                processed_path=processed_path, store_path=wric.store_path(store_folder), output_path=os.path.join(data_path, f"{days}d", "output"))
+
+def store_window_stage(ctx):
+    """
+    Helper Function that queries the same window as the stage tmp_func_name from the study store. Not intended for modular use.
+    """
+    with wric.StudyStore(ctx["store_path"]) as store:
+        return store.get_windows("sleep")
+
+def note_stage(ctx):
+    """
+    Helper Function that runs extract_note_info() without the cached parse of the note file. Not intended for modular use.
+    """
+    wric.parse_note_file.cache_clear()
+    return wric.extract_note_info(ctx["notefilepath"], ctx["df_room1"].copy(), ctx["df_room2"].copy())
+
+def import_stage(ctx):
+    """
+    Helper Function that starts a new Python process that imports the processing, i.e. the start-up time of a
+    worker process or a short command line call. Not intended for modular use.
+    """
+    subprocess.run([sys.executable, "-c", "import wrictools.processing"], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# stage name -> function of the prepared inputs
+STAGES = {
+    "import": import_stage,
+    "open_file": lambda ctx: wric.open_file(ctx["filepath"]),
+    "create_wric_df": lambda ctx: wric.create_wric_df(ctx["filepath"], ctx["lines"], False, "1", "2", None, None, None, None),
+    "extract_note_info": note_stage,
+    "update_protocol": lambda ctx: wric.update_protocol(ctx["df_room1"].copy(), ctx["protocol_list"]),
+    "combine_measurements": lambda ctx: wric.combine_measurements(ctx["df_room1"]),
+    "check_discrepancies": lambda ctx: wric.check_discrepancies(ctx["df_room1"], individual=True, verbose=False),
+    "sensor_qc": lambda ctx: wric.sensor_qc(ctx["df_room1"]),
+    "write_csv": lambda ctx: wric.write_csv(ctx["combined"], ctx["output_path"] + "_data.csv"),
+    "tmp_func_name": lambda ctx: analysis.tmp_func_name(ctx["processed_path"], "sleep", save_path=ctx["output_path"]),
+    "store_window": store_window_stage,
+    "preprocess_WRIC_file": lambda ctx: wric.preprocess_WRIC_file(ctx["filepath"], notefilepath=ctx["notefilepath"], save_csv=False),
+    "preprocess_WRIC_file_chunked": lambda ctx: wric.preprocess_WRIC_file_chunked(ctx["filepath"], code="manual", manual=["1_chunked", "2_chunked"], notefilepath=ctx["notefilepath"],
+                                                                                path_to_save=os.path.dirname(ctx["output_path"]), memory_budget_mb=16),
+}
+
+def measure(stage, ctx, repeat=3):
+    """
+    Times a stage `repeat` times and measures its peak memory (allocations traced by tracemalloc) in one extra run.
+
+    Returns:
+    -------
+    dict
+        'best_s' and 'median_s' (seconds) and 'peak_mb' (megabytes).
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            STAGES[stage](ctx)
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            STAGES[stage](ctx)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return dict(best_s=min(times), median_s=float(np.median(times)), peak_mb=peak / 1e6)
+
+def environment():
+    """
+    Helper Function that returns the versions and git commit the benchmark runs with. Not intended for modular use.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return dict(commit=commit, python=platform.python_version(), pandas=pd.__version__, numpy=np.__version__,
+                timestamp=pd.Timestamp.now().isoformat(timespec="seconds"))
+
+def run_benchmarks(days=(1, 7, 14), stages=None, repeat=3, interval=60, notes_per_day=4, data_path=None):
+    """
+    Benchmarks the stages of the preprocessing on synthetic recordings of different lengths.
+
+    Parameters:
+    ----------
+    days : list of float, optional
+        Lengths of the synthetic recordings in days. Default is (1, 7, 14).
+    stages : list of str or None, optional
+        Stages to run (keys of STAGES). All stages if None.
+    repeat : int, optional
+        How often each stage is timed. Default is 3.
+    interval : int, optional
+        Sampling interval of the synthetic recordings in seconds. Default is 60.
+    notes_per_day : int, optional
+        Additional free-text notes per day in the synthetic note files. Default is 4.
+    data_path : str or None, optional
+        Folder for the synthetic recordings (kept after the run). A temporary folder if None.
+
+    Returns:
+    -------
+    pd.DataFrame
+        One row per stage and length with 'stage', 'days', 'rows', 'repeat', 'best_s', 'median_s', 'peak_mb'
+        and the environment ('commit', 'python', 'pandas', 'numpy', 'timestamp').
+    """
+    stages = list(STAGES) if stages is None else stages
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_path:
+        for length in days:
+            with contextlib.redirect_stdout(io.StringIO()):
+                ctx = prepare(data_path or tmp_path, length, interval, notes_per_day)
+            for stage in stages:
+                result = dict(stage=stage, days=length, rows=len(ctx["df_room1"]), repeat=repeat, **measure(stage, ctx, repeat))
+                print(f"{stage:>22} {length:>5} days: {result['median_s']:8.4f} s, peak {result['peak_mb']:8.1f} MB")
+                results.append(result)
+    return pd.DataFrame(results).assign(**environment())
+
+def compare_results(results, baseline, tolerance=1.25):
+    """
+    Compares benchmark results with earlier results (e.g. of the main branch) of the same stages and lengths.
+
+    Parameters:
+    ----------
+    results, baseline : pd.DataFrame
+        Results of run_benchmarks(); for the baseline the last run of each stage and length is used.
+    tolerance : float, optional
+        A stage is a regression if its median time or peak memory is more than `tolerance` times the baseline. Default is 1.25.
+
+    Returns:
+    -------
+    pd.DataFrame
+        'stage', 'days', the 'time_ratio' and 'memory_ratio' (current / baseline) and 'regression'.
+    """
+    baseline = baseline.drop_duplicates(["stage", "days"], keep="last")
+    merged = results.merge(baseline, on=["stage", "days"], suffixes=("", "_baseline"))
+    merged["time_ratio"] = merged["median_s"] / merged["median_s_baseline"]
+    merged["memory_ratio"] = merged["peak_mb"] / merged["peak_mb_baseline"]
+    merged["regression"] = (merged["time_ratio"] > tolerance) | (merged["memory_ratio"] > tolerance)
+    return merged[["stage", "days", "time_ratio", "memory_ratio", "regression"]]
+
+def check_memory(days=7, interval=10, factor=2.0, data_path=None):
+    """
+    Checks that the peak memory of preprocess_WRIC_file() (the stage 'total' of the profiling, see StageProfiler)
+    stays within `factor` times the raw numeric data of the file (rows x measurement columns x 8 bytes), with S1
+    and S2 combined and separate and the drift and protocol of the notes. Short recordings exceed the factor, as the
+    memory that does not grow with the length (e.g. the notes and the metadata) is a large part of their peak.
+    Run by `python -m wrictools.benchmark --check-memory` and by tests/test_memory.py (pytest).
+
+    Parameters:
+    ----------
+    days : float, optional
+        Length of the synthetic recording in days. Default is 7.
+    interval : int, optional
+        Sampling interval of the synthetic recording in seconds. Default is 10.
+    factor : float, optional
+        Allowed peak memory as a multiple of the raw numeric data. Default is 2.0.
+    data_path : str or None, optional
+        Folder for the synthetic recording (kept after the run). A temporary folder if None.
+
+    Returns:
+    -------
+    pd.DataFrame
+        One row per run with 'combine', 'rows', 'raw_mb', 'peak_mb', 'ratio' and 'exceeds' (ratio above `factor`).
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_path:
+        filepath, notefilepath = synthetic.generate_recording(os.path.join(data_path or tmp_path, f"{days}d"), days, interval)
+        _, df = wric.read_wric_file(filepath)
+        raw_mb = df.drop(columns="datetime").to_numpy(dtype=np.float64).nbytes / 1e6
+        rows = len(df)
+        del df
+        for combine in [True, False]:
+            profiler = wric.StageProfiler()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = wric.preprocess_WRIC_file(filepath, notefilepath=notefilepath, combine=combine, save_csv=False, profile=profiler)
+            del result
+            peak_mb = max(record["peak_mb"] for record in profiler.records if record["stage"] == "total")
+            results.append(dict(combine=combine, rows=rows, raw_mb=raw_mb, peak_mb=peak_mb, ratio=peak_mb / raw_mb))
+            print(f"combine={combine!s:>5}: peak {peak_mb:8.1f} MB for {raw_mb:.1f} MB of raw data ({peak_mb / raw_mb:.2f}x, allowed {factor}x)")
+    results = pd.DataFrame(results)
+    results["exceeds"] = results["ratio"] > factor
+    return results
+
+def reference_outputs(tmp_path):
+    """
+    Computes the outputs that are compared with the reference: the processed data, metadata and segments of the
+    example data and of a synthetic recording, the S1/S2 discrepancies and a protocol window of the analysis.
+
+    Returns:
+    -------
+    dict
+        File name (in the reference folder) -> DataFrame.
+    """
+    data = os.path.join(EXAMPLE_PATH, "data.txt")
+    note = os.path.join(EXAMPLE_PATH, "note.txt")
+    filepath, notefilepath = synthetic.generate_recording(os.path.join(tmp_path, "synthetic"), days=2)
+    runs = {
+        "example_notes": dict(filepath=data, notefilepath=note),
+        "example_separate": dict(filepath=data, combine=False, start="2023-11-13 12:00:00", end="2023-11-14 08:00:00"),
+        "synthetic_median": dict(filepath=filepath, notefilepath=notefilepath, method="median"),
+    }
+    outputs = {}
+    processed_path = os.path.join(tmp_path, "processed")
+    os.makedirs(processed_path, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for run, (name, kwargs) in enumerate(runs.items(), start=1):
+            # tmp_func_name() names the windows by the first 7 characters of the file name
+            R1_metadata, R2_metadata, df_room1, df_room2 = wric.preprocess_WRIC_file(
+                code="manual", manual=[f"{run}1_{name}", f"{run}2_{name}"], path_to_save=processed_path, **kwargs)
+            for room, metadata, df in [(1, R1_metadata, df_room1), (2, R2_metadata, df_room2)]:
+                outputs[f"{name}_{room}_metadata.csv.gz"] = metadata
+                outputs[f"{name}_{room}_data.csv.gz"] = df
+                if "protocol" in df.columns:
+                    outputs[f"{name}_{room}_segments.csv.gz"] = wric.protocol_segments(df, room)
+            if not kwargs.get("combine", True):
+                outputs[f"{name}_discrepancies.csv.gz"] = pd.concat(wric.check_discrepancies(df_room1, threshold=5, verbose=False)[:1] +
+                                                                    wric.check_discrepancies(df_room2, threshold=5, verbose=False)[:1], ignore_index=True)
+        windows = analysis.tmp_func_name(processed_path, "sleep", add_start=30, add_end=30, save_path=os.path.join(tmp_path, "windows"))
+    for code, df in windows.items():
+        outputs[f"sleep_window_{code}.csv.gz"] = df
+    return outputs
+
+def normalize(df):
+    """
+    Helper Function that writes and reads a DataFrame as CSV, so that outputs and references are compared the same way.
+    Not intended for modular use.
+    """
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)))
+
+def check_reference(reference_path=REFERENCE_PATH, update=False):
+    """
+    Checks that the outputs (see reference_outputs()) are the same as the reference outputs, e.g. after optimizing the code.
+
+    Parameters:
+    ----------
+    reference_path : str, optional
+        Folder with the reference outputs. Default is example_data/reference.
+    update : bool, optional
+        If True, (re)writes the reference outputs instead of checking them. Only do this if a change
+        of the results is intended. Default is False.
+
+    Returns:
+    -------
+    list of str
+        Descriptions of the differences, empty if all outputs are the same.
+    """
+    differences = []
+    with tempfile.TemporaryDirectory() as tmp_path:
+        outputs = reference_outputs(tmp_path)
+    if update:
+        os.makedirs(reference_path, exist_ok=True)
+        for name, df in outputs.items():
+            df.to_csv(os.path.join(reference_path, name), index=False)
+        print(f"Wrote {len(outputs)} reference outputs to {reference_path}.")
+        return differences
+
+    expected_names = {name for name in os.listdir(reference_path) if name.endswith(".csv.gz")} if os.path.isdir(reference_path) else set()
+    for name in sorted(expected_names - set(outputs)):
+        differences.append(f"{name}: missing in the outputs")
+    for name, df in outputs.items():
+        if name not in expected_names:
+            differences.append(f"{name}: no reference output")
+            continue
+        try:
+            pd.testing.assert_frame_equal(normalize(df), pd.read_csv(os.path.join(reference_path, name)), check_dtype=False, rtol=1e-9)
+        except AssertionError as e:
+            differences.append(f"{name}: {e}")
+    print(f"Checked {len(outputs)} outputs against the reference: {len(differences)} differ.")
+    return differences
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the WRIC preprocessing on synthetic recordings and check the results against the reference outputs.")
+    parser.add_argument("--days", type=float, nargs="+", default=None, help="lengths of the synthetic recordings in days (default: 1 7 14, and 7 for --check-memory)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="stages to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="how often each stage is timed")
+    parser.add_argument("--interval", type=int, default=None, help="sampling interval of the synthetic recordings in seconds (default: 60, and 10 for --check-memory)")
+    parser.add_argument("--notes-per-day", type=int, default=4, help="additional free-text notes per day")
+    parser.add_argument("--output", help="CSV file to append the results to")
+    parser.add_argument("--compare", help="CSV file with earlier results to compare with, exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed ratio of time or memory to the earlier results")
+    parser.add_argument("--check-reference", action="store_true", help="only check the outputs against the reference outputs")
+    parser.add_argument("--update-reference", action="store_true", help="rewrite the reference outputs (only if a change of results is intended)")
+    parser.add_argument("--check-memory", action="store_true", help="only check the peak memory of a file (default: 7 days at 10 s, or the first --days at --interval) against the raw data")
+    parser.add_argument("--memory-factor", type=float, default=2.0, help="allowed peak memory as a multiple of the raw numeric data")
+    args = parser.parse_args()
+    wric.print_messages(logging.WARNING)
+
+    if args.check_memory:
+        memory = check_memory(args.days[0] if args.days else 7, args.interval or 10, args.memory_factor)
+        sys.exit(1 if memory["exceeds"].any() else 0)
+
+    if args.check_reference or args.update_reference:
+        differences = check_reference(update=args.update_reference)
+        for difference in differences:
+            print(difference)
+        sys.exit(1 if differences else 0)
+
+    days = args.days or [1, 7, 14]
+    results = run_benchmarks([int(d) if d.is_integer() else d for d in days], args.stages, args.repeat, args.interval or 60, args.notes_per_day)
+    if args.output:
+        results.to_csv(args.output, mode="a", header=not os.path.exists(args.output), index=False)
+    if args.compare:
+        comparison = compare_results(results, pd.read_csv(args.compare), args.tolerance)
+        print(comparison.to_string(index=False))
+        sys.exit(1 if comparison["regression"].any() else 0)
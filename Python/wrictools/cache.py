@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import pandas as pd
+
+# This file includes the cache of processed recordings, see the `cache_dir` parameter of preprocess_WRIC_file().
+
+def cache_key(content, note_content, params):
+    """
+    Computes the key of a processed recording in the cache from the content of the data and note file,
+    the processing parameters and the source code of this library (so every update invalidates the cache).
+
+    Parameters:
+    ----------
+    content : bytes
+        Content of the WRIC data file.
+    note_content : bytes, pd.DataFrame or None
+        Content of the note file, an already parsed note log or None.
+    params : dict
+        Parameters that change the result (code, manual, combine, method, start, end, keywords_dict).
+
+    Returns:
+    -------
+    str
+        Hex digest identifying the processed result.
+    """
+    digest = hashlib.sha256()
+    digest.update(library_hash().encode())
+    digest.update(hashlib.sha256(content).digest())
+    if isinstance(note_content, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(note_content, index=False).to_numpy().tobytes())
+    elif note_content is not None:
+        digest.update(hashlib.sha256(note_content).digest())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def library_hash():
+    """
+    Helper Function that returns a hash of the source code of this package, used as library version in the cache key.
+    Not intended for modular use.
+    """
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in sorted(os.listdir(package_dir)):
+        if filename.endswith(".py"):
+            with open(os.path.join(package_dir, filename), "rb") as file:
+                digest.update(filename.encode() + hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+def load_from_cache(cache_dir, key):
+    """
+    Loads a processed recording from the cache.
+
+    Parameters:
+    ----------
+    cache_dir : str
+        Directory of the cache.
+    key : str
+        Key computed by cache_key().
+
+    Returns:
+    -------
+    tuple or None
+        (R1_metadata, R2_metadata, df_room1, df_room2, qc_room1, qc_room2) or None if the recording is not (or no longer)
+        cached, see save_to_cache().
+    """
+    filepath = os.path.join(cache_dir, f"{key}.pkl")
+    try:
+        with open(filepath, "rb") as file:
+            result = pickle.load(file)
+        os.utime(filepath)  # mark as recently used for the eviction
+        return result
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+def save_to_cache(cache_dir, key, result, max_size_mb=1000):
+    """
+    Saves a processed recording to the cache and evicts the least recently used entries
+    if the cache grows larger than `max_size_mb`.
+
+    Parameters:
+    ----------
+    cache_dir : str
+        Directory of the cache, created if it does not exist.
+    key : str
+        Key computed by cache_key().
+    result : tuple
+        (R1_metadata, R2_metadata, df_room1, df_room2) as returned by preprocess_WRIC_file(), followed by the
+        intervals flagged by the quality control of both rooms (see sensor_qc(), None without it).
+    max_size_mb : float, optional
+        Maximum size of the cache in megabytes. Default is 1000.
+
+    Notes:
+    ------
+    - Entries are pickle files; only use a cache directory that nobody else can write to.
+    - Entries are written to a temporary file first, so several processes can share one cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    filepath = os.path.join(cache_dir, f"{key}.pkl")
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, filepath)
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".pkl"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size_mb * 1024 * 1024 or path == filepath:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
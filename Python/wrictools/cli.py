@@ -0,0 +1,42 @@
+import argparse
+import logging
+from .io import OUTPUT_WRITERS
+from .processing import preprocess_WRIC_folder
+from .profiling import print_messages
+
+# This file includes the command line interface, e.g.: wric-preprocess path/to/folder --workers 4 --path-to-save processed
+
+def main(argv=None):
+    """
+    Preprocesses all WRIC files (and their note files) in a folder in parallel, see preprocess_WRIC_folder().
+    Exits with status 1 if any file could not be processed.
+
+    Parameters:
+    ----------
+    argv : list of str or None, optional
+        Command line arguments. Uses sys.argv if None.
+    """
+    parser = argparse.ArgumentParser(prog="wric-preprocess", description="Preprocess all WRIC files (and their note files) in a folder in parallel.")
+    parser.add_argument("folder_path", help="folder with the Results_1m_*.txt and note_*.txt files")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--path-to-save", default=None, help="folder to save the csv files to (default: current directory)")
+    parser.add_argument("--code", default="id", choices=["id", "id+comment"], help="how to name the output files")
+    parser.add_argument("--method", default="mean", choices=["mean", "median", "s1", "s2", "min", "max"], help="method for combining S1 and S2")
+    parser.add_argument("--no-combine", action="store_true", help="keep S1 and S2 measurements separate")
+    parser.add_argument("--format", default="csv", choices=list(OUTPUT_WRITERS) + ["parquet_dataset", "sqlite"], help="format of the saved files")
+    parser.add_argument("--cache-dir", default=None, help="cache directory to skip recordings that did not change since the last run")
+    parser.add_argument("--memory-budget-mb", type=float, default=None, help="process each file in chunks within this memory budget (in MB per worker)")
+    parser.add_argument("--qc", default="off", choices=["flag", "mask", "off"], help="quality control of the sensors: save the flagged intervals, also mask them in the data, or skip it (default)")
+    parser.add_argument("--summary", default=None, help="optional path to save the summary as csv")
+    parser.add_argument("--profile", action="store_true", help="report the time and memory of each processing stage")
+    parser.add_argument("--quiet", action="store_true", help="only show warnings and errors")
+    args = parser.parse_args(argv)
+    print_messages(logging.WARNING if args.quiet else logging.INFO)
+
+    summary = preprocess_WRIC_folder(args.folder_path, workers=args.workers, code=args.code, path_to_save=args.path_to_save,
+                                     combine=not args.no_combine, method=args.method, output_format=args.format, cache_dir=args.cache_dir,
+                                     profile=args.profile, memory_budget_mb=args.memory_budget_mb,
+                                     qc=None if args.qc == "off" else args.qc)
+    if args.summary:
+        summary.to_csv(args.summary, index=False)
+    raise SystemExit(0 if (summary["status"] == "ok").all() else 1)
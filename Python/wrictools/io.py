@@ -0,0 +1,778 @@
+import contextlib
+import io
+import os
+import re
+import numpy as np
+import pandas as pd
+from .profiling import logger, timed_stage
+
+# This file includes reading the WRIC data files (header, metadata, values, datetimes) and writing the processed output.
+
+# Columns of a single Room&Set block in the WRIC data file.
+# CAREFUL: Maastricht Instruments confused EE kcal and kJ in their original file, so if they ever fix this, the order of kcal and kJ should be reversed (again) here!
+WRIC_COLUMNS = [
+    "Date", "Time", "VO2", "VCO2", "RER", "FiO2", "FeO2", "FiCO2", "FeCO2",
+    "Flow", "Activity Monitor", "Energy Expenditure (kcal/min)", "Energy Expenditure (kJ/min)",
+    "Pressure Ambient", "Temperature", "Relative Humidity"
+]
+# (set, room) of the blocks in the order they appear in the file
+RAW_BLOCKS = [(set_num, room) for set_num in ['S1', 'S2'] for room in ['R1', 'R2']]
+# Title of a Room&Set block in the line above the column names, e.g. "Room 1 Set 1"
+BLOCK_PATTERN = re.compile(r"Room (\d+) Set (\d+)")
+# Metadata line of a room, e.g. "Room 1\tProject\tSubject ID\t...", followed by the line with the values
+METADATA_PATTERN = re.compile(r"Room (\d+)\t")
+
+def check_code(code, manual, R1_metadata, R2_metadata):
+    """
+    Extracts subject IDs from metadata, based on the provided code or manual input.
+
+    Parameters:
+    ----------
+    code : str
+        Type of code to use:
+        - "id": Use the "Subject ID" from metadata.
+        - "id+comment": Use the "Subject ID" concatenated with "Comments" from metadata.
+        - "manual": Use the manual code provided.
+    manual : list or None
+        A list of two strings, specifying custom codes for Room 1 and Room 2 subjects.
+        Should be provided if `code` is set to "manual". Default is None.
+    R1_metadata, R2_metadata : pandas.DataFrame
+        Metadata DataFrames for subjects in Room 1 and Room 2.
+
+    Returns:
+    -------
+    tuple
+        (code_1, code_2): Codes for subjects in Room 1 and Room 2.
+
+    Raises:
+    ------
+    ValueError
+        If `code` parameter is invalid or manual input is incorrect.
+    """
+    if code == "id":
+        code_1 = R1_metadata["Subject ID"].iloc[0]
+        code_2 = R2_metadata["Subject ID"].iloc[0]
+    elif code == "id+comment":
+        code_1 = R1_metadata["Subject ID"].iloc[0] + '_' + R1_metadata["Comments"].iloc[0]
+        code_2 = R2_metadata["Subject ID"].iloc[0] + '_' + R2_metadata["Comments"].iloc[0]
+    elif code == "manual" or manual != None:
+        try:
+            code_1 = manual[0]
+            code_2 = manual[1]
+        except ValueError as e:
+            logger.error("You have tried to enter a manual code (this is the filename that the metadata and data will be saved as). Please make sure your manual code is a list, e.g: ['1234_visit1', '5678_visit1'], where the first entry is for subject in room 1 and the second entry for subject in room 2.")
+    else:
+        raise ValueError("The value for the code parameter is not valid. Please choose id, id+comment or manual. Default is id.")
+    
+    return code_1, code_2
+
+def room_codes(code, manual, metadata):
+    """
+    Extracts the subject code of each room of a file with any number of rooms, see check_code().
+
+    Parameters:
+    ----------
+    code : str
+        Type of code to use ("id", "id+comment" or "manual"), see check_code().
+    manual : list, dict or None
+        Custom codes if `code` is "manual": a list with one code per room in the order of the room numbers,
+        e.g. ['1234_visit1', '5678_visit1', '9012_visit1'], or a dictionary with the room number as key.
+    metadata : dict
+        Metadata DataFrame of each room number, see read_room_metadata().
+
+    Returns:
+    -------
+    dict
+        Room number -> code.
+
+    Raises:
+    ------
+    ValueError
+        If `code` parameter is invalid or a manual code is missing for a room.
+    """
+    rooms = sorted(metadata)
+    if code == "id":
+        return {room: metadata[room]["Subject ID"].iloc[0] for room in rooms}
+    if code == "id+comment":
+        return {room: metadata[room]["Subject ID"].iloc[0] + '_' + metadata[room]["Comments"].iloc[0] for room in rooms}
+    if code == "manual" or manual is not None:
+        codes = manual if isinstance(manual, dict) else dict(zip(rooms, manual if manual is not None else []))
+        missing = [room for room in rooms if room not in codes]
+        if missing:
+            raise ValueError(f"No manual code for room {', '.join(map(str, missing))}. Please provide one code per room (this is the filename that the metadata and data "
+                             f"will be saved as), e.g. a list of {len(rooms)} codes for the rooms {rooms} or a dictionary with the room number as key.")
+        return {room: codes[room] for room in rooms}
+    raise ValueError("The value for the code parameter is not valid. Please choose id, id+comment or manual. Default is id.")
+
+def write_csv(df, filepath):
+    """
+    Writes a DataFrame to a CSV file (without index).
+    """
+    df.to_csv(filepath, index=False)
+
+def write_parquet(df, filepath, compression="zstd"):
+    """
+    Writes a DataFrame to a Parquet file (without index), keeping the datetime, float and int8 dtypes. Needs pyarrow.
+    """
+    df.to_parquet(filepath, index=False, compression=compression)
+
+def write_feather(df, filepath, compression="zstd"):
+    """
+    Writes a DataFrame to a Feather file, keeping the datetime, float and int8 dtypes. Needs pyarrow.
+    """
+    df.reset_index(drop=True).to_feather(filepath, compression=compression)
+
+# File extension and writer function(df, filepath) for each output format.
+# Add an entry to save the processed files in another format.
+OUTPUT_WRITERS = {
+    "csv": (".csv", write_csv),
+    "parquet": (".parquet", write_parquet),
+    "feather": (".feather", write_feather),
+}
+# File name of the study store of output_format="sqlite" in `path_to_save`, see StudyStore
+STORE_FILENAME = "WRIC_study.sqlite"
+
+class OutputStream:
+    """
+    Writes the data of one subject chunk by chunk to the file save_output() would write, so that the whole
+    data never has to be in memory (see preprocess_WRIC_file_chunked()). The result is the same as
+    saving all chunks at once; Parquet files get one row group and Feather files one record batch per chunk.
+
+    Parameters:
+    ----------
+    code : str
+        Code of the subject, used for naming the file.
+    kind : str
+        "data", "metadata" or "segments".
+    path_to_save : str or None
+        Directory path for saving the file. Uses current directory if None.
+    output_format : str, optional
+        "csv" (default), "parquet", "feather", "parquet_dataset" or "sqlite", see save_output().
+
+    Raises:
+    ------
+    ValueError
+        If the output format can not be written in chunks.
+
+    Examples:
+    --------
+    >>> with OutputStream("1234_visit1", "data", "./processed") as stream:
+    ...     for df in chunks:
+    ...         stream.write(df)
+    """
+    def __init__(self, code, kind, path_to_save, output_format="csv"):
+        if output_format not in ("csv", "parquet", "feather", "parquet_dataset", "sqlite"):
+            raise ValueError(f"Output format '{output_format}' can not be written in chunks. Use csv, parquet, feather, parquet_dataset or sqlite.")
+        self.filepath = output_path(code, kind, path_to_save, output_format)
+        self.code = code
+        self.kind = kind
+        self.output_format = output_format
+        self.writer = None
+        self.rows = 0
+        self.started = False
+        if output_format == "parquet_dataset":
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, df):
+        """Appends the rows of a DataFrame, which needs the same columns and dtypes as the previous chunks."""
+        if self.output_format == "csv":
+            # pandas writes only the date if all datetimes of a chunk are at midnight, unlike for the whole data
+            midnight = len(df) and all((col == col.dt.normalize()).all() for _, col in df.select_dtypes("datetime").items())
+            date_format = "%Y-%m-%d %H:%M:%S" if midnight else None
+            df.to_csv(self.filepath, index=False, mode="a" if self.started else "w", header=not self.started, date_format=date_format)
+        elif self.output_format == "sqlite":
+            from .store import StudyStore
+            if self.writer is None:
+                self.writer = StudyStore(self.filepath)
+            # the first chunk replaces the data saved for the code before, the others are appended
+            self.writer.write(df, self.code, self.kind, first_row=self.rows if self.started else None)
+        else:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.writer is None:
+                if self.output_format == "feather":
+                    self.writer = pa.ipc.new_file(self.filepath, table.schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+                else:
+                    import pyarrow.parquet as pq
+                    self.writer = pq.ParquetWriter(self.filepath, table.schema, compression="zstd")
+            self.writer.write_table(table)
+        self.started = True
+        self.rows += len(df)
+
+    def close(self):
+        """Finishes the file."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+def save_output(df, code, kind, path_to_save, output_format="csv"):
+    """
+    Saves processed data or metadata of one subject in the chosen output format.
+
+    Parameters:
+    ----------
+    df : pd.DataFrame
+        The data or metadata to save.
+    code : str
+        Code of the subject, used for naming the file.
+    kind : str
+        "data", "metadata" or "segments".
+    path_to_save : str or None
+        Directory path for saving the file. Uses current directory if None.
+    output_format : str, optional
+        One of the formats in OUTPUT_WRITERS ("csv", "parquet", "feather"), "parquet_dataset" or "sqlite".
+        "parquet_dataset" writes a cohort dataset partitioned by subject code to
+        `{path_to_save}/WRIC_{kind}/code={code}/`, which can be read at once with pd.read_parquet().
+        "sqlite" saves all subjects in the study store `{path_to_save}/WRIC_study.sqlite`, see StudyStore.
+        Default is "csv", saving the file as `{code}_WRIC_{kind}.csv`.
+
+    Raises:
+    ------
+    ValueError
+        If the output format is not supported.
+    """
+    filepath = output_path(code, kind, path_to_save, output_format)
+    if output_format == "parquet_dataset":
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        write_parquet(df, filepath)
+    elif output_format == "sqlite":
+        from .store import StudyStore  # the store needs the analysis functions, which need this module
+        with StudyStore(filepath) as store:
+            store.write(df, code, kind)
+    else:
+        OUTPUT_WRITERS[output_format][1](df, filepath)
+
+def output_path(code, kind, path_to_save, output_format="csv"):
+    """
+    Returns the path save_output() writes the data, metadata or segments ("data", "metadata" or "segments") of a subject to,
+    the study store for all subjects if the output format is "sqlite".
+
+    Raises:
+    ------
+    ValueError
+        If the output format is not supported.
+    """
+    if output_format == "parquet_dataset":
+        return os.path.join(path_to_save if path_to_save else ".", f"WRIC_{kind}", f"code={code}", "part-0.parquet")
+    if output_format == "sqlite":
+        return os.path.join(path_to_save if path_to_save else ".", STORE_FILENAME)
+    if output_format not in OUTPUT_WRITERS:
+        raise ValueError(f"Output format '{output_format}' is not supported. Use {', '.join(OUTPUT_WRITERS)}, parquet_dataset or sqlite.")
+    extension = OUTPUT_WRITERS[output_format][0]
+    return f'{path_to_save}/{code}_WRIC_{kind}{extension}' if path_to_save else f'{code}_WRIC_{kind}{extension}'
+
+def output_exists(code, kind, path_to_save, output_format="csv"):
+    """
+    Returns whether the data, metadata or segments of a subject were already saved by save_output().
+    """
+    filepath = output_path(code, kind, path_to_save, output_format)
+    if output_format != "sqlite" or not os.path.exists(filepath):
+        return os.path.exists(filepath)
+    from .store import StudyStore
+    with StudyStore(filepath) as store:
+        return store.has(code, kind)
+
+def extract_meta_data(lines, code, manual, save_csv, path_to_save, output_format="csv"):
+    """
+    Extracts metadata for two subjects from text lines and optionally saves it to files (CSV by default).
+
+    Parameters:
+    ----------
+    lines : list of str
+        Text lines containing metadata, with relevant data starting from line 4.
+    code : str
+        Method for generating subject IDs ("id", "id+comment", or "manual").
+    manual : list or None
+        Custom codes for subjects in Room 1 and Room 2, required if `code` is "manual".
+    save_csv : bool
+        Whether to save the extracted metadata to files.
+    path_to_save : str or None
+        Directory path for saving the files. Uses current directory if None.
+    output_format : str, optional
+        Format of the saved files, see save_output(). Default is "csv".
+
+    Returns:
+    -------
+    tuple
+        (code_1, code_2, R1_metadata, R2_metadata): Subject codes and metadata DataFrames.
+    """
+    metadata = read_room_metadata(lines)
+    if 1 not in metadata or 2 not in metadata:
+        raise ValueError(f"The file has metadata for the rooms {sorted(metadata)}, expected rooms 1 and 2. Use extract_room_meta_data() for other layouts.")
+    R1_metadata, R2_metadata = metadata[1], metadata[2]
+
+    code_1, code_2 = check_code(code, manual, R1_metadata, R2_metadata)
+    
+    if save_csv:
+        save_output(R1_metadata, code_1, "metadata", path_to_save, output_format)
+        save_output(R2_metadata, code_2, "metadata", path_to_save, output_format)
+        
+    return code_1, code_2, R1_metadata, R2_metadata
+
+def extract_room_meta_data(lines, code, manual, save_csv, path_to_save, output_format="csv"):
+    """
+    Extracts the metadata of every room that has data in a WRIC file (any number of rooms) and optionally saves it,
+    see extract_meta_data().
+
+    Parameters:
+    ----------
+    lines : list of str
+        Header lines of the WRIC file, up to and including the "Room 1 Set 1" line (see read_header()).
+    code : str
+        Method for generating subject IDs ("id", "id+comment", or "manual").
+    manual : list, dict or None
+        Custom codes for the subjects if `code` is "manual", see room_codes().
+    save_csv : bool
+        Whether to save the extracted metadata to files.
+    path_to_save : str or None
+        Directory path for saving the files. Uses current directory if None.
+    output_format : str, optional
+        Format of the saved files, see save_output(). Default is "csv".
+
+    Returns:
+    -------
+    tuple
+        (codes, metadata): Dictionaries of the subject code and the metadata DataFrame of each room number.
+
+    Raises:
+    ------
+    ValueError
+        If a room with data has no metadata, or if the code is invalid.
+    """
+    rooms = header_rooms(lines)
+    all_metadata = read_room_metadata(lines)
+    missing = [room for room in rooms if room not in all_metadata]
+    if missing:
+        raise ValueError(f"The file has data but no metadata for room {', '.join(map(str, missing))}.")
+    metadata = {room: all_metadata[room] for room in rooms}
+    codes = room_codes(code, manual, metadata)
+
+    if save_csv:
+        for room in rooms:
+            save_output(metadata[room], codes[room], "metadata", path_to_save, output_format)
+    return codes, metadata
+
+def read_room_metadata(lines):
+    """
+    Reads the metadata block of a WRIC file: every "Room N" line with the names of the fields, followed by a line with their values.
+
+    Parameters:
+    ----------
+    lines : list of str
+        Header lines of the WRIC file.
+
+    Returns:
+    -------
+    dict
+        Room number -> metadata DataFrame (one row, e.g. with the columns 'Project', 'Subject ID', 'Experiment performed by', 'Comments').
+
+    Raises:
+    ------
+    ValueError
+        If the metadata of a room appears twice (e.g. in exports of several calorimeters that were merged without renumbering the rooms).
+    """
+    metadata = {}
+    for i, line in enumerate(lines[:-1]):
+        match = METADATA_PATTERN.match(line)
+        if match is None:
+            continue
+        room = int(match.group(1))
+        if room in metadata:
+            raise ValueError(f"The metadata of room {room} appears twice in the WRIC file.")
+        names = line.strip().split('\t')
+        values = lines[i + 1].strip().split('\t')
+        metadata[room] = pd.DataFrame([dict(zip(names[1:], values))])
+    return metadata
+
+def parse_layout(line):
+    """
+    Reads the layout of the data block from the line with the block titles (e.g. "Room 1 Set 1", "Room 2 Set 1", ...).
+
+    Parameters:
+    ----------
+    line : str
+        The line above the column names of the data block.
+
+    Returns:
+    -------
+    list of tuple
+        (set, room, column) of each Room&Set block in the order of the file, e.g. ("S1", "R2", 17), where `column`
+        is the position of the first (Date) column of the block.
+
+    Raises:
+    ------
+    ValueError
+        If the line has no block titles or a Room&Set block appears twice.
+    """
+    layout = []
+    for column, title in enumerate(line.rstrip("\r\n").split('\t')):
+        match = BLOCK_PATTERN.fullmatch(title.strip())
+        if match:
+            layout.append((f"S{match.group(2)}", f"R{match.group(1)}", column))
+    if not layout:
+        raise ValueError("Could not find the Room&Set blocks (e.g. 'Room 1 Set 1') of the data block in the WRIC file.")
+    blocks = [(set_num, room) for set_num, room, _ in layout]
+    if len(set(blocks)) < len(blocks):
+        raise ValueError("A Room&Set block appears twice in the data block of the WRIC file, renumber the rooms of merged exports.")
+    return layout
+
+def header_rooms(lines):
+    """
+    Returns the (sorted) numbers of the rooms that have data in a WRIC file, from the header lines (see parse_layout()).
+    """
+    layout = parse_layout(lines[find_data_start(lines) - 1])
+    return sorted({int(room[1:]) for _, room, _ in layout})
+
+def decode_bytes(content):
+    """
+    Helper Function that decodes the content of a WRIC or note file. Files are read as UTF-8,
+    falling back to Latin-1 for files written with a Windows code page. Not intended for modular use.
+    """
+    try:
+        return bytes(content).decode("utf-8")
+    except UnicodeDecodeError:
+        return bytes(content).decode("latin-1")
+
+@contextlib.contextmanager
+def open_text(source):
+    """
+    Helper Function that opens a path, bytes or a (text or binary) file-like object as a text buffer.
+    Buffers passed in by the caller are not closed. Not intended for modular use.
+
+    Raises:
+    ------
+    TypeError
+        If a path is given that does not lead to a .txt file.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if not os.fspath(source).lower().endswith('.txt'):
+            raise TypeError("The file must be a .txt file.")
+        with open(source, "r") as file:
+            yield file
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.StringIO(decode_bytes(source))
+    elif isinstance(source, io.TextIOBase):
+        yield source
+    else:
+        yield io.StringIO(decode_bytes(source.read()))
+
+def open_file(filepath):
+    """
+    Opens a WRIC .txt file and reads its content.
+
+    Parameters:
+    ----------
+    filepath : str, bytes or file-like
+        Path to the .txt file, or its content as bytes or an (already opened) text or binary buffer.
+
+    Returns:
+    -------
+    list of str
+        Lines read from the file.
+
+    Raises:
+    ------
+    TypeError
+        If the file is not a .txt file.
+    ValueError
+        If the file does not start with the expected "OmniCal software" header.
+    FileNotFoundError
+        If the file does not exist at the given filepath.
+    """
+    lines = None
+    try:
+        with open_text(filepath) as file:
+            lines = file.readlines()
+            if not lines or not lines[0].startswith("OmniCal software"):
+                raise ValueError("The provided file is not the WRIC data file.")
+    except FileNotFoundError as e:
+        logger.error("The filepath you provided does not lead to a file.")
+    return lines
+
+def find_data_start(lines):
+    """
+    Finds the index of the column header line of the data block in a WRIC file.
+
+    Parameters:
+    ----------
+    lines : list of str
+        Lines of the WRIC file (at least up to the "Room 1 Set 1" line).
+
+    Returns:
+    -------
+    int
+        Index of the line containing the column names (directly after the block titles, e.g. "Room 1 Set 1").
+
+    Raises:
+    ------
+    ValueError
+        If no "Room N Set M" line is found.
+    """
+    for i, line in enumerate(lines):
+        if BLOCK_PATTERN.match(line):  # Detect where the actual data starts
+            return i + 1
+    raise ValueError("Could not find the start of the data block ('Room 1 Set 1') in the WRIC file.")
+
+def parse_wric_data(buffer, skip_header=True, layout=None):
+    """
+    Parses the data block of a WRIC file in a single pass with fixed dtypes.
+
+    The measurements are parsed in chunks into one float64 buffer (see parse_wric_values()), so each value is
+    materialised once and the DataFrame is a view of the buffer. The columns of each room are next to each other,
+    so a room is a slice of the buffer as well (see split_rooms()).
+
+    Parameters:
+    ----------
+    buffer : file-like
+        Text buffer positioned at the column header line of the data block (the line after "Room 1 Set 1").
+    skip_header : bool, optional
+        Whether the buffer starts with the column header line. Set to False to parse data rows only. Default is True.
+    layout : list of tuple or None, optional
+        Room&Set blocks of the file, see parse_layout(). None (default) is the layout of two rooms, see RAW_BLOCKS.
+
+    Returns:
+    -------
+    pd.DataFrame
+        DataFrame with a 'datetime' column followed by the float64 measurement columns
+        named e.g. 'R1_S1_VO2', ordered by room and then in the order of the file (R1_S1, R1_S2, R2_S1, R2_S2 for two rooms).
+
+    Raises:
+    ------
+    ValueError
+        If Date or Time columns are inconsistent across rows. The offending rows are reported.
+    """
+    datetimes, values, names = parse_wric_values(buffer, skip_header, layout)
+    df = pd.DataFrame(values, columns=names, copy=False)
+    df.insert(0, 'datetime', datetimes)
+    return df
+
+def parse_wric_values(buffer, skip_header=True, layout=None, chunk_rows=None):
+    """
+    Parses the data block of a WRIC file chunk by chunk (see parse_wric_chunks()) into one preallocated buffer.
+
+    Counting the rows first (see count_rows()) reads the data block a second time, about 5% of the parsing time.
+    It is kept on purpose, as it bounds the peak memory: keeping the chunks and copying them once into the final
+    buffer holds all values twice, and a buffer that grows while parsing is copied on growth and over-allocated at
+    the end. Either way the peak of preprocess_WRIC_file() exceeds twice the raw data (see
+    benchmark.check_memory()), whereas the preallocated buffer holds the values once next to one parsed chunk.
+
+    Parameters:
+    ----------
+    buffer : file-like
+        Text buffer positioned at the column header line of the data block. If it is seekable, the rows are
+        counted first so that the buffer has the right size, otherwise the buffer grows while parsing.
+    skip_header : bool, optional
+        Whether the buffer starts with the column header line. Default is True.
+    layout : list of tuple or None, optional
+        Room&Set blocks of the file, see parse_layout(). None (default) is the layout of two rooms, see RAW_BLOCKS.
+    chunk_rows : int or None, optional
+        Number of rows parsed at once, about 4 MB of values if None (default).
+
+    Returns:
+    -------
+    tuple
+        (datetimes, values, names): datetime64[ns] array of the rows, float64 array (rows x columns) in Fortran order
+        (each column contiguous) and the names of its columns, ordered by room (see parse_wric_data()).
+
+    Raises:
+    ------
+    ValueError
+        If Date or Time columns are inconsistent across rows. The offending rows are reported.
+    """
+    raw_names = raw_columns(layout)[0]
+    names = [name for name in raw_names if not name.endswith(("_Date", "_Time"))]
+    names = sorted(names, key=lambda name: int(name.split('_', 1)[0][1:]))  # stable, so within a room in the order of the file
+    chunk_rows = max(1024, 4_000_000 // (8 * len(names))) if chunk_rows is None else chunk_rows
+    if skip_header:
+        buffer.readline()
+    capacity = count_rows(buffer) if buffer.seekable() else chunk_rows
+
+    datetimes = np.empty(capacity, dtype='datetime64[ns]')
+    values = np.empty((capacity, len(names)), dtype=np.float64, order='F')
+    rows = 0
+    for chunk in parse_wric_chunks(buffer, chunk_rows, skip_header=False, layout=layout):
+        if rows + len(chunk) > capacity:
+            capacity = max(2 * capacity, rows + len(chunk))
+            datetimes = np.concatenate([datetimes[:rows], np.empty(capacity - rows, dtype='datetime64[ns]')])
+            grown = np.empty((capacity, len(names)), dtype=np.float64, order='F')
+            grown[:rows] = values[:rows]
+            values = grown
+        datetimes[rows:rows + len(chunk)] = chunk['datetime'].to_numpy(dtype='datetime64[ns]')
+        for column, name in enumerate(names):
+            values[rows:rows + len(chunk), column] = chunk[name].to_numpy()
+        rows += len(chunk)
+    return datetimes[:rows], values[:rows], names
+
+def count_rows(buffer):
+    """
+    Helper Function that counts the remaining lines of a seekable text buffer and returns to the current position.
+    Not intended for modular use.
+    """
+    position = buffer.tell()
+    rows, last = 0, '\n'
+    for block in iter(lambda: buffer.read(1 << 20), ''):
+        rows += block.count('\n')
+        last = block
+    buffer.seek(position)
+    return rows + (not last.endswith('\n'))  # the last line might have no line break
+
+def parse_wric_chunks(buffer, chunk_rows, skip_header=True, layout=None):
+    """
+    Parses the data block of a WRIC file in chunks of rows, see parse_wric_data().
+
+    Parameters:
+    ----------
+    buffer : file-like
+        Text buffer positioned at the column header line of the data block (the line after "Room 1 Set 1").
+    chunk_rows : int
+        Number of rows per chunk.
+    skip_header : bool, optional
+        Whether the buffer starts with the column header line. Default is True.
+    layout : list of tuple or None, optional
+        Room&Set blocks of the file, see parse_layout(). None (default) is the layout of two rooms, see RAW_BLOCKS.
+
+    Yields:
+    -------
+    pd.DataFrame
+        The chunks as returned by parse_wric_data(), indexed by the row number in the data block.
+        At least one (possibly empty) chunk is yielded.
+
+    Raises:
+    ------
+    ValueError
+        If Date or Time columns are inconsistent across rows. The offending rows are reported.
+    """
+    if skip_header:
+        buffer.readline()
+    raw_names, usecols, dtypes = raw_columns(layout)
+    reader = pd.read_csv(buffer, sep="\t", header=None, names=raw_names, usecols=usecols, dtype=dtypes, engine="c", chunksize=chunk_rows)
+    empty = True
+    while True:
+        with timed_stage("parse_values") as stage:
+            df = next(reader, None)
+            stage["rows"] = 0 if df is None else len(df)
+        if df is None:
+            break
+        with timed_stage("parse_dates") as stage:
+            stage["rows"] = len(df)
+            values = parse_datetimes(df, raw_names)
+        empty = False
+        yield values
+    if empty:
+        yield parse_datetimes(pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in dtypes.items()}), raw_names)
+
+def raw_columns(layout=None):
+    """
+    Helper Function that returns the names, positions and dtypes of the columns read from the data block
+    with the given layout (see parse_layout()). Not intended for modular use.
+    """
+    if layout is None:
+        # each Room&Set block is followed by an empty separator column
+        layout = [(set_num, room, block * (len(WRIC_COLUMNS) + 1)) for block, (set_num, room) in enumerate(RAW_BLOCKS)]
+    raw_names, usecols = [], []
+    for set_num, room, column in layout:
+        for i, col in enumerate(WRIC_COLUMNS):
+            raw_names.append(f"{room}_{set_num}_{col}")
+            usecols.append(column + i)
+    dtypes = {name: (str if name.endswith(("_Date", "_Time")) else np.float64) for name in raw_names}
+    return raw_names, usecols, dtypes
+
+def parse_datetimes(df, raw_names):
+    """
+    Helper Function for parse_wric_data() that checks the Date and Time columns and replaces them by one 'datetime' column.
+    Not intended for modular use.
+    """
+    # Check that time and date columns are consistent across rows
+    date_columns = df[[name for name in raw_names if name.endswith("_Date")]]
+    time_columns = df[[name for name in raw_names if name.endswith("_Time")]]
+    mismatch = (date_columns.ne(date_columns.iloc[:, 0], axis=0) & date_columns.notna()).any(axis=1)
+    mismatch |= (time_columns.ne(time_columns.iloc[:, 0], axis=0) & time_columns.notna()).any(axis=1)
+    if mismatch.any():
+        rows = df.index[mismatch.to_numpy()]
+        raise ValueError(f"Date or Time columns do not match in {len(rows)} rows (data rows {rows[:10].tolist()}{', ...' if len(rows) > 10 else ''})")
+
+    # Combine Date and Time to datetime (fixed format) and keep only the measurement columns
+    datetimes = pd.to_datetime(date_columns.iloc[:, 0], format='%m/%d/%y', cache=True) + pd.to_timedelta(time_columns.iloc[:, 0])
+    # concatenated instead of inserted, as a file with many rooms has hundreds of columns
+    values = pd.concat([datetimes.rename('datetime'), df.drop(columns=list(date_columns.columns) + list(time_columns.columns))], axis=1)
+    return values
+
+def read_wric_file(filepath):
+    """
+    Reads a WRIC .txt file once: scans the header lines and parses the data block.
+
+    Parameters:
+    ----------
+    filepath : str, bytes or file-like
+        Path to the .txt file, or its content as bytes or an (already opened) text or binary buffer,
+        e.g. a file exported from REDCap without saving it to disk.
+
+    Returns:
+    -------
+    tuple
+        (lines, df): Header lines up to and including the "Room 1 Set 1" line
+        (to be used by extract_meta_data) and the parsed data of all rooms (see parse_wric_data).
+
+    Raises:
+    ------
+    TypeError
+        If the file is not a .txt file.
+    ValueError
+        If the file does not start with the expected "OmniCal software" header,
+        if the data block cannot be found or if Date/Time columns are inconsistent.
+    FileNotFoundError
+        If the file does not exist at the given filepath.
+    """
+    with open_text(filepath) as file:
+        with timed_stage("read_header"):
+            lines = read_header(file)
+        df = parse_wric_data(file, layout=parse_layout(lines[-1]))
+    return lines, df
+
+def read_header(file):
+    """
+    Reads the header lines of a WRIC file up to and including the line with the block titles (e.g. "Room 1 Set 1").
+
+    Parameters:
+    ----------
+    file : file-like
+        Open text file positioned at the start of the WRIC file. Afterwards it is positioned
+        at the column header line of the data block.
+
+    Returns:
+    -------
+    list of str
+        The header lines (to be used by extract_meta_data).
+
+    Raises:
+    ------
+    ValueError
+        If the file does not start with the expected "OmniCal software" header or has no data block.
+    """
+    lines = []
+    for line in iter(file.readline, ''):
+        lines.append(line)
+        if BLOCK_PATTERN.match(line):
+            break
+    if not lines or not lines[0].startswith("OmniCal software"):
+        raise ValueError("The provided file is not the WRIC data file.")
+    find_data_start(lines)  # raises if the file has no data block
+    return lines
+
+def source_bytes(source):
+    """
+    Helper Function that returns the content of a path, bytes or buffer as bytes. Not intended for modular use.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return file.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    content = source.read()
+    return content.encode("utf-8") if isinstance(content, str) else content
@@ -0,0 +1,351 @@
+import functools
+import os
+import re
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from .io import open_file
+from .profiling import logger, timed_stage
+
+# This file includes parsing the note files and deriving the protocol (e.g. sleeping, eating) from the notes.
+
+# Extend or change this dictionary to suit your study protocol (or pass your own keywords_dict). Words will be matched case-insensitive.
+KEYWORDS_DICT = {
+    'sleeping': (["seng", "sleeping", "bed", "sove", "soeve", "godnat", "night", "sleep"], 1),
+    'eating': ([["start", "begin", "began"],["maaltid", "måltid", "eat", "meal", "food", "spis", "maal", "måd", "mad", "frokost", "morgenmad", "middag", "snack", "aftensmad"]], 2),
+    'stop_sleeping' : (["vaagen", "vågen", "vaekke", "væk", "wake", "woken", "vaagnet"], 0),
+    'stop_anything': (["faerdig", "færdig", "stop", "end ", "finished", "slut"], 0),
+    'activity': ([["start", "begin", "began"], ["step", "exercise", "physicial activity", "active", "motion", "aktiv"]], 3),
+    'ree_start': ([["start", "begin", "began"], ["REE", "BEE", "BMR", "RMR", "RER"]], 4),
+}
+# Keywords for entering and exiting the chamber used by detect_start_end()
+START_END_KEYWORDS = {
+    'end': ["ud", "exit", "out"], #maybe as added safety check, check that it is the last/first note for that participant
+    'start': ["ind i kammer", "enter", "ind", "entry"]
+}
+TIME_PATTERN = r"([0-9]|0[0-9]|1[0-9]|2[0-3]):[0-5]\d"
+DRIFT_PATTERN = r"^\d{2}:\d{2}(:\d{2})?$"
+
+def protocol_segments(df, room=None):
+    """
+    Creates the segment table of a processed room DataFrame: one row per continuous period with the same protocol.
+
+    Parameters:
+    ----------
+    df : pd.DataFrame
+        Processed data of one room, sorted by 'datetime' and with a 'protocol' column.
+    room : int or None, optional
+        Room number to add as column 'room'.
+
+    Returns:
+    -------
+    pd.DataFrame
+        Columns 'room', 'protocol', 'occurrence' (counting from 1 per protocol), 'start' (first datetime of the segment),
+        'end' (first datetime of the next segment, or the last datetime for the last segment),
+        'row_start' and 'row_stop' (positional row range, `df.iloc[row_start:row_stop]`).
+    """
+    protocol = df['protocol'].to_numpy()
+    datetimes = df['datetime'].to_numpy()
+    changes = np.flatnonzero(protocol[1:] != protocol[:-1]) + 1
+    row_start = np.concatenate([[0], changes]) if len(df) else np.array([], dtype=np.int64)
+    row_stop = np.concatenate([changes, [len(df)]]) if len(df) else np.array([], dtype=np.int64)
+
+    segments = pd.DataFrame({
+        'room': room,
+        'protocol': protocol[row_start],
+        'occurrence': 0,
+        'start': datetimes[row_start],
+        'end': datetimes[np.minimum(row_stop, len(df) - 1)],
+        'row_start': row_start,
+        'row_stop': row_stop,
+    })
+    segments['occurrence'] = segments.groupby('protocol').cumcount() + 1
+    return segments
+
+def update_protocol(df, protocol_list, running_max=None):
+    """
+    Helper Function for extract_note_info() that updates the protocol column based on a list.
+    Not intended for modular use.
+
+    Each row gets the value of the last (sorted) protocol timestamp at or before its datetime,
+    0 before the first one. The lookup is a single searchsorted over the running maximum of
+    the datetimes, so rows are never matched to an earlier protocol than a previous row.
+    If the data is labelled in chunks, `running_max` is the running maximum (as int64 nanoseconds)
+    at the end of the previous chunk.
+    """
+    timestamps = np.array([ts for ts, _ in protocol_list], dtype='datetime64[ns]').view('i8')
+    values = np.array([0] + [value for _, value in protocol_list], dtype=np.int8)
+
+    # NaT is the smallest int64, so it never advances the running maximum
+    datetimes = np.maximum.accumulate(df['datetime'].to_numpy(dtype='datetime64[ns]').view('i8')) if len(df) else np.array([], dtype='i8')
+    if running_max is not None:
+        datetimes = np.maximum(datetimes, running_max)
+    df['protocol'] = values[np.searchsorted(timestamps, datetimes, side='right')]
+
+    return df
+
+def read_note_file(notes_path):
+    """
+    Reads a note file into a DataFrame with the columns 'Comment' and 'datetime'.
+
+    The parsed note log is cached per file (path, modification time and size), so that
+    detect_start_end() and extract_note_info() share a single read and parse of the same file.
+    The returned DataFrame is shared between callers and should not be modified in place.
+
+    Parameters:
+    ----------
+    notes_path : str, bytes, file-like or pd.DataFrame
+        Path to the note file (.txt), or its content as bytes or a buffer (not cached).
+        An already parsed note log is returned as is.
+
+    Returns:
+    -------
+    pd.DataFrame
+        One row per note with the stripped 'Comment' and its 'datetime'.
+    """
+    if isinstance(notes_path, pd.DataFrame):
+        return notes_path
+    if not isinstance(notes_path, (str, os.PathLike)):
+        return parse_note_lines(open_file(notes_path))
+    stat = os.stat(notes_path)
+    return parse_note_file(os.path.realpath(notes_path), stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=256)
+def parse_note_file(notes_path, mtime_ns, size):
+    """
+    Helper Function for read_note_file() that parses a note file, cached by modification time and size.
+    Not intended for modular use.
+    """
+    return parse_note_lines(open_file(notes_path))
+
+def parse_note_lines(notes_content):
+    """
+    Helper Function for read_note_file() that parses the lines of a note file. Not intended for modular use.
+    """
+    lines = [line.strip().split('\t') for line in notes_content[2:]]
+    df_note = pd.DataFrame(lines[2:], columns=lines[0])
+    df_note = df_note.dropna().reset_index(drop=True)
+
+    # combine to datetime
+    df_note['datetime'] = pd.to_datetime(df_note['Date'] + ' ' + df_note['Time'], format='%m/%d/%y %H:%M:%S')
+    return df_note.drop(columns=['Date', 'Time'])
+
+@functools.lru_cache(maxsize=256)
+def keyword_pattern(words):
+    """
+    Helper Function that compiles a tuple of keywords into a single case-insensitive regex alternation.
+    Keywords are matched as plain substrings. Not intended for modular use.
+    """
+    return re.compile('|'.join(re.escape(word.lower()) for word in words))
+
+def compile_keywords(keywords_dict):
+    """
+    Compiles a keywords dictionary (see KEYWORDS_DICT) into regexes that can be matched against all notes at once.
+
+    Parameters:
+    ----------
+    keywords_dict : dict
+        Mapping of category to (keywords, value). `keywords` is either a list of words (one
+        word has to match) or a list of lists of words (one word of each list has to match).
+
+    Returns:
+    -------
+    tuple
+        (patterns, categories): A list of compiled regexes, one per distinct keyword group, and
+        a list of (group indices, value) per category in the order of `keywords_dict`.
+    """
+    patterns, group_index, categories = [], {}, []
+    for keywords, value in keywords_dict.values():
+        groups = keywords if isinstance(keywords[0], (list, tuple)) else [keywords]
+        indices = []
+        for group in groups:
+            group = tuple(group)
+            if group not in group_index:
+                group_index[group] = len(patterns)
+                patterns.append(keyword_pattern(group))
+            indices.append(group_index[group])
+        categories.append((indices, value))
+    return patterns, categories
+
+def note_participants(df_note, rooms=(1, 2)):
+    """
+    Helper Function that returns the participant a note refers to: the room number the comment starts with,
+    otherwise 0 (all participants). The longest matching number wins, so "12 ..." refers to room 12 if there
+    is one and to room 1 otherwise. Not intended for modular use.
+    """
+    rooms = sorted(rooms, key=lambda room: len(str(room)), reverse=True)
+    comments = df_note['Comment']
+    return np.select([comments.str.startswith(str(room)).to_numpy(dtype=bool) for room in rooms], rooms, 0)
+
+def label_notes(df_note, keywords_dict=None, rooms=(1, 2)):
+    """
+    Labels all notes with protocol values in one vectorized pass over the comments.
+
+    Every keyword group is matched against all (lower-cased) comments at once. If a comment contains
+    a time (e.g. "6:45" or "06:45"), the first one replaces the time of the note. When several
+    categories match the same participant and time, the last one (in file and dictionary order) wins.
+
+    Parameters:
+    ----------
+    df_note : pd.DataFrame
+        Note log as returned by read_note_file().
+    keywords_dict : dict or None, optional
+        Keywords to label the notes with, see KEYWORDS_DICT (default if None).
+    rooms : sequence of int, optional
+        Numbers of the rooms (participants) of the recording. Default is (1, 2).
+
+    Returns:
+    -------
+    pd.DataFrame
+        One row per protocol change with the columns 'participant' (the room number), 'datetime' and 'protocol',
+        sorted by participant and datetime.
+    """
+    patterns, categories = compile_keywords(KEYWORDS_DICT if keywords_dict is None else keywords_dict)
+    comments = df_note['Comment'].str.lower()
+    group_hits = np.array([comments.str.contains(pattern).to_numpy(dtype=bool) for pattern in patterns]).reshape(len(patterns), len(df_note))
+    category_hits = np.array([group_hits[indices].all(axis=0) for indices, _ in categories]).reshape(len(categories), len(df_note))
+    values = np.array([value for _, value in categories], dtype=np.int8)
+
+    # check if a different timestamp is written in the message and use that one instead
+    # only checks first time stamp and only in format 6:45 or 06:45
+    time_str = df_note['Comment'].str.extract(f"({TIME_PATTERN})").iloc[:, 0]
+    timestamps = (df_note['datetime'].dt.normalize() + pd.to_timedelta(time_str + ':00')).where(time_str.notna(), df_note['datetime'])
+
+    # (row, category) pairs of all matches in file order, then expanded to all participants if needed
+    rows, cats = np.nonzero(category_hits.T)
+    participants = note_participants(df_note, rooms)[rows]
+    events = pd.DataFrame({
+        'participant': participants,
+        'datetime': timestamps.to_numpy()[rows],
+        'protocol': values[cats],
+    })
+    both = events['participant'] == 0
+    events = pd.concat([events[~both]] + [events[both].assign(participant=room) for room in rooms])
+    events = events.sort_index(kind='stable').reset_index(drop=True)
+
+    events = events.drop_duplicates(subset=['participant', 'datetime'], keep='last')
+    return events.sort_values(['participant', 'datetime'], kind='stable').reset_index(drop=True)
+
+def detect_drift(df_note):
+    """
+    Detects the time drift between the clock of the notes and the actual time.
+
+    If the first note only contains a time (e.g. "21:15:29"), this is the real time at which the note was
+    created and the difference to the time of the note is the drift.
+
+    Parameters:
+    ----------
+    df_note : pd.DataFrame
+        Note log as returned by read_note_file().
+
+    Returns:
+    -------
+    pd.Timedelta or None
+        The drift to add to all datetimes, None if the first note is not a time.
+    """
+    if df_note.empty or not re.fullmatch(DRIFT_PATTERN, df_note['Comment'].iloc[0]):
+        return None
+    first = df_note.iloc[0]
+    new_datetime = pd.Timestamp(datetime.combine(first['datetime'].date(), pd.Timestamp(first['Comment']).time()))
+    return new_datetime - first['datetime']
+
+def detect_start_end(notes_path, keywords_dict=None, rooms=(1, 2)):
+    """
+    Automatically detect enter and exit from the chamber based on the notefile and returns the times for the participants
+
+    Args:
+        notes_path (string): path to the note file
+        keywords_dict (dict, optional): dictionary with the keywords for 'start' and 'end', see START_END_KEYWORDS (default if None)
+        rooms (sequence of int, optional): numbers of the rooms (participants) of the recording, default (1, 2)
+
+    Returns:
+        dictionary: dictionary of participant/room number and for each a touple (start, end) time, None if not possible to find
+    """
+    keywords_dict = START_END_KEYWORDS if keywords_dict is None else keywords_dict
+    df_note = read_note_file(notes_path)
+
+    comments = df_note['Comment'].str.lower()
+    is_start = comments.str.contains(keyword_pattern(tuple(keywords_dict['start']))).to_numpy(dtype=bool)
+    is_end = comments.str.contains(keyword_pattern(tuple(keywords_dict['end']))).to_numpy(dtype=bool)
+    # only the first notes (one per room) can be an entry and only the last ones an exit
+    in_first = df_note['datetime'].isin(df_note['datetime'].head(len(rooms))).to_numpy()
+    in_last = df_note['datetime'].isin(df_note['datetime'].tail(len(rooms))).to_numpy()
+    participants = note_participants(df_note, rooms)
+
+    start_end_times = {room: (None, None) for room in rooms}
+    for participant in start_end_times:
+        relevant = (participants == participant) | (participants == 0)
+        starts = np.flatnonzero(relevant & is_start & in_first)
+        first_start = starts[0] if len(starts) else len(df_note)
+        # a start keyword is checked first, so a note only counts as exit once the start is found
+        ends = np.flatnonzero(relevant & is_end & in_last & ~(is_start & (np.arange(len(df_note)) <= first_start)))
+        start_end_times[participant] = (
+            df_note['datetime'].iloc[starts[0]] if len(starts) else None,
+            df_note['datetime'].iloc[ends[0]] if len(ends) else None,
+        )
+
+    return start_end_times
+
+def extract_note_info(notes_path, df_room1, df_room2, keywords_dict=None):
+    """
+    Extracts and processes note information from a specified notes file, categorizing events 
+    based on predefined keywords, and updates two DataFrames with protocol information for 
+    different participants.
+
+    Parameters:
+    ----------
+    notes_path : str
+        The file path to the notes file containing event data.
+    df_room1 : pd.DataFrame
+        DataFrame associated with participant 1, to be updated with extracted protocol information.
+    df_room2 : pd.DataFrame
+        DataFrame associated with participant 2, to be updated with extracted protocol information.
+    keywords_dict : dict or None, optional
+        Keywords used to extract the protocol values, see KEYWORDS_DICT (default if None).
+
+    Returns:
+    -------
+    tuple
+        A tuple containing two updated DataFrames: 
+        - df_room1: Updated DataFrame for participant 1 with protocol data.
+        - df_room2: Updated DataFrame for participant 2 with protocol data.
+
+    Notes:
+    -----
+    - The 'Comment' field is expected to start with '1' or '2' to indicate the participant, 
+      or it can be empty for both.
+    - The keywords dictionary can be modified to suit specific study protocols and includes 
+      multi-group checks for keyword matching.
+    - If the first note is only a time, it is used as time drift for the data and all notes.
+    """
+    with timed_stage("notes") as stage:
+        drift, protocol_lists = protocol_events(notes_path, keywords_dict)
+        stage["rows"] = len(protocol_lists[1]) + len(protocol_lists[2])
+    if drift is not None:
+        logger.info(f"drift {drift}")
+        # Add drift to all datetimes in the normal dataframe as well!
+        df_room1["datetime"] = df_room1["datetime"] + drift
+        df_room2["datetime"] = df_room2["datetime"] + drift
+
+    with timed_stage("protocol") as stage:
+        df_room1 = update_protocol(df_room1, protocol_lists[1])
+        df_room2 = update_protocol(df_room2, protocol_lists[2])
+        stage["rows"] = len(df_room1) + len(df_room2)
+
+    return df_room1, df_room2
+
+def protocol_events(notes_path, keywords_dict=None, rooms=(1, 2)):
+    """
+    Helper Function for extract_note_info() that returns the time drift of the notes and the (datetime, protocol) list
+    of each participant (room number), with the drift added. Not intended for modular use.
+    """
+    df_note = read_note_file(notes_path)
+    drift = detect_drift(df_note)
+
+    events = label_notes(df_note, keywords_dict, rooms)
+    if drift is not None:
+        events['datetime'] = events['datetime'] + drift
+
+    protocol_lists = {participant: list(events.loc[events['participant'] == participant, ['datetime', 'protocol']].itertuples(index=False, name=None))
+                      for participant in rooms}
+    return drift, protocol_lists
@@ -0,0 +1,1442 @@
+import concurrent.futures
+import contextvars
+import hashlib
+import io
+import json
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from .cache import cache_key, library_hash, load_from_cache, save_to_cache
+from .io import (OutputStream, check_code, decode_bytes, extract_meta_data, extract_room_meta_data, find_data_start, header_rooms, open_text,
+                 parse_layout, parse_wric_chunks, parse_wric_data, read_header, read_room_metadata, read_wric_file, room_codes,
+                 save_output, source_bytes)
+from .notes import detect_start_end, protocol_events, protocol_segments, read_note_file, update_protocol
+from .profiling import CURRENT_PROFILE, StageProfiler, logger, profile_run, timed_stage
+from .qc import QC_MODES, log_qc, mask_qc, sensor_qc
+
+# This file includes the preprocessing of WRIC recordings: splitting the rooms, combining S1 and S2, cutting to the stay
+# in the chamber, the WRICRecording container, follow mode and the parallel processing of a study folder.
+# Files with any number of rooms are processed by preprocess_WRIC_rooms(); the other functions expect the two rooms of OmniCal.
+
+# Approximate peak memory in bytes per row of a chunk in iter_WRIC_chunks() (parsing the raw text, splitting, combining and
+# labelling the rows), used to derive the rows per chunk from the memory budget.
+ROW_BYTES = 4000
+
+def add_relative_time(df, start_time=None):
+    """
+    Add Relative Time in minutes to DataFrame.
+
+    Parameters:
+    ----------
+    df : pd.DataFrame 
+        A DataFrame containing a 'datetime' column.
+    start_time : str or pd.Timestamp, optional 
+        The starting time for calculating relative time. Defaults to None, 
+        in which case the first datetime in the DataFrame is used. Previous rows will be indicated negative from the start_time.
+
+    Returns:
+    -------
+    pd.DataFrame: The original DataFrame with an additional column 'relative_time[min]' 
+        indicating the time in minutes from the start time.
+    """
+    if start_time is None:
+        start_time = df['datetime'].iloc[0]
+    start_time = pd.to_datetime(start_time)
+    df['relative_time[min]'] = (df['datetime'] - start_time).dt.total_seconds() /60
+    
+    return df
+    
+def cut_rows(df, start=None, end=None):
+    """
+    Filters rows in a DataFrame based on a start and end datetime range.
+
+    Parameters:
+    ----------
+    df : pd.DataFrame
+        DataFrame with a "datetime" column to filter.
+    start : str or datetime-like or None, optional
+        Start datetime; rows before this will be removed.
+    end : str or datetime-like or None, optional
+        End datetime; rows after this will be removed.
+
+    Returns:
+    -------
+    pd.DataFrame
+        DataFrame with rows between the specified start and end dates.
+        If the datetimes are sorted, this is a slice of `df` found by binary search instead of a copy.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df['datetime']):
+        df['datetime'] = pd.to_datetime(df['datetime'])
+    if pd.isna(start) and pd.isna(end):
+        return df 
+    return df.iloc[row_window(df['datetime'].to_numpy(dtype='datetime64[ns]'), start, end)]
+
+def row_window(datetimes, start=None, end=None):
+    """
+    Helper Function for cut_rows() that returns the rows of `datetimes` (a datetime64[ns] array) between `start` and
+    `end`: a slice found by binary search if the datetimes are sorted, otherwise a boolean mask. Computed once for
+    the datetimes shared by all rooms in process_rooms(). Not intended for modular use.
+    """
+    if pd.isna(start) and pd.isna(end):
+        return slice(None)
+    start = None if pd.isna(start) else pd.to_datetime(start).to_datetime64()
+    end = None if pd.isna(end) else pd.to_datetime(end).to_datetime64()
+    # NaT compares False, so datetimes with NaT are not sorted and the NaT rows are dropped by the mask
+    if len(datetimes) < 2 or (datetimes[1:] >= datetimes[:-1]).all():
+        first = 0 if start is None else datetimes.searchsorted(start, side='left')
+        stop = len(datetimes) if end is None else datetimes.searchsorted(end, side='right')
+        return slice(first, stop)
+    mask = ~np.isnat(datetimes)
+    if start is not None:
+        mask &= datetimes >= start
+    if end is not None:
+        mask &= datetimes <= end
+    return mask
+
+def create_wric_df(filepath, lines, save_csv, code_1, code_2, path_to_save, start, end, notefilepath, df=None):
+    """
+    Creates DataFrames for WRIC data from a file and optionally saves them as CSV files.
+
+    Parameters:
+    ----------
+    filepath : str, bytes or file-like
+        Path to the .txt file containing WRIC data (or its content), only used for naming.
+    lines : list of str
+        Lines read from the file to locate the data start.
+    save_csv : bool
+        Whether to save the DataFrames as CSV files.
+    code_1, code_2 : str
+        Codes for subjects in Room 1 and Room 2, used for naming the output files.
+    path_to_save : str or None
+        Directory path for saving CSV files. Uses current directory if None.
+    df : pd.DataFrame or None, optional
+        Data already parsed by read_wric_file. If None, the data block is parsed from `lines`.
+
+    Returns:
+    -------
+    tuple
+        (df_room1, df_room2): DataFrames containing data for Room 1 and Room 2.
+
+    Raises:
+    ------
+    ValueError
+        If Date or Time columns are inconsistent across rows.
+    """
+    if df is None:
+        # parse the data block from the lines already in memory instead of reading the file again
+        data_start_index = find_data_start(lines)
+        df = parse_wric_data(io.StringIO(''.join(lines[data_start_index:])), layout=parse_layout(lines[data_start_index - 1]))
+
+    # Split dataset by room and add datetime to both
+    df_room1, df_room2 = split_rooms(df, (1, 2)).values()
+    
+    # Cut to only include desired rows (do before setting the relative time) 
+    bounds = room_bounds(start, end, notefilepath)
+    df_room1 = cut_rows(df_room1, *bounds[1])
+    df_room2 = cut_rows(df_room2, *bounds[2])
+        
+    df_room1 = add_relative_time(df_room1)
+    df_room2 = add_relative_time(df_room2)
+        
+    return df_room1, df_room2
+
+def split_rooms(df, rooms):
+    """
+    Helper Function that splits the parsed data of a WRIC file by room: the columns of each room (e.g. 'R1_S1_VO2')
+    followed by 'datetime'. If the columns of a room are next to each other (see parse_wric_data()), the room is
+    a slice of the parsed data and nothing is copied. Not intended for modular use.
+
+    Raises:
+    ------
+    ValueError
+        If the file has no data for one of the rooms.
+    """
+    dfs = {}
+    for room in rooms:
+        positions = np.flatnonzero(df.columns.str.startswith(f"R{room}_"))
+        if not len(positions):
+            raise ValueError(f"The WRIC file has no data for room {room}.")
+        contiguous = positions[-1] - positions[0] + 1 == len(positions)
+        df_room = df.iloc[:, positions[0]:positions[-1] + 1] if contiguous else df.iloc[:, positions]
+        df_room['datetime'] = df['datetime']
+        dfs[room] = df_room
+    return dfs
+
+def room_bounds(start, end, notefilepath, rooms=(1, 2)):
+    """
+    Helper Function for create_wric_df() that returns the (start, end) each room is cut to: `start` and `end` if both
+    are given, otherwise the entry and exit detected in the notefile (see detect_start_end()), replaced by `start`
+    or `end` if given. Not intended for modular use.
+    """
+    if (start and end) or notefilepath is None:
+        return {room: (start, end) for room in rooms}
+    se_times = detect_start_end(notefilepath, rooms=rooms)
+    bounds = {room: (start if start else se_times[room][0], end if end else se_times[room][1]) for room in rooms}
+    for room in rooms:
+        logger.info(f"Starting time for room {room} is {bounds[room][0]} and end {bounds[room][1]}")
+    return bounds
+
+def process_room(room, df_room, code, window, combine, method, protocol_list, save_csv, path_to_save, output_format, qc=None):
+    """
+    Helper Function for process_rooms() that runs the stages of one room: cutting to the rows of `window` (see
+    row_window()), combining S1 and S2, the quality control of the sensors (see sensor_qc(), unless `qc` is None),
+    adding the protocol of the notes (if `protocol_list` is not None) and saving the data, protocol segments and
+    flagged intervals. Returns the processed DataFrame and the flagged intervals (None without `qc`).
+    Not intended for modular use.
+    """
+    flagged = None
+    with timed_stage("cut") as stage:
+        df_room = add_relative_time(df_room.iloc[window])
+        stage["rows"] = len(df_room)
+    if combine:
+        with timed_stage("combine") as stage:
+            df_room = combine_measurements(df_room, method)
+            stage["rows"] = len(df_room)
+    if qc:
+        with timed_stage("qc") as stage:
+            flagged = sensor_qc(df_room, room)
+            if qc == "mask":
+                df_room = mask_qc(df_room, flagged)
+            stage["rows"] = len(df_room)
+        log_qc(flagged, code)
+    if protocol_list is not None:
+        with timed_stage("protocol") as stage:
+            df_room = update_protocol(df_room, protocol_list)
+            stage["rows"] = len(df_room)
+    if save_csv:
+        with timed_stage("write_output") as stage:
+            save_output(df_room, code, "data", path_to_save, output_format)
+            if protocol_list is not None:
+                # index of the protocol segments, used by wrictools.analysis to find protocol periods without scanning the data
+                save_output(protocol_segments(df_room, room), code, "segments", path_to_save, output_format)
+            if qc:
+                save_output(flagged, code, "qc", path_to_save, output_format)
+            stage["rows"] = len(df_room)
+    return df_room, flagged
+
+def process_rooms(df, codes, save_csv, path_to_save, combine, method, start, end, notefilepath, keywords_dict, output_format, workers=None, qc=None):
+    """
+    Helper Function that preprocesses the parsed data of all rooms of a WRIC file (see process_room()), the rooms
+    concurrently in threads. The drift of the notes is added once to the datetimes shared by the rooms and the rows
+    of each room are found once on them, so each room is a slice of the parsed data until it is combined.
+    Not intended for modular use.
+
+    Returns:
+    -------
+    tuple
+        (data, flagged): Dictionaries of room number -> processed DataFrame and room number -> intervals flagged by
+        the quality control (None without `qc`), for the rooms (and in the order) of `codes`.
+    """
+    if qc and qc not in QC_MODES:
+        raise ValueError(f"QC mode {qc} is not supported. Use {', '.join(QC_MODES)} or None.")
+    rooms = list(codes)
+    drift, protocol_lists = None, {room: None for room in rooms}
+    if notefilepath is not None:
+        with timed_stage("notes") as stage:
+            drift, protocol_lists = protocol_events(notefilepath, keywords_dict, rooms)
+            stage["rows"] = sum(len(protocol_list) for protocol_list in protocol_lists.values())
+        if drift is not None:
+            logger.info(f"drift {drift}")
+    with timed_stage("split_rooms") as stage:
+        bounds = room_bounds(start, end, notefilepath, rooms)
+        if not pd.api.types.is_datetime64_any_dtype(df['datetime']):
+            df = df.assign(datetime=pd.to_datetime(df['datetime']))
+        if drift is not None:
+            # the rooms are cut with the bounds shifted by the drift as well, which selects the same rows
+            df = df.assign(datetime=df['datetime'] + drift)
+            bounds = {room: tuple(bound if pd.isna(bound) else pd.to_datetime(bound) + drift for bound in bounds[room])
+                      for room in rooms}
+        datetimes = df['datetime'].to_numpy(dtype='datetime64[ns]')
+        windows = {room: row_window(datetimes, *bounds[room]) for room in rooms}
+        dfs = split_rooms(df, rooms)
+        stage["rows"] = len(df)
+
+    jobs = {room: (room, dfs[room], codes[room], windows[room], combine, method, protocol_lists[room], save_csv, path_to_save, output_format, qc)
+            for room in rooms}
+    workers = len(rooms) if workers is None else workers
+    # rooms with the same code write to the same files, so they are processed one after another (the last one is kept);
+    # a profiled run does the same, as the peak memory of a stage (see timed_stage()) is traced for the whole process
+    if workers <= 1 or len(rooms) <= 1 or len(set(codes.values())) < len(rooms) or CURRENT_PROFILE.get() is not None:
+        results = {room: process_room(*job) for room, job in jobs.items()}
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(rooms))) as executor:
+            # threads do not inherit the context variables, so each room runs in a copy of the context
+            futures = {room: executor.submit(contextvars.copy_context().run, process_room, *job) for room, job in jobs.items()}
+            results = {room: future.result() for room, future in futures.items()}
+    return {room: result[0] for room, result in results.items()}, {room: result[1] for room, result in results.items()}
+
+def check_discrepancies(df, threshold=0.05, individual=False, verbose=True):
+    """
+    Checks for discrepancies between S1 and S2 measurements in the DataFrame and reports them through the wrictools logger
+    (channels and intervals beyond the threshold as warnings, the others as info).
+
+    All relative deltas (S1 - S2) / mean(S1, S2) are computed at once for all channels (and rooms) in the DataFrame.
+
+    Parameters:
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing WRIC data with columns for S1 and S2 measurements.
+    threshold : float, optional
+        Threshold percentage for mean relative delta discrepancies. Default is 0.05 (%).
+    individual : bool, optional
+        If True, checks and reports intervals of consecutive rows with discrepancies beyond the threshold. Default is False.
+    verbose : bool, optional
+        Whether to report the discrepancies. Default is True.
+
+    Returns:
+    -------
+    tuple
+        (summary, flagged):
+        - summary: one row per channel with 'room', 'channel', 's1_column', 's2_column', 'mean_relative_delta',
+          'exceeds_threshold' and 'flagged_rows' (number of rows beyond the threshold).
+        - flagged: if `individual`, one row per interval of consecutive rows beyond the threshold with 'room', 'channel',
+          'row_start', 'row_stop' (positional, exclusive), 'start' and 'end' (datetimes if available),
+          'n_rows' and 'max_abs_relative_delta'. None otherwise.
+        
+    Notes:
+    ------
+    - This function is not included in the big pre-processing function, as it is more intended to 
+    perform a quality check on your data and not to automatically inform the processing of the data. 
+    """
+    env_params = ['Pressure Ambient', 'Temperature', 'Relative Humidity', 'Activity Monitor']
+    df_filtered = df.loc[:, ~df.columns.str.contains('|'.join(env_params))]
+    
+    s1_columns = [col for col in df_filtered.columns if '_S1_' in col and col.replace('_S1_', '_S2_') in df_filtered.columns]
+    s2_columns = [col.replace('_S1_', '_S2_') for col in s1_columns]
+    channels = [col.replace('_S1_', '_') for col in s1_columns]
+    rooms = [int(match.group(1)) if (match := re.match(r'^R(\d+)_', col)) else None for col in s1_columns]
+
+    s1_values = df[s1_columns].to_numpy(dtype=np.float64)
+    s2_values = df[s2_columns].to_numpy(dtype=np.float64)
+    limit = threshold / 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative_deltas = (s1_values - s2_values) / ((s1_values + s2_values) / 2)
+        mean_relative_deltas = np.nanmean(relative_deltas, axis=0) if len(df) else np.full(len(s1_columns), np.nan)
+    exceeds = np.abs(relative_deltas) > limit
+
+    summary = pd.DataFrame({
+        'room': rooms,
+        'channel': channels,
+        's1_column': s1_columns,
+        's2_column': s2_columns,
+        'mean_relative_delta': mean_relative_deltas,
+        'exceeds_threshold': np.abs(mean_relative_deltas) > limit,
+        'flagged_rows': exceeds.sum(axis=0),
+    })
+
+    flagged = None
+    if individual:
+        # runs of consecutive flagged rows per channel, found on the channel-major (transposed) matrix
+        padded = np.zeros((len(s1_columns), len(df) + 2), dtype=np.int8)
+        padded[:, 1:-1] = exceeds.T
+        edges = np.diff(padded, axis=1)
+        channel_idx, row_start = np.nonzero(edges == 1)
+        _, row_stop = np.nonzero(edges == -1)
+        # maximum per interval: reduce over [start, stop) of the flattened channel-major matrix
+        abs_deltas = np.append(np.abs(relative_deltas.T).ravel(), 0)
+        bounds = np.column_stack([channel_idx * len(df) + row_start, channel_idx * len(df) + row_stop]).ravel()
+        max_deltas = np.maximum.reduceat(abs_deltas, bounds)[::2] if len(bounds) else np.array([])
+        datetimes = df['datetime'].to_numpy() if 'datetime' in df.columns else None
+        flagged = pd.DataFrame({
+            'room': np.array(rooms, dtype=object)[channel_idx],
+            'channel': np.array(channels, dtype=object)[channel_idx],
+            'row_start': row_start,
+            'row_stop': row_stop,
+            'start': datetimes[row_start] if datetimes is not None else None,
+            'end': datetimes[row_stop - 1] if datetimes is not None else None,
+            'n_rows': row_stop - row_start,
+            'max_abs_relative_delta': max_deltas,
+        })
+
+    # Output the discrepancies
+    if verbose:
+        if summary.empty:
+            logger.info("No discrepancies found.")
+        for row in summary.itertuples():
+            log = logger.warning if row.exceeds_threshold else logger.info
+            log(f"{row.s1_column} and {row.s2_column} have a mean relative delta of {row.mean_relative_delta:.4f}, "
+                f"which {'exceeds' if row.exceeds_threshold else 'is within'} the {threshold}% threshold.")
+            if individual:
+                for interval in flagged[flagged['channel'] == row.channel].itertuples():
+                    logger.warning(f"  Rows {interval.row_start + 1}-{interval.row_stop}: {row.s1_column} and {row.s2_column} differ by a relative delta of up to {interval.max_abs_relative_delta:.4f}.")
+
+    return summary, flagged
+
+def check_discrepancies_folder(folder_path, threshold=0.05, individual=False, data_prefix="Results_1m_"):
+    """
+    Checks the S1/S2 discrepancies (see check_discrepancies()) of all WRIC files in a folder and returns one report.
+
+    Parameters:
+    ----------
+    folder_path : str
+        Folder containing the WRIC data files.
+    threshold : float, optional
+        Threshold percentage for mean relative delta discrepancies. Default is 0.05 (%).
+    individual : bool, optional
+        If True, also returns the intervals of rows beyond the threshold. Default is False.
+    data_prefix : str, optional
+        Prefix of the data files. Default is "Results_1m_".
+
+    Returns:
+    -------
+    tuple
+        (summary, flagged) as returned by check_discrepancies(), for all files with an additional 'file' column.
+        Files that can not be read are reported in the terminal and left out.
+    """
+    summaries, flagged_intervals = [], []
+    for filepath, _ in pair_wric_files(folder_path, data_prefix):
+        filename = os.path.basename(filepath)
+        try:
+            _, df = read_wric_file(filepath)
+        except Exception as e:
+            logger.warning(f"{filename} could not be checked: {type(e).__name__}: {e}")
+            continue
+        summary, flagged = check_discrepancies(df, threshold, individual, verbose=False)
+        summaries.append(summary.assign(file=filename))
+        if individual:
+            flagged_intervals.append(flagged.assign(file=filename))
+
+    summary = pd.concat(summaries, ignore_index=True) if summaries else pd.DataFrame()
+    flagged = (pd.concat(flagged_intervals, ignore_index=True) if flagged_intervals else pd.DataFrame()) if individual else None
+    return summary, flagged
+    
+        
+COMBINE_METHODS = {
+    'mean': lambda values: values.mean(axis=0),
+    'median': lambda values: np.median(values, axis=0),
+    's1': lambda values: values[0],
+    's2': lambda values: values[1],
+    'min': lambda values: values.min(axis=0),
+    'max': lambda values: values.max(axis=0),
+}
+
+def set_columns(df):
+    """
+    Helper Function that returns the S1 columns, the matching S2 columns and the combined column names of a DataFrame. Not intended for modular use.
+    """
+    s1_columns = [col for col in df.columns if '_S1_' in col and col.replace('_S1_', '_S2_') in df.columns]
+    s2_columns = [col.replace('_S1_', '_S2_') for col in s1_columns]
+    names = [re.sub(r'^.*?_S[12]_', '', col) for col in s1_columns]
+    return s1_columns, s2_columns, names
+
+def set_values(df, s1_columns, s2_columns):
+    """
+    Helper Function that returns the S1 and S2 measurements of a DataFrame as one (set, row, parameter) array.
+    If the S2 columns directly follow the S1 columns (as in a room of parse_wric_data()), this is a view of
+    the data and nothing is copied. Not intended for modular use.
+    """
+    positions = df.columns.get_indexer(s1_columns + s2_columns)
+    if len(positions) and (np.diff(positions) == 1).all():
+        values = df.iloc[:, positions[0]:positions[-1] + 1].to_numpy(dtype=np.float64)
+        return values.reshape(len(df), 2, len(s1_columns)).transpose(1, 0, 2)
+    values = np.empty((2, len(df), len(s1_columns)), dtype=np.float64)
+    values[0] = df[s1_columns].to_numpy(dtype=np.float64)
+    values[1] = df[s2_columns].to_numpy(dtype=np.float64)
+    return values
+
+def combine_measurements(df, method='mean'):
+    """
+    Combines S1 and S2 measurements in the DataFrame using the specified method.
+
+    Parameters:
+    ----------
+    df : pandas.DataFrame
+        DataFrame containing WRIC data with S1 and S2 measurement columns.
+    method : str, optional
+        Method for combining measurements. Options are:
+        - 'mean': Average of S1 and S2 (default).
+        - 'median': Median of S1 and S2.
+        - 's1': Take S1 measurements.
+        - 's2': Take S2 measurements.
+        - 'min': Minimum of S1 and S2.
+        - 'max': Maximum of S1 and S2.
+
+    Returns:
+    -------
+    pandas.DataFrame
+        A DataFrame with combined measurements.
+    
+    Raises:
+    ------
+    ValueError
+        If an unsupported combination method is provided.
+    """
+    return combine_rooms(df, None, method)[0]
+
+def combine_rooms(df_room1, df_room2, method='mean'):
+    """
+    Combines S1 and S2 measurements of both rooms in one step (see combine_measurements()).
+
+    The measurements of each room are reduced over the set axis of a (set, row, parameter) array, which is
+    a view of the data if possible (see set_values()). The rooms may have a different number of rows.
+
+    Parameters:
+    ----------
+    df_room1 : pandas.DataFrame
+        DataFrame containing WRIC data of room 1 with S1 and S2 measurement columns.
+    df_room2 : pandas.DataFrame or None
+        DataFrame containing WRIC data of room 2 with the same parameters, or None to only combine room 1.
+    method : str, optional
+        Method for combining measurements, see combine_measurements(). Default is 'mean'.
+
+    Returns:
+    -------
+    tuple
+        (df_room1, df_room2) with combined measurements (df_room2 is None if not given).
+    
+    Raises:
+    ------
+    ValueError
+        If an unsupported combination method is provided or the rooms do not have the same parameters.
+    """
+    if method not in COMBINE_METHODS:
+        raise ValueError(f"Method '{method}' is not supported. Use 'mean', 'median', 's1', 's2', 'min', or 'max'.")
+    dfs = [df for df in (df_room1, df_room2) if df is not None]
+
+    columns = [set_columns(df) for df in dfs]
+    names = columns[0][2]
+    if any(room_names != names for _, _, room_names in columns):
+        raise ValueError("Both rooms need to have the same S1 and S2 parameters to be combined.")
+
+    combined = []
+    for df, (s1_columns, s2_columns, _) in zip(dfs, columns):
+        combined_values = COMBINE_METHODS[method](set_values(df, s1_columns, s2_columns))
+        if combined_values.base is not None:
+            combined_values = combined_values.copy()  # 's1' and 's2' select a (read-only) view of the data
+        # keep all columns that do not have two measurements (e.g. datetime)
+        non_s_columns = df.drop(columns=s1_columns + s2_columns)
+        combined_df = pd.DataFrame(combined_values, columns=names, index=df.index, copy=False)
+        combined.append(pd.concat([non_s_columns, combined_df], axis=1))
+    if df_room2 is None:
+        combined.append(None)
+    return tuple(combined)
+
+class WRICRecording:
+    """
+    Compact in-memory representation of a WRIC recording.
+
+    The measurements are held in one typed array cube (time x room x set x parameter), optionally as float32,
+    with a datetime64 vector and an int8 protocol array (time x room). The DataFrames of one room or one
+    set are views of the cube, so splitting a recording into rooms does not copy the data.
+
+    Parameters:
+    ----------
+    values : numpy.ndarray
+        Measurements with the shape (time, room, set, parameter).
+    datetimes : array-like
+        Datetime of each row (datetime64).
+    parameters : list of str
+        Names of the parameters (e.g. "VO2"), see WRIC_COLUMNS.
+    rooms : list of str, optional
+        Names of the rooms, e.g. ["R1", "R2", "R3"]. Default is ["R1", "R2"].
+    sets : list of str, optional
+        Names of the measurement sets. Default is ["S1", "S2"].
+    protocol : numpy.ndarray or None, optional
+        Protocol of each row and room (time, room). Zeros if None.
+    windows : dict or None, optional
+        Positional row range (row_start, row_stop) of each room, e.g. after cutting to the chamber stay.
+        The whole recording for all rooms if None.
+    metadata : dict or None, optional
+        Metadata DataFrame of each room (see extract_meta_data()).
+
+    Notes:
+    -----
+    - The views are read-only; use `.copy()` to modify them.
+    """
+    def __init__(self, values, datetimes, parameters, rooms=None, sets=None, protocol=None, windows=None, metadata=None):
+        self.values = values
+        self.datetimes = np.asarray(datetimes, dtype='datetime64[ns]')
+        self.parameters = list(parameters)
+        self.rooms = list(rooms) if rooms is not None else ["R1", "R2"]
+        self.sets = list(sets) if sets is not None else ["S1", "S2"]
+        if values.shape != (len(self.datetimes), len(self.rooms), len(self.sets), len(self.parameters)):
+            raise ValueError(f"The values have the shape {values.shape}, expected (time, room, set, parameter) = "
+                             f"{(len(self.datetimes), len(self.rooms), len(self.sets), len(self.parameters))}.")
+        self.protocol = protocol if protocol is not None else np.zeros((len(self.datetimes), len(self.rooms)), dtype=np.int8)
+        self.windows = windows if windows is not None else {room: (0, len(self.datetimes)) for room in self.rooms}
+        self.metadata = metadata if metadata is not None else {}
+
+    @classmethod
+    def from_dataframe(cls, df, dtype=np.float64, metadata=None):
+        """
+        Creates a recording from the parsed data of a WRIC file (see read_wric_file()).
+
+        Parameters:
+        ----------
+        df : pd.DataFrame
+            DataFrame with a 'datetime' column and measurement columns named e.g. 'R1_S1_VO2'.
+        dtype : numpy dtype, optional
+            Storage type of the measurements, np.float32 halves the memory. Default is np.float64.
+        metadata : dict or None, optional
+            Metadata DataFrame of each room.
+
+        Returns:
+        -------
+        WRICRecording
+        """
+        parsed = [re.match(r'^(R\d+)_(S\d+)_(.*)$', col) for col in df.columns]
+        layout = [match.groups() for match in parsed if match]
+        rooms = list(dict.fromkeys(room for room, _, _ in layout))
+        sets = list(dict.fromkeys(set_num for _, set_num, _ in layout))
+        parameters = list(dict.fromkeys(parameter for _, _, parameter in layout))
+
+        # column-major, so each parameter of a room and set is contiguous in memory (as in a DataFrame and when memory-mapped)
+        values = np.full((len(df), len(rooms), len(sets), len(parameters)), np.nan, dtype=dtype, order='F')
+        for r, room in enumerate(rooms):
+            for s, set_num in enumerate(sets):
+                columns = [f"{room}_{set_num}_{parameter}" for parameter in parameters]
+                present = [i for i, col in enumerate(columns) if col in df.columns]
+                values[:, r, s, present] = df[[columns[i] for i in present]].to_numpy(dtype=dtype)
+        return cls(values, df['datetime'].to_numpy(), parameters, rooms, sets, metadata=metadata)
+
+    @classmethod
+    def from_file(cls, filepath, notefilepath=None, start=None, end=None, keywords_dict=None, dtype=np.float32, cache_dir=None):
+        """
+        Reads a WRIC file (and note file) into a recording, cut and labelled as in preprocess_WRIC_file().
+
+        Parameters:
+        ----------
+        filepath : str, bytes or file-like
+            Path to the WRIC .txt file, or its content.
+        notefilepath : str, bytes or file-like, optional
+            Path to corresponding notefile (txt), or its content. Used for the protocol and, if `start`
+            or `end` are not given, for the start and end of the stay of each room.
+        start, end : str or datetime or None, optional
+            Start and end datetime of the recording to keep.
+        keywords_dict : dict, optional
+            Keywords used to extract the protocol from the notefile, see KEYWORDS_DICT (default if None).
+        dtype : numpy dtype, optional
+            Storage type of the measurements. Default is np.float32.
+        cache_dir : str or None, optional
+            Directory of a cache of parsed raw recordings, see read_raw(). None (default) disables the cache.
+
+        Returns:
+        -------
+        WRICRecording
+        """
+        recording = cls.read_raw(filepath, dtype, cache_dir)
+
+        if notefilepath is not None and not isinstance(notefilepath, (str, os.PathLike)):
+            notefilepath = read_note_file(notefilepath)
+        # windows per room, as create_wric_df() cuts the rooms
+        rooms = [int(room[1:]) for room in recording.rooms]
+        bounds = {room: (start, end) for room in recording.rooms}
+        if not (start and end) and notefilepath is not None:
+            se_times = detect_start_end(notefilepath, rooms=rooms)
+            bounds = {room: (start or se_times[int(room[1:])][0], end or se_times[int(room[1:])][1]) for room in recording.rooms}
+        frame = pd.DataFrame({'datetime': recording.datetimes})
+        for room, (room_start, room_end) in bounds.items():
+            index = cut_rows(frame, room_start, room_end).index
+            recording.windows[room] = (index[0], index[-1] + 1) if len(index) else (0, 0)
+
+        if notefilepath is not None:
+            drift, protocol_lists = protocol_events(notefilepath, keywords_dict, rooms)
+            if drift is not None:
+                logger.info(f"drift {drift}")
+                frame['datetime'] = frame['datetime'] + drift
+            recording.datetimes = frame['datetime'].to_numpy(dtype='datetime64[ns]')  # with the drift of the notes
+            for r, room in enumerate(rooms):
+                recording.protocol[:, r] = update_protocol(frame, protocol_lists[room])['protocol'].to_numpy()
+        return recording
+
+    @classmethod
+    def read_raw(cls, filepath, dtype=np.float32, cache_dir=None):
+        """
+        Reads a WRIC file into an (uncut and unlabelled) recording, optionally through a cache of memory-mapped recordings.
+
+        With a cache, the parsed measurements of each file are saved once as binary file (see save()). Afterwards the file
+        is not parsed again, but opened memory-mapped (see load()): only the parameters that are used are read from disk,
+        and processes on the same computer share the same memory.
+
+        Parameters:
+        ----------
+        filepath : str, bytes or file-like
+            Path to the WRIC .txt file, or its content.
+        dtype : numpy dtype, optional
+            Storage type of the measurements. Default is np.float32.
+        cache_dir : str or None, optional
+            Directory of the cache. None (default) disables the cache.
+
+        Returns:
+        -------
+        WRICRecording
+        """
+        if cache_dir is not None:
+            if isinstance(filepath, (str, os.PathLike)):
+                # a file path is identified by its modification time and size, so it does not have to be read
+                stat = os.stat(filepath)
+                source = f"{os.path.realpath(filepath)}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+            else:
+                filepath = source_bytes(filepath)
+                source = hashlib.sha256(filepath).digest()
+            key = hashlib.sha256(library_hash().encode() + source + np.dtype(dtype).str.encode()).hexdigest()
+            cache_path = os.path.join(cache_dir, f"{key}.raw")
+            if os.path.exists(f"{cache_path}.json"):
+                return cls.load(cache_path)
+
+        lines, df = read_wric_file(filepath)
+        metadata = {f"R{room}": room_metadata for room, room_metadata in read_room_metadata(lines).items()}
+        recording = cls.from_dataframe(df, dtype, metadata=metadata)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            recording.save(cache_path)
+        return recording
+
+    def save(self, path):
+        """
+        Saves the recording as binary file `{path}.npy` (the measurements, which can be memory-mapped) with
+        the sidecar files `{path}.npz` (datetimes and protocol) and `{path}.json` (layout and metadata).
+
+        Parameters:
+        ----------
+        path : str
+            Path of the files without extension.
+        """
+        layout = dict(parameters=self.parameters, rooms=self.rooms, sets=self.sets,
+                      windows={room: [int(row) for row in window] for room, window in self.windows.items()},
+                      metadata={room: df.to_dict(orient='records') for room, df in self.metadata.items()})
+        # the json file is written last, so an interrupted save is never loaded
+        for extension, write in [(".npy", lambda file: np.save(file, self.values)),
+                                 (".npz", lambda file: np.savez(file, datetimes=self.datetimes, protocol=self.protocol)),
+                                 (".json", lambda file: file.write(json.dumps(layout).encode()))]:
+            tmp_path = f"{path}{extension}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                write(file)
+            os.replace(tmp_path, f"{path}{extension}")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a recording saved with save().
+
+        Parameters:
+        ----------
+        path : str
+            Path of the files without extension.
+        mmap : bool, optional
+            Whether to memory-map the measurements (read-only) instead of reading them into memory. Default is True.
+
+        Returns:
+        -------
+        WRICRecording
+        """
+        with open(f"{path}.json", "rb") as file:
+            layout = json.loads(file.read())
+        values = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        with np.load(f"{path}.npz") as sidecar:
+            datetimes, protocol = sidecar["datetimes"], sidecar["protocol"]
+        return cls(values, datetimes, layout["parameters"], layout["rooms"], layout["sets"], protocol=protocol,
+                   windows={room: tuple(window) for room, window in layout["windows"].items()},
+                   metadata={room: pd.DataFrame(records) for room, records in layout["metadata"].items()})
+
+    def index(self, room):
+        """
+        Returns the datetime index of the window of a room.
+        """
+        row_start, row_stop = self.windows[room]
+        return pd.DatetimeIndex(self.datetimes[row_start:row_stop], name='datetime')
+
+    def view(self, room, set_num=None):
+        """
+        Returns the measurements of one room (columns e.g. 'R1_S1_VO2', 'R1_S2_VO2', in the order of the memory) or of one set of a room
+        (columns e.g. 'VO2') as a read-only DataFrame with a datetime index, without copying the data.
+
+        Parameters:
+        ----------
+        room : str
+            Room, e.g. "R1".
+        set_num : str or None, optional
+            Set, e.g. "S1". All sets of the room if None.
+
+        Returns:
+        -------
+        pd.DataFrame
+        """
+        r = self.rooms.index(room)
+        row_start, row_stop = self.windows[room]
+        values = self.values[row_start:row_stop, r].view()
+        values.flags.writeable = False
+        if set_num is None:
+            # reshape in the memory order of the cube, so that the result is a view
+            if self.values.flags.f_contiguous:
+                columns = [f"{room}_{s}_{parameter}" for parameter in self.parameters for s in self.sets]
+                values = values.reshape(len(values), -1, order='F')
+            else:
+                columns = [f"{room}_{s}_{parameter}" for s in self.sets for parameter in self.parameters]
+                values = values.reshape(len(values), -1)
+        else:
+            columns = self.parameters
+            values = values[:, self.sets.index(set_num)]
+        return pd.DataFrame(values, columns=columns, index=self.index(room), copy=False)
+
+    def protocol_series(self, room):
+        """
+        Returns the protocol of a room as int8 Series with a datetime index, without copying the data.
+        """
+        row_start, row_stop = self.windows[room]
+        return pd.Series(self.protocol[row_start:row_stop, self.rooms.index(room)], index=self.index(room), name='protocol', copy=False)
+
+    def combined(self, room, method='mean'):
+        """
+        Returns the S1 and S2 measurements of a room combined with the specified method (see combine_measurements()).
+        """
+        if method not in COMBINE_METHODS:
+            raise ValueError(f"Method '{method}' is not supported. Use 'mean', 'median', 's1', 's2', 'min', or 'max'.")
+        row_start, row_stop = self.windows[room]
+        values = self.values[row_start:row_stop, self.rooms.index(room)].transpose(1, 0, 2)  # (set, time, parameter)
+        return pd.DataFrame(COMBINE_METHODS[method](values), columns=self.parameters, index=self.index(room))
+
+    def to_dataframes(self, combine=True, method='mean'):
+        """
+        Converts the recording to the DataFrames returned by preprocess_WRIC_file() (float64 copies).
+
+        Returns:
+        -------
+        list of pd.DataFrame
+            One DataFrame per room with a 'datetime' column, 'relative_time[min]', the measurements and 'protocol'.
+        """
+        dfs = []
+        for room in self.rooms:
+            data = self.combined(room, method) if combine else self.view(room)
+            df = add_relative_time(data.astype(np.float64).reset_index())
+            time_columns = ['datetime', 'relative_time[min]']
+            # same column order as create_wric_df() and combine_measurements()
+            columns = self.parameters if combine else [f"{room}_{s}_{parameter}" for s in self.sets for parameter in self.parameters]
+            df = df[time_columns + columns] if combine else df[columns + time_columns]
+            df['protocol'] = self.protocol_series(room).to_numpy()
+            dfs.append(df)
+        return dfs
+
+    def memory_usage(self):
+        """
+        Returns the memory footprint of the recording in bytes.
+
+        Returns:
+        -------
+        pd.Series
+            Bytes used by 'values', 'datetimes', 'protocol' and in 'total'.
+        """
+        usage = pd.Series({'values': self.values.nbytes, 'datetimes': self.datetimes.nbytes, 'protocol': self.protocol.nbytes})
+        usage['total'] = usage.sum()
+        return usage
+
+    def __repr__(self):
+        return (f"WRICRecording({len(self.datetimes)} rows x {len(self.rooms)} rooms x {len(self.sets)} sets x "
+                f"{len(self.parameters)} parameters, {self.values.dtype}, {self.memory_usage()['total'] / 1e6:.1f} MB)")
+
+def preprocess_WRIC_file(filepath, code = "id", manual = None, save_csv = True, path_to_save = None, combine = True, method = "mean", start=None, end=None, notefilepath = None, keywords_dict = None, output_format = "csv", cache_dir = None, cache_size_mb = 1000, profile = None, qc = None):
+    """
+    Preprocesses a WRIC data file, extracting metadata, creating DataFrames, and optionally saving results.
+
+    Parameters:
+    ----------
+    filepath : str, bytes or file-like
+        Path to the WRIC .txt file, or its content as bytes or a buffer (e.g. exported from REDCap).
+    code : str, optional
+        Method for generating subject IDs ("id", "id+comment", or "manual"). Default is "id".
+    manual : list or None, optional
+        Custom codes for subjects in Room 1 and Room 2 if `code` is "manual". Default is None.
+    save_csv : bool, optional
+        Whether to save extracted metadata and data to files (see output_format). Default is True.
+        If a notefile is given, the protocol segments (see protocol_segments()) are saved as well.
+    path_to_save : str or None, optional
+        Directory path for saving the files. Uses current directory if None. Default is None.
+    combine : bool, optional
+        Whether to combine S1 and S2 measurements. Default is True.
+    method: str, optional
+        Method for combining measurements. Options are:
+        - 'mean': Average of S1 and S2 (default).
+        - 'median': Median of S1 and S2.
+        - 's1': Take S1 measurements.
+        - 's2': Take S2 measurements.
+        - 'min': Minimum of S1 and S2.
+        - 'max': Maximum of S1 and S2.
+    start: str or datetime or None, optional
+        Start datetime; rows before this will be removed. If None, uses the earliest datetime in the DataFrame.
+    end: str or datetime or None, optional
+        End datetime; rows after this will be removed. If None, uses the latest datetime in the DataFrame.
+    notefilepath: str, bytes or file-like, optional
+        Path to corresponding notefile (txt), or its content
+    keywords_dict: dict, optional
+        Keywords used to extract the protocol from the notefile, see KEYWORDS_DICT (default if None).
+    output_format: str, optional
+        Format of the saved files: "csv" (default), "parquet", "feather", "parquet_dataset"
+        (a cohort dataset partitioned by subject code) or "sqlite" (a study store, see StudyStore), see save_output().
+    cache_dir: str or None, optional
+        Directory of a cache for processed recordings. If the data file, note file and the parameters
+        (code, manual, combine, method, start, end, keywords_dict, qc) are unchanged since a previous run,
+        the result is loaded from the cache instead of processing the file again (the files are still written
+        if save_csv is True). None (default) disables the cache.
+    cache_size_mb: float, optional
+        Maximum size of the cache in megabytes, least recently used recordings are removed first. Default is 1000.
+    profile: bool, callable or None, optional
+        Measures the wall time, processed rows and peak memory of each stage (reading, parsing values and dates,
+        metadata, splitting the rooms, combining, quality control, notes, protocol, writing and the cache). True logs each stage,
+        a callable (e.g. a StageProfiler) is called with a dict per stage ('file', 'stage', 'seconds', 'rows', 'peak_mb').
+        Tracing the memory slows down the processing, and the rooms are processed one after another so that the peak
+        of each stage is its own. None (default) disables the profiling.
+    qc: str or None, optional
+        Quality control of the sensors of each room after combining S1 and S2 (see sensor_qc()): flatlined or spiking
+        channels, drops of the flow, drift of FiO2/FiCO2, gaps and implausible RER. "flag" logs the number of
+        flagged intervals and saves them (kind "qc", e.g. `{code}_WRIC_qc.csv`) if save_csv is True, "mask" also replaces
+        the flagged values in the data with NaN (see mask_qc()), None (default) skips the quality control.
+
+    Returns:
+    -------
+    tuple
+        (R1_metadata, R2_metadata, df_room1, df_room2):
+        - Metadata DataFrames for Room 1 and Room 2.
+        - DataFrames with combined or separate measurements for each room (depending on parameter 'combine')
+
+    Raises:
+    ------
+    ValueError
+        If the file does not have exactly the rooms 1 and 2, see preprocess_WRIC_rooms() for other layouts.
+    """     
+    label = os.path.basename(filepath) if isinstance(filepath, (str, os.PathLike)) else "<data>"
+    with profile_run(profile, label):
+        if notefilepath is not None and not isinstance(notefilepath, (str, os.PathLike)):
+            notefilepath = read_note_file(notefilepath)  # a buffer can only be read once, but the notes are used twice
+
+        if cache_dir is not None:
+            filepath = source_bytes(filepath)  # read once for hashing and parsing
+            note_content = notefilepath if notefilepath is None or isinstance(notefilepath, pd.DataFrame) else source_bytes(notefilepath)
+            params = dict(code=code, manual=manual, combine=combine, method=method, start=start, end=end, keywords_dict=keywords_dict, qc=qc)
+            with timed_stage("cache_load"):
+                key = cache_key(filepath, note_content, params)
+                cached = load_from_cache(cache_dir, key)
+            if cached is not None:
+                R1_metadata, R2_metadata, df_room1, df_room2, qc_room1, qc_room2 = cached
+                if save_csv:
+                    # the files are written again from the cached result, as a run with other parameters may have replaced them
+                    code_1, code_2 = check_code(code, manual, R1_metadata, R2_metadata)
+                    with timed_stage("write_output"):
+                        for df_out, code_out, kind in [(R1_metadata, code_1, "metadata"), (R2_metadata, code_2, "metadata"), (df_room1, code_1, "data"), (df_room2, code_2, "data")]:
+                            save_output(df_out, code_out, kind, path_to_save, output_format)
+                        if 'protocol' in df_room1.columns:
+                            for df_out, code_out, room in [(df_room1, code_1, 1), (df_room2, code_2, 2)]:
+                                save_output(protocol_segments(df_out, room), code_out, "segments", path_to_save, output_format)
+                        if qc:
+                            # the flagged intervals are cached, as the data may already be masked (qc="mask")
+                            for flagged, code_out in [(qc_room1, code_1), (qc_room2, code_2)]:
+                                save_output(flagged, code_out, "qc", path_to_save, output_format)
+                return R1_metadata, R2_metadata, df_room1, df_room2
+
+        lines, df = read_wric_file(filepath)
+        rooms = header_rooms(lines)
+        if rooms != [1, 2]:
+            raise ValueError(f"The WRIC file has the rooms {rooms}, preprocess_WRIC_file() expects rooms 1 and 2. Use preprocess_WRIC_rooms() for other layouts.")
+        with timed_stage("metadata"):
+            code_1, code_2, R1_metadata, R2_metadata = extract_meta_data(lines, code, manual, save_csv, path_to_save, output_format)
+        data, flagged = process_rooms(df, {1: code_1, 2: code_2}, save_csv, path_to_save, combine, method, start, end,
+                                      notefilepath, keywords_dict, output_format, qc=qc)
+        df_room1, df_room2 = data[1], data[2]
+
+        if cache_dir is not None:
+            with timed_stage("cache_store"):
+                save_to_cache(cache_dir, key, (R1_metadata, R2_metadata, df_room1, df_room2, flagged[1], flagged[2]), cache_size_mb)
+    
+        return R1_metadata, R2_metadata, df_room1, df_room2
+    
+def preprocess_WRIC_rooms(filepath, code="id", manual=None, save_csv=True, path_to_save=None, combine=True, method="mean", start=None, end=None, notefilepath=None, keywords_dict=None, output_format="csv", workers=None, profile=None, qc=None):
+    """
+    Preprocesses a WRIC data file with any number of rooms, e.g. of a facility with more chambers or exports of several
+    calorimeters merged into one file, see preprocess_WRIC_file().
+
+    The rooms are read from the block titles ("Room N Set M") and the metadata block of the file. The data is parsed
+    once, then each room is cut, combined, labelled with the protocol and saved concurrently.
+
+    Parameters:
+    ----------
+    filepath : str, bytes or file-like
+        Path to the WRIC .txt file, or its content as bytes or a buffer.
+    code : str, optional
+        Method for generating subject IDs ("id", "id+comment", or "manual"). Default is "id".
+    manual : list, dict or None, optional
+        Custom codes if `code` is "manual": one code per room in the order of the room numbers, or a dictionary
+        with the room number as key (see room_codes()). Default is None.
+    save_csv, path_to_save, combine, method, start, end, keywords_dict, output_format, profile, qc :
+        See preprocess_WRIC_file().
+    notefilepath : str, bytes or file-like, optional
+        Path to corresponding notefile (txt), or its content. Notes starting with a room number refer to that
+        room, all other notes to all rooms.
+    workers : int or None, optional
+        Number of threads processing the rooms. None (default) processes all rooms at once, 1 one after another.
+        Profiled runs (see `profile`) always process the rooms one after another.
+
+    Returns:
+    -------
+    tuple
+        (metadata, data): Dictionaries of the metadata DataFrame and of the DataFrame with combined or separate
+        measurements (depending on parameter 'combine') of each room number.
+
+    Examples:
+    --------
+    >>> metadata, data = preprocess_WRIC_rooms(filepath, notefilepath=notefilepath)
+    >>> data[3]  # room 3
+    """
+    label = os.path.basename(filepath) if isinstance(filepath, (str, os.PathLike)) else "<data>"
+    with profile_run(profile, label):
+        if notefilepath is not None and not isinstance(notefilepath, (str, os.PathLike)):
+            notefilepath = read_note_file(notefilepath)
+        lines, df = read_wric_file(filepath)
+        with timed_stage("metadata"):
+            codes, metadata = extract_room_meta_data(lines, code, manual, save_csv, path_to_save, output_format)
+        data, _ = process_rooms(df, codes, save_csv, path_to_save, combine, method, start, end, notefilepath, keywords_dict, output_format, workers, qc)
+        return metadata, data
+
+def chunk_rows_for_budget(memory_budget_mb):
+    """
+    Helper Function that returns the number of rows per chunk that keeps the chunked processing within
+    a memory budget (see ROW_BYTES). Not intended for modular use.
+    """
+    return max(100, int(memory_budget_mb * 1e6 // ROW_BYTES))
+
+def iter_WRIC_chunks(filepath, memory_budget_mb=256, chunk_rows=None, combine=True, method="mean", start=None, end=None, notefilepath=None, keywords_dict=None):
+    """
+    Preprocesses a WRIC data file in chunks of rows: parses, cuts, combines and labels the protocol of each chunk
+    and yields it, so that only one chunk is in memory at a time (e.g. for long stays or a finer sampling).
+
+    Concatenating the chunks of each room gives the same data as preprocess_WRIC_file() with the same parameters.
+
+    Parameters:
+    ----------
+    filepath : str, bytes or file-like
+        Path to the WRIC .txt file, or its content as bytes or a buffer (read into memory first).
+    memory_budget_mb : float, optional
+        Approximate memory in megabytes the processing of one chunk may use. Default is 256.
+    chunk_rows : int or None, optional
+        Number of rows per chunk. Derived from `memory_budget_mb` if None (default).
+    combine, method, start, end, notefilepath, keywords_dict :
+        See preprocess_WRIC_file().
+
+    Yields:
+    -------
+    tuple
+        (df_room1, df_room2): the next rows of each room with the same columns as returned by preprocess_WRIC_file().
+        A chunk of a room can be empty (e.g. before the participant entered the chamber).
+    """
+    if not isinstance(filepath, (str, os.PathLike, bytes, bytearray, memoryview)):
+        filepath = source_bytes(filepath)
+    if notefilepath is not None and not isinstance(notefilepath, (str, os.PathLike)):
+        notefilepath = read_note_file(notefilepath)
+    chunk_rows = chunk_rows_for_budget(memory_budget_mb) if chunk_rows is None else chunk_rows
+
+    bounds = room_bounds(start, end, notefilepath)
+    drift, protocol_lists = None, None
+    if notefilepath is not None:
+        with timed_stage("notes") as stage:
+            drift, protocol_lists = protocol_events(notefilepath, keywords_dict)
+            stage["rows"] = len(protocol_lists[1]) + len(protocol_lists[2])
+        if drift is not None:
+            logger.info(f"drift {drift}")
+    # first datetime of each room (for the relative time) and running maximum of the datetimes (for the protocol)
+    first_datetimes = {1: None, 2: None}
+    running_max = {1: None, 2: None}
+
+    with open_text(filepath) as file:
+        with timed_stage("read_header"):
+            lines = read_header(file)
+        layout = parse_layout(lines[-1])
+        if header_rooms(lines) != [1, 2]:
+            raise ValueError(f"The WRIC file has the rooms {header_rooms(lines)}, chunked processing expects rooms 1 and 2. Use preprocess_WRIC_rooms() for other layouts.")
+        for df in parse_wric_chunks(file, chunk_rows, layout=layout):
+            with timed_stage("split_rooms") as stage:
+                dfs = []
+                for room, df_room in split_rooms(df, (1, 2)).items():
+                    df_room = cut_rows(df_room, *bounds[room])
+                    if first_datetimes[room] is None and len(df_room):
+                        first_datetimes[room] = df_room['datetime'].iloc[0]
+                    first = first_datetimes[room] if first_datetimes[room] is not None else pd.NaT
+                    dfs.append(add_relative_time(df_room, first))
+                stage["rows"] = len(dfs[0]) + len(dfs[1])
+            if combine:
+                with timed_stage("combine") as stage:
+                    dfs = list(combine_rooms(dfs[0], dfs[1], method))
+                    stage["rows"] = len(dfs[0]) + len(dfs[1])
+
+            if notefilepath is not None:
+                with timed_stage("protocol") as stage:
+                    for i, room in enumerate((1, 2)):
+                        if drift is not None:
+                            dfs[i]['datetime'] = dfs[i]['datetime'] + drift
+                        dfs[i] = update_protocol(dfs[i], protocol_lists[room], running_max[room])
+                        if len(dfs[i]):
+                            chunk_max = dfs[i]['datetime'].to_numpy(dtype='datetime64[ns]').view('i8').max()
+                            running_max[room] = chunk_max if running_max[room] is None else max(running_max[room], chunk_max)
+                    stage["rows"] = len(dfs[0]) + len(dfs[1])
+            yield dfs[0], dfs[1]
+
+def stitch_segments(pieces, rows, last_datetime, room):
+    """
+    Helper Function for preprocess_WRIC_file_chunked() that joins the protocol segments of consecutive chunks
+    (with row numbers counted over all chunks) into the segment table protocol_segments() returns for the whole room.
+    Not intended for modular use.
+    """
+    segments = pd.concat(pieces, ignore_index=True)
+    segments = segments[segments['protocol'].ne(segments['protocol'].shift())].reset_index(drop=True)
+    segments['row_stop'] = np.append(segments['row_start'].to_numpy()[1:], rows).astype(segments['row_start'].dtype)
+    segments['end'] = np.append(segments['start'].to_numpy()[1:], np.array([last_datetime], dtype=segments['start'].dtype)) if len(segments) else segments['start']
+    segments['room'] = room
+    segments['occurrence'] = segments.groupby('protocol').cumcount() + 1
+    return segments
+
+def preprocess_WRIC_file_chunked(filepath, code="id", manual=None, path_to_save=None, combine=True, method="mean", start=None, end=None, notefilepath=None, keywords_dict=None, output_format="csv", memory_budget_mb=256, chunk_rows=None, profile=None):
+    """
+    Preprocesses a WRIC data file chunk by chunk within a memory budget and streams the results to the output files
+    (see iter_WRIC_chunks()). The saved files are the same as those of preprocess_WRIC_file() with save_csv=True,
+    but the memory used does not grow with the length of the recording. The quality control of the sensors needs the
+    whole recording and is not run, see sensor_qc_folder() to check the raw files.
+
+    Parameters:
+    ----------
+    filepath : str, bytes or file-like
+        Path to the WRIC .txt file, or its content as bytes or a buffer (read into memory first).
+    code, manual, path_to_save, combine, method, start, end, notefilepath, keywords_dict, profile :
+        See preprocess_WRIC_file().
+    output_format : str, optional
+        "csv" (default), "parquet", "feather", "parquet_dataset" or "sqlite", see save_output().
+    memory_budget_mb : float, optional
+        Approximate memory in megabytes the processing of one chunk may use. Default is 256.
+    chunk_rows : int or None, optional
+        Number of rows per chunk. Derived from `memory_budget_mb` if None (default).
+
+    Returns:
+    -------
+    tuple
+        (R1_metadata, R2_metadata, rows_room1, rows_room2): Metadata DataFrames and the number of rows saved for each room.
+    """
+    if not isinstance(filepath, (str, os.PathLike, bytes, bytearray, memoryview)):
+        filepath = source_bytes(filepath)  # the file is opened twice, for the header and the data
+    label = os.path.basename(filepath) if isinstance(filepath, (str, os.PathLike)) else "<data>"
+    with profile_run(profile, label):
+        with open_text(filepath) as file:
+            lines = read_header(file)
+        if header_rooms(lines) != [1, 2]:
+            raise ValueError(f"The WRIC file has the rooms {header_rooms(lines)}, chunked processing expects rooms 1 and 2. Use preprocess_WRIC_rooms() for other layouts.")
+        with timed_stage("metadata"):
+            code_1, code_2, R1_metadata, R2_metadata = extract_meta_data(lines, code, manual, True, path_to_save, output_format)
+
+        codes = {1: code_1, 2: code_2}
+        pieces, rows, last_datetimes = {1: [], 2: []}, {1: 0, 2: 0}, {1: None, 2: None}
+        with OutputStream(code_1, "data", path_to_save, output_format) as stream_1, OutputStream(code_2, "data", path_to_save, output_format) as stream_2:
+            streams = {1: stream_1, 2: stream_2}
+            for chunk in iter_WRIC_chunks(filepath, memory_budget_mb, chunk_rows, combine, method, start, end, notefilepath, keywords_dict):
+                with timed_stage("write_output") as stage:
+                    for room, df_room in zip((1, 2), chunk):
+                        streams[room].write(df_room)
+                        if notefilepath is not None and len(df_room):
+                            segments = protocol_segments(df_room, room)
+                            segments[['row_start', 'row_stop']] += rows[room]
+                            pieces[room].append(segments)
+                            last_datetimes[room] = df_room['datetime'].iloc[-1]
+                        rows[room] += len(df_room)
+                    stage["rows"] = len(chunk[0]) + len(chunk[1])
+
+        if notefilepath is not None:
+            for room in (1, 2):
+                segments = stitch_segments(pieces[room], rows[room], last_datetimes[room], room) if pieces[room] else protocol_segments(chunk[room - 1], room)
+                save_output(segments, codes[room], "segments", path_to_save, output_format)
+
+        return R1_metadata, R2_metadata, rows[1], rows[2]
+
+def follow_WRIC_file(filepath, notefilepath=None, combine=True, method="mean", start=None, keywords_dict=None, poll_interval=60, timeout=None):
+    """
+    Follows a WRIC file while OmniCal appends to it (e.g. in C:\\MI_Room_Calorimeter\\Results_online\\1_minute\\)
+    and yields the new rows of each room together with running totals.
+
+    Only the newly appended rows are read and processed, so the cost of each update does not grow with the
+    length of the stay. The protocol is taken from the note file as it is at the time the rows are read;
+    rows that were already yielded are not labelled again if notes are added for an earlier time.
+
+    Parameters:
+    ----------
+    filepath : str
+        Path to the WRIC .txt file that is written to.
+    notefilepath : str, optional
+        Path to corresponding notefile (txt), read again whenever it changes.
+    combine : bool, optional
+        Whether to combine S1 and S2 measurements. Default is True.
+    method : str, optional
+        Method for combining measurements, see combine_measurements(). Also used for the running totals. Default is 'mean'.
+    start : str or datetime or None, optional
+        Start datetime; rows before this are skipped.
+    keywords_dict : dict, optional
+        Keywords used to extract the protocol from the notefile, see KEYWORDS_DICT (default if None).
+    poll_interval : float, optional
+        Seconds to wait before checking the file again. Default is 60.
+    timeout : float or None, optional
+        Stop if no new rows were added for this many seconds. None (default) follows the file until the generator is closed.
+
+    Yields:
+    -------
+    tuple
+        (df_room1, df_room2, totals):
+        - DataFrames with the new rows of each room, with the same columns as returned by preprocess_WRIC_file().
+        - totals: DataFrame indexed by room (1, 2) with the number of 'rows', the total 'energy_expenditure_kcal' and the
+          'mean_RER' of all rows so far. Each row counts for the time since the previous row, so the energy does not
+          depend on the sampling interval and the first row only marks the start.
+
+    Examples:
+    --------
+    >>> for df_room1, df_room2, totals in follow_WRIC_file(path, notefilepath):
+    ...     print(totals)
+    """
+    offset, pending, data_started, layout = 0, b"", False, None
+    drift, protocol_lists, note_stat = None, {1: [], 2: []}, None
+    first_datetime, last_datetime = None, None
+    totals = pd.DataFrame({'rows': [0, 0], 'energy_expenditure_kcal': [0.0, 0.0], 'mean_RER': [np.nan, np.nan]}, index=pd.Index([1, 2], name='room'))
+    rer_sums = np.zeros(2)
+    rer_counts = np.zeros(2)
+    last_update = time.monotonic()
+
+    while True:
+        with open(filepath, "rb") as file:
+            file.seek(offset)
+            chunk = file.read()
+        offset += len(chunk)
+        # only parse complete lines, the last line might still be written
+        content = pending + chunk
+        complete = content.rfind(b"\n") + 1
+        content, pending = content[:complete], content[complete:]
+
+        if not data_started and content:
+            lines = decode_bytes(content).splitlines(keepends=True)
+            try:
+                data_start = find_data_start(lines)
+            except ValueError:
+                data_start = None
+            if data_start is None or len(lines) <= data_start:
+                pending = content + pending  # the header is not complete yet
+                content = b""
+            else:
+                if header_rooms(lines) != [1, 2]:
+                    raise ValueError(f"The WRIC file has the rooms {header_rooms(lines)}, follow mode expects rooms 1 and 2.")
+                data_started = True
+                layout = parse_layout(lines[data_start - 1])
+                content = "".join(lines[data_start + 1:]).encode()
+
+        df = parse_wric_data(io.StringIO(decode_bytes(content)), skip_header=False, layout=layout) if data_started and content.strip() else None
+        if df is not None and len(df) and notefilepath is not None:
+            stat = os.stat(notefilepath)
+            if (stat.st_mtime_ns, stat.st_size) != note_stat:
+                note_stat = (stat.st_mtime_ns, stat.st_size)
+                drift, protocol_lists = protocol_events(notefilepath, keywords_dict)
+        if df is not None and drift is not None:
+            # as in process_rooms(), the start is compared with the datetimes after adding the drift, shifted by the drift as well
+            df = df.assign(datetime=df['datetime'] + drift)
+        if df is not None and not pd.isna(start):
+            df = df[df['datetime'] >= pd.to_datetime(start) + (drift if drift is not None else pd.Timedelta(0))]
+
+        if df is not None and len(df):
+            last_update = time.monotonic()
+            if first_datetime is None:
+                first_datetime = df['datetime'].iloc[0]
+            # minutes since the previous row, to turn the energy expenditure per minute into kcal
+            datetimes = df['datetime'].to_numpy(dtype='datetime64[ns]')
+            minutes = np.diff(datetimes, prepend=datetimes[:1] if last_datetime is None else last_datetime) / np.timedelta64(1, 'm')
+            last_datetime = datetimes[-1]
+
+            dfs = []
+            for room in ['R1', 'R2']:
+                df_room = df[[col for col in df.columns if col.startswith(f"{room}_")]].copy()
+                df_room['datetime'] = df['datetime']
+                dfs.append(add_relative_time(df_room, first_datetime))
+            combined = combine_rooms(dfs[0], dfs[1], method)
+            if combine:
+                dfs = list(combined)
+            for i, room in enumerate([1, 2]):
+                if notefilepath is not None:
+                    dfs[i] = update_protocol(dfs[i], protocol_lists[room])
+                rer = combined[i]['RER'].to_numpy()
+                rer_sums[i] += np.nansum(rer)
+                rer_counts[i] += np.count_nonzero(~np.isnan(rer))
+                totals.loc[room, 'rows'] += len(dfs[i])
+                totals.loc[room, 'energy_expenditure_kcal'] += np.nansum(combined[i]['Energy Expenditure (kcal/min)'].to_numpy() * minutes)
+                totals.loc[room, 'mean_RER'] = rer_sums[i] / rer_counts[i] if rer_counts[i] else np.nan
+            yield dfs[0], dfs[1], totals.copy()
+        elif timeout is not None and time.monotonic() - last_update > timeout:
+            return
+        else:
+            time.sleep(poll_interval)
+
+def pair_wric_files(folder_path, data_prefix="Results_1m_", note_prefix="note_"):
+    """
+    Pairs the WRIC data files in a folder with their note files.
+
+    Data files are named e.g. "Results_1m_0101_202501130800.txt" and the corresponding note file
+    "note_202501130800.txt", i.e. they share the last part of the file name (the start of the recording).
+
+    Parameters:
+    ----------
+    folder_path : str
+        Folder containing the data and note files.
+    data_prefix : str, optional
+        Prefix of the data files. Default is "Results_1m_".
+    note_prefix : str, optional
+        Prefix of the note files. Default is "note_".
+
+    Returns:
+    -------
+    list of tuple
+        Sorted list of (datafilepath, notefilepath) pairs. notefilepath is None if there is no matching note file.
+    """
+    files = set(os.listdir(folder_path))
+    pairs = []
+    for filename in sorted(files):
+        if not (filename.startswith(data_prefix) and filename.lower().endswith(".txt")):
+            continue
+        key = filename[:-4].rsplit("_", 1)[-1]
+        notefile = f"{note_prefix}{key}.txt"
+        pairs.append((os.path.join(folder_path, filename), os.path.join(folder_path, notefile) if notefile in files else None))
+    return pairs
+
+def job_result(filepath, notefilepath, status="ok", error=None, **fields):
+    """
+    Helper Function for preprocess_WRIC_folder() that creates a row of the batch summary.
+    Not intended for modular use.
+    """
+    result = {"file": os.path.basename(filepath), "notefile": os.path.basename(notefilepath) if notefilepath else None,
+              "status": status, "code_1": None, "code_2": None, "rows_room1": None, "rows_room2": None, "error": error, "seconds": 0.0}
+    result.update(fields)
+    return result
+
+def process_WRIC_job(filepath, notefilepath, kwargs):
+    """
+    Helper Function for preprocess_WRIC_folder() that preprocesses a single file and catches all errors,
+    so that one broken file does not stop the whole batch. Not intended for modular use.
+    """
+    started = time.perf_counter()
+    result = job_result(filepath, notefilepath)
+    if kwargs.get("profile"):
+        # the stages are collected here and returned, as the hook of the caller is not available in a worker process
+        profiler = StageProfiler()
+        kwargs = dict(kwargs, profile=profiler)
+        result["stages"] = profiler.records
+    try:
+        if kwargs.get("memory_budget_mb") is not None:
+            R1_metadata, R2_metadata, rows_room1, rows_room2 = preprocess_WRIC_file_chunked(filepath, notefilepath=notefilepath, **kwargs)
+            metadata, rows = {1: R1_metadata, 2: R2_metadata}, {1: rows_room1, 2: rows_room2}
+        elif kwargs.get("cache_dir") is not None:
+            R1_metadata, R2_metadata, df_room1, df_room2 = preprocess_WRIC_file(filepath, notefilepath=notefilepath, **kwargs)
+            metadata, rows = {1: R1_metadata, 2: R2_metadata}, {1: len(df_room1), 2: len(df_room2)}
+        else:
+            # any number of rooms, the cache is only available for files with two rooms
+            metadata, data = preprocess_WRIC_rooms(filepath, notefilepath=notefilepath, **{key: value for key, value in kwargs.items() if key != "cache_dir"})
+            rows = {room: len(df) for room, df in data.items()}
+        codes = room_codes(kwargs.get("code", "id"), kwargs.get("manual"), metadata)
+        result.update({f"code_{room}": codes[room] for room in codes})
+        result.update({f"rows_room{room}": rows[room] for room in rows})
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def preprocess_WRIC_folder(folder_path, workers=None, code="id", manual=None, save_csv=True, path_to_save=None, combine=True, method="mean", start=None, end=None, keywords_dict=None, output_format="csv", cache_dir=None, data_prefix="Results_1m_", note_prefix="note_", profile=None, memory_budget_mb=None, qc=None):
+    """
+    Preprocesses all WRIC files of a study folder in parallel, pairing each data file with its note file.
+
+    Parameters:
+    ----------
+    folder_path : str
+        Folder containing the data files (e.g. "Results_1m_0101_202501130800.txt") and note files (e.g. "note_202501130800.txt").
+    workers : int or None, optional
+        Number of worker processes. None uses all cores, 1 processes the files one after another in this process.
+    code : str, optional
+        Method for generating subject IDs ("id", "id+comment", or "manual"). Default is "id".
+    manual : dict or None, optional
+        If `code` is "manual", a dictionary with the data file name as key and the list of codes
+        for Room 1 and Room 2 (one per room, see room_codes()) as value, e.g. {"Results_1m_0101_202501130800.txt": ["1234_visit1", "5678_visit1"]}.
+    save_csv, path_to_save, combine, method, start, end, keywords_dict, output_format, cache_dir :
+        See preprocess_WRIC_file().
+    data_prefix, note_prefix : str, optional
+        Prefixes of the data and note files, see pair_wric_files().
+    profile : bool, callable or None, optional
+        Profiles the stages of each file, see preprocess_WRIC_file(). True logs a report aggregated over all
+        files at the end; a callable (e.g. a StageProfiler) is called with the record of each stage. Default is None.
+    memory_budget_mb : float or None, optional
+        Processes each file in chunks within this memory budget per worker, see preprocess_WRIC_file_chunked().
+        The files are always saved and the cache is not used. None (default) processes each file at once.
+    qc : str or None, optional
+        Quality control of the sensors, see preprocess_WRIC_file(). Default is None. The rolling checks need the whole
+        recording, so chunked processing (`memory_budget_mb`) skips them; check the raw files with sensor_qc_folder() instead.
+
+    Returns:
+    -------
+    pd.DataFrame
+        Summary with one row per data file (sorted by file name) with the status ("ok" or "error"),
+        codes, number of rows per room, error message and processing time in seconds.
+        Files with more rooms add the columns of these rooms (e.g. 'code_3' and 'rows_room3').
+
+    Notes:
+    ------
+    - Files with any number of rooms are processed (see preprocess_WRIC_rooms()), except with `cache_dir`
+      or `memory_budget_mb`, which need the two rooms of OmniCal.
+    - Errors are caught per file and reported in the summary; the other files are still processed.
+    - Files whose codes would overwrite the output of another file are not processed and reported as errors,
+      so the output does not depend on the order in which the workers finish.
+    - On Windows, call this function from within an `if __name__ == "__main__":` block of your script.
+    """
+    pairs = pair_wric_files(folder_path, data_prefix, note_prefix)
+    kwargs = dict(code=code, path_to_save=path_to_save, combine=combine, method=method, start=start, end=end, keywords_dict=keywords_dict, output_format=output_format, profile=bool(profile))
+    if memory_budget_mb is None:
+        kwargs.update(save_csv=save_csv, cache_dir=cache_dir, qc=qc)
+    elif not save_csv or cache_dir is not None:
+        raise ValueError("Chunked processing (memory_budget_mb) streams the results to files, so it needs save_csv=True and no cache_dir.")
+    else:
+        kwargs.update(memory_budget_mb=memory_budget_mb)
+    profiler = StageProfiler() if profile is True else profile
+
+    # check the output codes up front (only reads the header of each file) to avoid files overwriting each other
+    results, jobs, used_codes = {}, [], {}
+    for filepath, notefilepath in pairs:
+        filename = os.path.basename(filepath)
+        job_kwargs = dict(kwargs, manual=manual.get(filename) if isinstance(manual, dict) else manual)
+        try:
+            with open(filepath, "r") as file:
+                lines = read_header(file)
+            room_code = extract_room_meta_data(lines, code, job_kwargs["manual"], False, None)[0]
+            codes = list(room_code.values())
+        except Exception as e:
+            results[filepath] = job_result(filepath, notefilepath, "error", f"{type(e).__name__}: {e}")
+            continue
+        duplicates = [used_codes[c] for c in codes if c in used_codes]
+        if duplicates or len(set(codes)) < len(codes):
+            results[filepath] = job_result(filepath, notefilepath, "error", f"Output codes {codes} are already used by {duplicates or [filename]}. Use code='id+comment' or code='manual'.",
+                                           **{f"code_{room}": c for room, c in room_code.items()})
+            continue
+        used_codes.update({c: filename for c in codes})
+        jobs.append((filepath, notefilepath, job_kwargs))
+
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            results[job[0]] = process_WRIC_job(*job)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            futures = {executor.submit(process_WRIC_job, *job): job for job in jobs}
+            for future in concurrent.futures.as_completed(futures):
+                filepath, notefilepath, _ = futures[future]
+                try:
+                    results[filepath] = future.result()
+                except Exception as e:  # e.g. a worker process that died
+                    results[filepath] = job_result(filepath, notefilepath, "error", f"{type(e).__name__}: {e}")
+
+    if profiler:
+        for filepath, _ in pairs:
+            for record in results[filepath].pop("stages", []):
+                profiler(record)
+        if profile is True:
+            logger.info(f"Time per stage:\n{profiler.report().to_string(index=False)}")
+
+    rooms = sorted({int(key[len("code_"):]) for result in results.values() for key in result if key.startswith("code_")})
+    summary = pd.DataFrame([results[filepath] for filepath, _ in pairs],
+                           columns=["file", "notefile", "status"] + [f"code_{room}" for room in rooms] + [f"rows_room{room}" for room in rooms] + ["error", "seconds"])
+    summary = summary.astype({f"rows_room{room}": "Int64" for room in rooms})
+    failed = summary[summary["status"] != "ok"]
+    logger.info(f"Processed {len(summary)} files: {len(summary) - len(failed)} succeeded, {len(failed)} failed.")
+    for _, row in failed.iterrows():
+        logger.warning(f"  {row['file']}: {row['error']}")
+    return summary
@@ -0,0 +1,135 @@
+import contextlib
+import contextvars
+import logging
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# This file includes the diagnostic messages and the (opt-in) profiling of the processing stages.
+
+# Diagnostic messages (e.g. the detected drift and start/end times) go through this logger. As a library, wrictools
+# leaves the level, handlers and propagation to the application: show them with logging.basicConfig(level=logging.INFO)
+# or silence them with logging.getLogger("wrictools").setLevel(logging.WARNING). The command line interface prints
+# them (see print_messages()).
+logger = logging.getLogger("wrictools")
+logger.addHandler(logging.NullHandler())
+
+class PrintHandler(logging.Handler):
+    """
+    Helper Class that prints log messages, the output of the diagnostic messages in the terminal (see print_messages()).
+    Not intended for modular use.
+    """
+    def emit(self, record):
+        print(self.format(record))
+
+def print_messages(level=logging.INFO):
+    """
+    Prints the diagnostic messages of at least `level` (e.g. logging.WARNING to only show warnings and errors),
+    as the command line interface does.
+    """
+    if not any(isinstance(handler, PrintHandler) for handler in logger.handlers):
+        logger.addHandler(PrintHandler())
+    logger.setLevel(level)
+    logger.propagate = False
+
+# (hook, label, state) of the run that is currently profiled, see profile_run()
+CURRENT_PROFILE = contextvars.ContextVar("CURRENT_PROFILE", default=None)
+
+class StageProfiler:
+    """
+    Collects the timing and memory of the stages of profiled runs (see the `profile` parameter of preprocess_WRIC_file()).
+
+    Examples:
+    --------
+    >>> profiler = StageProfiler()
+    >>> preprocess_WRIC_file(filepath, notefilepath=notefilepath, profile=profiler)
+    >>> profiler.report()
+    """
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def report(self):
+        """
+        Aggregates the records per stage, sorted by the total time.
+
+        Returns:
+        -------
+        pd.DataFrame
+            'stage', number of 'calls', 'total_s', 'mean_s' and 'max_s' (seconds), 'rows' (processed in total)
+            and 'max_peak_mb' (highest memory allocated during the stage, in megabytes). The stage 'total' is
+            the whole run of each file, its peak is the highest memory allocated at any point of the run.
+        """
+        records = pd.DataFrame(self.records, columns=["file", "stage", "seconds", "rows", "peak_mb"])
+        report = records.groupby("stage", sort=False).agg(calls=("seconds", "size"), total_s=("seconds", "sum"), mean_s=("seconds", "mean"),
+                                                          max_s=("seconds", "max"), rows=("rows", "sum"), max_peak_mb=("peak_mb", "max"))
+        return report.sort_values("total_s", ascending=False).reset_index()
+
+def log_stage(record):
+    """
+    Helper Function that logs the record of a stage, the default hook of profile=True. Not intended for modular use.
+    """
+    rows = "" if record["rows"] is None else f", {record['rows']} rows"
+    logger.info(f"{record['file']}: {record['stage']} took {record['seconds']:.3f} s (peak {record['peak_mb']:.1f} MB{rows})")
+
+@contextlib.contextmanager
+def profile_run(profile, label):
+    """
+    Helper Function that enables the profiling of the stages (see timed_stage()) within a run of preprocess_WRIC_file()
+    and records the run as the stage 'total'. Memory is traced with tracemalloc, which slows down the processing (and
+    does not see the memory of pyarrow, e.g. the strings of the notes). Not intended for modular use.
+    """
+    if not profile:
+        yield
+        return
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    hook = log_stage if profile is True else profile
+    # highest memory traced during the run, updated by the stages before they reset the peak of tracemalloc
+    state = {"peak": 0}
+    token = CURRENT_PROFILE.set((hook, label, state))
+    record = {"file": label, "stage": "total", "rows": None}
+    tracemalloc.reset_peak()
+    allocated = tracemalloc.get_traced_memory()[0]
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["seconds"] = time.perf_counter() - started_at
+        record["peak_mb"] = (max(state["peak"], tracemalloc.get_traced_memory()[1]) - allocated) / 1e6
+        CURRENT_PROFILE.reset(token)
+        if started:
+            tracemalloc.stop()
+        hook(record)
+
+@contextlib.contextmanager
+def timed_stage(name):
+    """
+    Helper Function that measures the wall time and peak memory of a stage if the run is profiled (see profile_run()),
+    and passes the record to the hook of the run. Set 'rows' of the yielded record to report the processed rows.
+    tracemalloc traces (and resets the peak of) the whole process, so the peak of a stage is only its own if no other
+    thread allocates at the same time; process_rooms() therefore runs the rooms of a profiled run one after another.
+    Not intended for modular use.
+    """
+    profile = CURRENT_PROFILE.get()
+    record = {"stage": name, "rows": None}
+    if profile is None:
+        yield record
+        return
+    hook, record["file"], state = profile
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        state["peak"] = max(state["peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        allocated = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        record["peak_mb"] = (tracemalloc.get_traced_memory()[1] - allocated) / 1e6 if tracing else np.nan
+        hook(record)
@@ -0,0 +1,264 @@
+import os
+import re
+import warnings
+import numpy as np
+import pandas as pd
+from .io import read_wric_file
+from .profiling import logger
+
+# This file includes the quality control (QC) of the sensors: flatlined or spiking channels, drops of the flow, drift of
+# the inlet gas concentrations, gaps in the time series and implausible RER. Each check runs on all matching channels
+# (of all rooms and sets) of a DataFrame and the flagged rows are returned as intervals, like check_discrepancies().
+
+QC_CHECKS = ("flatline", "spike", "flow_drop", "drift", "gap", "rer")
+# What the preprocessing does with the flagged intervals (see the `qc` parameter of preprocess_WRIC_file()):
+# "flag" saves them, "mask" saves them and replaces the flagged values with NaN (see mask_qc())
+QC_MODES = ("flag", "mask")
+# Parameters that are measured continuously and should never stay exactly the same or jump for a single row
+# (the Activity Monitor and the ambient sensors can legitimately be constant)
+SENSOR_PARAMETERS = ["VO2", "VCO2", "RER", "FiO2", "FeO2", "FiCO2", "FeCO2", "Flow"]
+# Allowed deviation of the rolling mean of the inlet concentrations (in %) from their median over the recording
+DRIFT_TOLERANCES = {"FiO2": 0.1, "FiCO2": 0.01}
+# Room and parameter of a column, e.g. "R1_S2_VO2" (raw), "S1_VO2" or "VO2" (processed)
+CHANNEL_PATTERN = re.compile(r"^(?:R(\d+)_)?(?:S\d+_)?(.+)$")
+
+def channel_parameters(columns, room=None):
+    """
+    Helper Function that returns the room (`room` if the column has none) and parameter of each column.
+    Not intended for modular use.
+    """
+    matches = [CHANNEL_PATTERN.match(str(col)) for col in columns]
+    rooms = [int(match.group(1)) if match.group(1) else room for match in matches]
+    return rooms, [match.group(2) for match in matches]
+
+def runs(mask):
+    """
+    Helper Function that finds the runs of consecutive True rows of a mask. Not intended for modular use.
+
+    Returns:
+    -------
+    tuple
+        (row_start, row_stop) arrays of the runs; row_stop is exclusive.
+    """
+    edges = np.diff(np.concatenate(([False], mask, [False])).view(np.int8))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def run_maximum(statistic, row_start, row_stop):
+    """
+    Helper Function that returns the maximum of a statistic over each run [row_start, row_stop) (see runs()).
+    Not intended for modular use.
+    """
+    if not len(row_start):
+        return np.array([])
+    # a row is appended as row_stop may be the end of the statistic; fmax ignores missing values
+    return np.fmax.reduceat(np.append(statistic, np.nan), np.column_stack([row_start, row_stop]).ravel())[::2]
+
+def nan_median(values):
+    """
+    Helper Function that returns the median ignoring missing values (NaN for a channel without data).
+    Not intended for modular use.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # channel without data
+        return np.nanmedian(values)
+
+def rolling_mean(values, window):
+    """
+    Helper Function that returns the centered rolling mean over `window` rows, ignoring missing values
+    (computed with cumulative sums). Not intended for modular use.
+    """
+    def padded_cumsum(x):
+        # the window of row i is [i, i + window) of the padded sums, which repeat their first and last value at the edges
+        sums = np.empty(len(x) + window + 1)
+        sums[:window // 2 + 1] = 0
+        np.cumsum(x, out=sums[window // 2 + 1:len(x) + window // 2 + 1])
+        sums[len(x) + window // 2 + 1:] = sums[len(x) + window // 2]
+        return sums
+
+    missing = np.isnan(values)
+    sums = padded_cumsum(np.where(missing, 0, values))
+    counts = padded_cumsum(~missing)
+    mean = sums[window:window + len(values)] - sums[:len(values)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean /= counts[window:window + len(values)] - counts[:len(values)]
+    return mean
+
+def sensor_qc(df, room=None, checks=QC_CHECKS, flatline_rows=5, spike_threshold=6.0, flow_drop=0.2, drift_window=60,
+              drift_tolerances=None, gap_factor=1.5, rer_range=(0.65, 1.3)):
+    """
+    Checks the sensors of a WRIC DataFrame and returns the flagged intervals, for all matching channels, e.g. all
+    rooms and sets of read_wric_file() or a processed room of preprocess_WRIC_file(). Each check is computed on the
+    whole recording at once, one channel after another, so the memory used stays a few times that of one column.
+
+    Parameters:
+    ----------
+    df : pd.DataFrame
+        WRIC data with a 'datetime' column and the parameters as columns (e.g. 'R1_S1_VO2', 'S1_VO2' or 'VO2').
+    room : int or None, optional
+        Room of the columns without room in their name (e.g. of a processed room). Default is None.
+    checks : list of str, optional
+        The checks to run (see QC_CHECKS), default is all of them:
+        - "flatline": a sensor parameter (see SENSOR_PARAMETERS) with exactly the same value for `flatline_rows` rows or more.
+        - "spike": a single row of a sensor parameter that jumps away from both neighbours by more than `spike_threshold`
+          times the typical row-to-row change of the channel (a robust standard deviation of its differences).
+        - "flow_drop": the Flow more than `flow_drop` (fraction) below its median.
+        - "drift": the rolling mean over `drift_window` rows of FiO2 or FiCO2 further from its median than the
+          tolerance of DRIFT_TOLERANCES (in %).
+        - "gap": a step between two rows that is longer than `gap_factor` times the usual sampling interval.
+        - "rer": an RER outside of `rer_range`.
+    flatline_rows, spike_threshold, flow_drop, drift_window, gap_factor, rer_range :
+        Limits of the checks, see above. Defaults are 5, 6.0, 0.2, 60, 1.5 and (0.65, 1.3).
+    drift_tolerances : dict or None, optional
+        Tolerance per parameter for "drift", replacing the defaults of DRIFT_TOLERANCES, e.g. {"FiO2": 0.05}.
+
+    Returns:
+    -------
+    pd.DataFrame
+        One row per interval of consecutive flagged rows with 'room', 'channel' (the column, 'datetime' for gaps),
+        'check', 'row_start' and 'row_stop' (positional, exclusive), 'start' and 'end' (datetimes), 'n_rows' and
+        'value', the worst value of the check in the interval: the flat value, the jump in robust standard
+        deviations, the relative drop of the flow, the drift in %, the length of the gap in minutes or
+        the distance of the RER from the plausible range. Gaps span the two rows before and after the gap.
+
+    Raises:
+    ------
+    ValueError
+        If a check is not supported.
+    """
+    unknown = [check for check in checks if check not in QC_CHECKS]
+    if unknown:
+        raise ValueError(f"QC check {', '.join(unknown)} is not supported. Use {', '.join(QC_CHECKS)}.")
+    tolerances = dict(DRIFT_TOLERANCES, **(drift_tolerances or {}))
+    columns = [col for col in df.columns if col != "datetime"]
+    rooms, parameters = channel_parameters(columns, room)
+    datetimes = df["datetime"].to_numpy(dtype="datetime64[ns]") if "datetime" in df.columns else None
+
+    found = {"room": [], "channel": [], "check": [], "row_start": [], "row_stop": [], "value": []}
+    def add(check, channel_room, channel, mask, statistic, extend_start=0, min_rows=1):
+        row_start, row_stop = runs(mask)
+        keep = row_stop - row_start >= min_rows
+        row_start, row_stop = row_start[keep], row_stop[keep]
+        found["value"].append(run_maximum(statistic, row_start, row_stop))
+        found["row_start"].append(np.maximum(row_start - extend_start, 0))
+        found["row_stop"].append(row_stop)
+        found["room"] += [channel_room] * len(row_start)
+        found["channel"] += [channel] * len(row_start)
+        found["check"] += [check] * len(row_start)
+
+    for col, channel_room, parameter in zip(columns, rooms, parameters):
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        values = df[col].to_numpy(dtype=np.float64)
+        if parameter in SENSOR_PARAMETERS and "flatline" in checks and len(values) > 1:
+            # a row equal to the previous one; a run of flatline_rows - 1 of them is a flat interval of flatline_rows rows
+            same = np.zeros(len(values), dtype=bool)
+            same[1:] = values[1:] == values[:-1]
+            add("flatline", channel_room, col, same, values, extend_start=1, min_rows=max(flatline_rows - 1, 1))
+        if parameter in SENSOR_PARAMETERS and "spike" in checks and len(values) > 2:
+            steps = np.diff(values)
+            scale = 1.4826 * nan_median(np.abs(steps - nan_median(steps)))
+            if scale > 0:
+                # the smaller of the jumps into and out of each row, if they go in opposite directions
+                score = np.zeros(len(values))
+                jumps = np.abs(steps)
+                np.minimum(jumps[:-1], jumps[1:], out=score[1:-1])
+                score[1:-1][steps[:-1] * steps[1:] >= 0] = 0
+                score /= scale
+                add("spike", channel_room, col, score > spike_threshold, score)
+        if parameter == "Flow" and "flow_drop" in checks:
+            drop = 1 - values / nan_median(values)
+            add("flow_drop", channel_room, col, drop > flow_drop, drop)
+        if parameter in tolerances and "drift" in checks:
+            deviation = np.abs(rolling_mean(values, drift_window) - nan_median(values))
+            add("drift", channel_room, col, deviation > tolerances[parameter], deviation)
+        if parameter == "RER" and "rer" in checks:
+            outside = np.maximum(rer_range[0] - values, values - rer_range[1])
+            add("rer", channel_room, col, outside > 0, outside)
+    if "gap" in checks and datetimes is not None and len(datetimes) > 2:
+        steps = np.diff(datetimes).astype("timedelta64[ns]").astype(np.float64) / 60e9
+        gap = np.concatenate(([0], steps))
+        add("gap", room, "datetime", gap > gap_factor * np.median(steps), gap, extend_start=1)
+
+    row_start = np.concatenate(found["row_start"]).astype(np.int64) if found["row_start"] else np.array([], dtype=np.int64)
+    row_stop = np.concatenate(found["row_stop"]).astype(np.int64) if found["row_stop"] else np.array([], dtype=np.int64)
+    return pd.DataFrame({
+        "room": pd.array(found["room"], dtype="Int64"),
+        "channel": pd.array(found["channel"], dtype=object),
+        "check": pd.array(found["check"], dtype=object),
+        "row_start": row_start,
+        "row_stop": row_stop,
+        "start": datetimes[row_start] if datetimes is not None else None,
+        "end": datetimes[row_stop - 1] if datetimes is not None else None,
+        "n_rows": row_stop - row_start,
+        "value": np.concatenate(found["value"]) if found["value"] else np.array([]),
+    })
+
+def mask_qc(df, flagged, checks=None):
+    """
+    Replaces the values of the flagged intervals (see sensor_qc()) with NaN, e.g. before averaging over time.
+
+    Parameters:
+    ----------
+    df : pd.DataFrame
+        The data that was checked.
+    flagged : pd.DataFrame
+        The intervals returned by sensor_qc() for `df`.
+    checks : list of str or None, optional
+        Only mask the intervals of these checks. All checks if None. Gaps have no values to mask.
+
+    Returns:
+    -------
+    pd.DataFrame
+        A copy of `df` with the flagged values missing.
+    """
+    if checks is not None:
+        flagged = flagged[flagged["check"].isin(checks)]
+    flagged = flagged[flagged["channel"].isin([col for col in df.columns if col != "datetime"])]
+    df = df.copy()
+    for channel, intervals in flagged.groupby("channel", sort=False):
+        # +1 at the start and -1 at the stop of each interval, the running sum is positive within the intervals
+        edges = np.zeros(len(df) + 1, dtype=np.int64)
+        np.add.at(edges, intervals["row_start"].to_numpy(), 1)
+        np.add.at(edges, intervals["row_stop"].to_numpy(), -1)
+        df[channel] = df[channel].mask(np.cumsum(edges[:-1]) > 0)
+    return df
+
+def log_qc(flagged, label):
+    """
+    Helper Function that logs the number of flagged intervals per check. Not intended for modular use.
+    """
+    if len(flagged):
+        counts = flagged["check"].value_counts(sort=False)
+        logger.info(f"{label}: QC flagged {', '.join(f'{count} {check}' for check, count in counts.items())}")
+
+def sensor_qc_folder(folder_path, data_prefix="Results_1m_", **kwargs):
+    """
+    Checks the sensors (see sensor_qc()) of all raw WRIC files in a folder, all rooms and sets of a file at once.
+
+    Parameters:
+    ----------
+    folder_path : str
+        Folder containing the WRIC data files.
+    data_prefix : str, optional
+        Prefix of the data files. Default is "Results_1m_".
+    **kwargs :
+        Checks and limits, see sensor_qc().
+
+    Returns:
+    -------
+    pd.DataFrame
+        The flagged intervals of all files, see sensor_qc(), with an additional 'file' column.
+        Files that can not be read are reported in the terminal and left out.
+    """
+    from .processing import pair_wric_files  # the processing runs the QC, so it is imported here
+
+    tables = []
+    for filepath, _ in pair_wric_files(folder_path, data_prefix):
+        filename = os.path.basename(filepath)
+        try:
+            _, df = read_wric_file(filepath)
+        except Exception as e:
+            logger.warning(f"{filename} could not be checked: {type(e).__name__}: {e}")
+            continue
+        tables.append(sensor_qc(df, **kwargs).assign(file=filename))
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
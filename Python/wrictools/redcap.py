@@ -0,0 +1,513 @@
+import collections
+import concurrent.futures
+import csv
+import functools
+import os
+import queue
+import threading
+import time
+import pandas as pd
+from .io import check_code, output_path
+from .processing import preprocess_WRIC_file
+from .profiling import StageProfiler, logger
+
+# This file includes the export from and upload to REDCap. The requests library and your config.py are only
+# loaded when REDCap is used for the first time, so the rest of the package works without them.
+
+@functools.lru_cache(maxsize=None)
+def load_config():
+    """
+    Loads `config` from your config.py (see config_example.py) on first use.
+
+    Returns:
+    -------
+    dict
+        The configuration with 'api_url' and 'api_token'.
+
+    Raises:
+    ------
+    ImportError
+        If there is no config.py on the Python path (e.g. in the folder of your script).
+    """
+    try:
+        from config import config
+    except ImportError as e:
+        raise ImportError("REDCap needs a config.py with your API url and token (see config_example.py), "
+                          "or pass api_url and api_token to RedcapClient().") from e
+    return config
+
+class RedcapClient:
+    """
+    Client for the REDCap API that reuses pooled connections, retries transient errors and
+    transfers files for many records concurrently.
+
+    Parameters:
+    ----------
+    api_url : str or None, optional
+        URL of the REDCap API. Uses `config['api_url']` (see load_config()) if None.
+    api_token : str or None, optional
+        Your API token. Uses `config['api_token']` (see load_config()) if None.
+    max_workers : int, optional
+        Maximum number of concurrent requests (and pooled connections) for bulk transfers. Default is 4.
+    retries : int, optional
+        Number of retries for connection errors and transient HTTP errors (429, 500, 502, 503, 504). Default is 3.
+    backoff : float, optional
+        Backoff factor in seconds between retries (doubling with every retry). Default is 0.5.
+    timeout : float or tuple, optional
+        Connect and read timeout in seconds for each request. Default is (10, 300).
+
+    Notes:
+    ------
+    - The requests library validates the SSL certficate by default to avoid 'Man in the Middle Attacks'
+    - Can be used as a context manager to close the connections afterwards.
+    """
+    def __init__(self, api_url=None, api_token=None, max_workers=4, retries=3, backoff=0.5, timeout=(10, 300)):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.api_url = api_url if api_url else load_config()['api_url']
+        self.api_token = api_token if api_token else load_config()['api_token']
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        # REDCap file export/import is idempotent, so POST requests can be retried as well
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=None, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
+
+    def post(self, fields, files=None):
+        """
+        Sends a request to the REDCap API with the token added to the fields.
+
+        Raises:
+        ------
+        requests.HTTPError
+            If REDCap answers with an error status (after retrying transient errors).
+        """
+        import requests
+
+        r = self.session.post(self.api_url, data=dict(fields, token=self.api_token), files=files, timeout=self.timeout)
+        if not r.ok:
+            raise requests.HTTPError(f"HTTP Status {r.status_code}: {r.text[:200]}", response=r)
+        return r
+
+    def export_file(self, record_id, fieldname, return_status=False):
+        """
+        Exports the file of a record and field from REDCap.
+
+        Parameters:
+        ----------
+        record_id : str
+            The unique identifier for the record in REDCap.
+        fieldname : str
+            The field name from which to export the file.
+        return_status : bool, optional
+            If True, also returns the HTTP status code of the (last) response. Default is False.
+
+        Returns:
+        -------
+        bytes or tuple
+            The content of the file, or (content, status_code) if `return_status`.
+        """
+        fields = {
+            'content': 'file',
+            'action': 'export',
+            'record': record_id,
+            'field': fieldname,
+        }
+        r = self.post(fields)
+        return (r.content, r.status_code) if return_status else r.content
+
+    def import_file(self, filepath, record_id, fieldname):
+        """
+        Uploads a file to REDCap for a specified record ID and field name.
+
+        Parameters:
+        ----------
+        filepath : str
+            The path to the file to be uploaded.
+        record_id : str
+            The unique identifier for the record in REDCap.
+        fieldname : str
+            The field name to which the file will be uploaded.
+
+        Returns:
+        -------
+        int
+            The HTTP status code of the (last) response.
+        """
+        fields = {
+            'content': 'file',
+            'action': 'import',
+            'record': record_id,
+            'field': fieldname,
+            'returnFormat': 'json'
+        }
+        with open(filepath, 'rb') as file_obj:
+            return self.post(fields, files={'file': (os.path.basename(filepath), file_obj.read())}).status_code
+
+    def run_bulk(self, func, jobs):
+        """
+        Helper Function that runs `func(*args)` for all jobs (record_id -> args) with at most `max_workers`
+        requests at the same time and returns a status per record. Not intended for modular use.
+        """
+        def run(record_id, args):
+            started = time.perf_counter()
+            try:
+                return {"status": "ok", "result": func(*args), "error": None, "seconds": round(time.perf_counter() - started, 3)}
+            except Exception as e:
+                return {"status": "error", "result": None, "error": f"{type(e).__name__}: {e}", "seconds": round(time.perf_counter() - started, 3)}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {record_id: executor.submit(run, record_id, args) for record_id, args in jobs.items()}
+        statuses = {record_id: future.result() for record_id, future in futures.items()}
+
+        failed = {record_id: status for record_id, status in statuses.items() if status["status"] != "ok"}
+        logger.info(f"Transferred {len(statuses)} records: {len(statuses) - len(failed)} succeeded, {len(failed)} failed.")
+        for record_id, status in failed.items():
+            logger.warning(f"  Record {record_id}: {status['error']}")
+        return statuses
+
+    def export_files(self, record_ids, fieldname):
+        """
+        Exports the files of many records concurrently.
+
+        Parameters:
+        ----------
+        record_ids : list of str
+            The record IDs to export.
+        fieldname : str
+            The field name from which to export the files.
+
+        Returns:
+        -------
+        dict
+            For each record ID (in the given order) a dictionary with "status" ("ok" or "error"),
+            "result" (the file content as bytes or None), "error" (message or None) and "seconds".
+        """
+        return self.run_bulk(self.export_file, {record_id: (record_id, fieldname) for record_id in record_ids})
+
+    def import_files(self, filepaths, fieldname):
+        """
+        Uploads files for many records concurrently.
+
+        Parameters:
+        ----------
+        filepaths : dict
+            Record ID as key and the path of the file to upload as value.
+        fieldname : str
+            The field name to which the files will be uploaded.
+
+        Returns:
+        -------
+        dict
+            Status for each record ID, see export_files(), with the HTTP status code as "result".
+        """
+        return self.run_bulk(self.import_file, {record_id: (filepath, record_id, fieldname) for record_id, filepath in filepaths.items()})
+
+@functools.lru_cache(maxsize=None)
+def get_redcap_client():
+    """
+    Returns the shared RedcapClient configured with `config`, so that repeated calls reuse the same connections.
+    """
+    return RedcapClient()
+
+def log_error_status(error):
+    """
+    Helper Function that logs the HTTP status code of a failed request, if REDCap answered at all.
+    Not intended for modular use.
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        logger.warning(f'HTTP Status: {response.status_code}')
+
+def export_file_from_redcap(record_id, fieldname, path = None):
+    """
+    Exports a file from REDCap based on the specified record ID and field name.
+
+    Parameters:
+    ----------
+    record_id : str
+        The unique identifier for the record in REDCap.
+    fieldname : str
+        The field name from which to export the file.
+    path : str or None, optional
+        The file path where the exported file will be saved. If None, the file is not saved to disk.
+
+    Returns:
+    -------
+    bytes
+        The content of the exported file, which can be passed directly to preprocess_WRIC_file().
+
+    Notes:
+    ------
+    - The requests library validates the SSL certficate by default to avoid 'Man in the Middle Attacks'
+    - The function logs the HTTP status code of the export request (of the last try if it was retried).
+    - Uses the shared connection pool of get_redcap_client(), including retries and timeouts.
+    """
+    try:
+        content, status = get_redcap_client().export_file(record_id, fieldname, return_status=True)
+    except Exception as e:
+        log_error_status(e)
+        raise
+    logger.info(f'HTTP Status: {status}')
+
+    if path:
+        with open(path, 'wb') as f:
+            f.write(content)
+    return content
+    
+def upload_file_to_redcap(filepath, record_id, fieldname):
+    """
+    Uploads a file to REDCap for a specified record ID and field name.
+
+    Parameters:
+    ----------
+    filepath : str
+        The path to the file to be uploaded.
+    record_id : str
+        The unique identifier for the record in REDCap.
+    fieldname : str
+        The field name to which the file will be uploaded.
+
+    Notes:
+    ------
+    - The requests library validates the SSL certficate by default to avoid 'Man in the Middle Attacks'
+    - The function logs the HTTP status code of the upload request (of the last try if it was retried).
+    - Uses the shared connection pool of get_redcap_client(), including retries and timeouts.
+    """
+    try:
+        status = get_redcap_client().import_file(filepath, record_id, fieldname)
+    except Exception as e:
+        log_error_status(e)
+        raise
+    logger.info(f'HTTP Status: {status}')
+    
+def timed_call(func, *args):
+    """
+    Helper Function for preprocess_WRIC_files() that runs `func(*args)` and returns the result and the seconds it took.
+    Not intended for modular use.
+    """
+    started = time.perf_counter()
+    return func(*args), round(time.perf_counter() - started, 3)
+
+def process_record(content, kwargs):
+    """
+    Helper Function for preprocess_WRIC_files() that preprocesses the exported file of a record, in a worker process
+    if there are several workers. Returns the result of preprocess_WRIC_file(), the paths of the saved data files of
+    both rooms (None if nothing was saved) and the records of the profiled stages, as the hook of the caller is not
+    available in a worker process. Not intended for modular use.
+    """
+    profiler = StageProfiler() if kwargs["profile"] else None
+    result = preprocess_WRIC_file(content, **dict(kwargs, profile=profiler))
+    filepaths = None
+    if kwargs["save_csv"]:
+        codes = check_code(kwargs["code"], kwargs["manual"], result[0], result[1])
+        filepaths = [output_path(code, "data", kwargs["path_to_save"], kwargs["output_format"]) for code in codes]
+    return result, filepaths, profiler.records if profiler else []
+
+def upload_record(client, filepaths, record_id, fieldnames):
+    """
+    Helper Function for preprocess_WRIC_files() that uploads the processed data files of both rooms of a record.
+    Not intended for modular use.
+    """
+    for filepath, fieldname in zip(filepaths, fieldnames):
+        client.import_file(filepath, record_id, fieldname)
+
+def preprocess_WRIC_files(csv_file, fieldname, code = "id", manual = None, save_csv = True, path_to_save = None, combine = True, method = "mean", start = None, end= None, max_workers = 4, output_format = "csv", cache_dir = None, profile = None,
+                          workers = 1, queue_size = 2, upload_fieldnames = None, cancel = None, return_summary = False, qc = None):
+    """
+    Iterates through records based on record IDs in a CSV file, exporting and processing WRIC data from REDCap.
+
+    Downloading, processing and uploading overlap: while a record is processed, the next records are already
+    downloaded and the results of earlier records are uploaded, so the batch takes about as long as the slower
+    of the network and the processing instead of both added up.
+
+    Parameters:
+    ----------
+    csv_file : str
+        Path to the CSV file containing record IDs.
+    fieldname : str
+        The field name from which to export the WRIC data.
+    code : str, optional
+        Method for generating subject IDs ("id", "id+comment", or "manual"). Default is "id".
+    manual : list or None, optional
+        Custom codes for subjects in Room 1 and Room 2 if `code` is "manual". Default is None.
+    save_csv : bool, optional
+        Whether to save extracted metadata and data to files (see output_format). Default is True.
+    path_to_save : str or None, optional
+        Directory path for saving the files. Uses current directory if None. Default is None.
+    combine : bool, optional
+        Whether to combine S1 and S2 measurements into a single DataFrame. Default is True.
+    method: str, optional
+        Method for combining measurements. Options are:
+        - 'mean': Average of S1 and S2 (default).
+        - 'median': Median of S1 and S2.
+        - 's1': Take S1 measurements.
+        - 's2': Take S2 measurements.
+        - 'min': Minimum of S1 and S2.
+        - 'max': Maximum of S1 and S2.
+    max_workers : int, optional
+        Maximum number of concurrent downloads and uploads from and to REDCap. Default is 4.
+    output_format : str, optional
+        Format of the saved files, see preprocess_WRIC_file(). Default is "csv".
+    cache_dir : str or None, optional
+        Directory of the cache for processed recordings, see preprocess_WRIC_file(). Default is None (no cache).
+    profile : bool, callable or None, optional
+        Profiles the stages of each record, see preprocess_WRIC_file(). True logs a report aggregated over all
+        records at the end; a StageProfiler collects the records for your own report(). Default is None.
+    workers : int, optional
+        Number of records processed at the same time. 1 (default) processes them in a background thread of this
+        process, more use worker processes (the results are sent back to this process).
+    queue_size : int, optional
+        Number of downloaded records that may wait for a free worker. Downloads pause when the queue is full,
+        so at most `max_workers + workers + queue_size` exported files are in memory at once. Default is 2.
+    upload_fieldnames : list of str or None, optional
+        Field names to upload the processed data files of Room 1 and Room 2 to, on the same record. Needs
+        `save_csv` and a file per subject (not "sqlite"). Nothing is uploaded if None (default).
+    cancel : threading.Event or None, optional
+        Set this event (e.g. from another thread) to stop the batch: no new records are downloaded or processed,
+        records that are processed or uploaded at that moment are finished. Interrupting with Ctrl+C does the same
+        and raises KeyboardInterrupt afterwards.
+    return_summary : bool, optional
+        If True, also returns the summary of all records. Default is False.
+    qc : str or None, optional
+        Quality control of the sensors of each record, see preprocess_WRIC_file(). Default is None.
+
+    Returns:
+    -------
+    dict or tuple
+        A dictionary where each key is a record ID and each value is a tuple containing:
+        (R1_metadata, R2_metadata, df_room1, df_room2) for each record, in the order of the CSV file.
+        Records that could not be exported or processed are left out and reported in the terminal.
+        If `return_summary`, a tuple (dictionary, summary), where the summary has one row per record with
+        'record_id', 'status' ("ok", "error" or "cancelled"), 'stage' ("export", "process" or "upload" for errors),
+        'error' (message) and 'export_s', 'process_s' and 'upload_s' (seconds).
+
+    Raises:
+    ------
+    ValueError
+        If `upload_fieldnames` is given without saving a file per subject.
+
+    Notes:
+    ------
+    - Requires a valid API access token configured in `config['api_token']` to interact with REDCap (see ReadMe)
+    - Ensure the CSV file contains valid record IDs in the first column.
+    - With several workers, call this function from within an `if __name__ == "__main__":` block of your script on Windows.
+    """
+
+    record_ids = []
+    with open(csv_file, mode='r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        for row in reader:
+            # Assuming the record IDs are in the first column
+            record_ids.append(str(row[0])) 
+    record_ids = list(dict.fromkeys(record_ids))
+    if upload_fieldnames is not None and (not save_csv or output_format == "sqlite"):
+        raise ValueError("Uploading the results needs the processed files: use save_csv=True and a file format (not sqlite).")
+
+    kwargs = dict(code=code, manual=manual, save_csv=save_csv, path_to_save=path_to_save, combine=combine, method=method, start=start, end=end,
+                  output_format=output_format, cache_dir=cache_dir, profile=bool(profile), qc=qc)
+    profiler = StageProfiler() if profile is True else profile
+    cancel = threading.Event() if cancel is None else cancel
+    summary = {record_id: dict(record_id=record_id, status="cancelled", stage=None, error=None, export_s=None, process_s=None, upload_s=None)
+               for record_id in record_ids}
+    dataframes = {}
+
+    # The records flow from the downloads to the workers to the uploads; every finished step puts an event into the queue,
+    # which is handled here (in one thread) by starting the next step. Records count as active from the start of the
+    # download to the end of the processing, which limits the downloads that run ahead of the processing (backpressure).
+    events = queue.Queue()
+    pending = collections.deque(record_ids)
+    futures = {}
+    active_limit = max_workers + workers + queue_size
+    active = 0
+
+    def submit(executor, stage, record_id, func, *args):
+        try:
+            future = executor.submit(timed_call, func, *args)
+        except Exception as e:  # e.g. a worker process that died, reported as error of the record
+            future = concurrent.futures.Future()
+            future.set_exception(e)
+        futures[(stage, record_id)] = future
+        future.add_done_callback(lambda future: events.put((stage, record_id, future)))
+
+    def fail(record_id, stage, error):
+        summary[record_id].update(status="error", stage=stage, error=f"{type(error).__name__}: {error}")
+
+    if workers <= 1:
+        processing = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    else:
+        processing = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    with RedcapClient(max_workers=max_workers) as client, concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as transfers, processing:
+        try:
+            while True:
+                while pending and active < active_limit and not cancel.is_set():
+                    record_id = pending.popleft()
+                    active += 1
+                    submit(transfers, "export", record_id, client.export_file, record_id, fieldname)
+                if not futures:
+                    break
+                stage, record_id, future = events.get()
+                del futures[(stage, record_id)]
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    if stage != "upload":
+                        active -= 1
+                    if not future.cancelled():
+                        fail(record_id, stage, e)
+                    continue
+                summary[record_id][f"{stage}_s"] = seconds
+
+                if stage == "export":
+                    if cancel.is_set():
+                        active -= 1
+                        continue
+                    # the exported content is parsed directly from memory, nothing is written to disk
+                    submit(processing, "process", record_id, process_record, result, kwargs)
+                elif stage == "process":
+                    active -= 1
+                    dataframes[record_id], filepaths, stages = result
+                    summary[record_id]["status"] = "ok"
+                    for record in stages if profiler else []:
+                        profiler(dict(record, file=record_id))  # name the stages by the record ID instead of "<data>"
+                    if upload_fieldnames is not None and not cancel.is_set():
+                        summary[record_id]["status"] = "cancelled"  # until the upload finished
+                        submit(transfers, "upload", record_id, upload_record, client, filepaths, record_id, upload_fieldnames)
+                else:
+                    summary[record_id]["status"] = "ok"
+
+                if cancel.is_set():
+                    for future in futures.values():
+                        future.cancel()  # only the steps that did not start yet
+        except BaseException:
+            # e.g. Ctrl+C: stop starting new steps, wait for the running ones (leaving the executors) and raise
+            cancel.set()
+            for future in futures.values():
+                future.cancel()
+            raise
+
+    summary = pd.DataFrame(list(summary.values()))
+    failed = summary[summary["status"] != "ok"]
+    logger.info(f"Processed {len(summary)} records: {(summary['status'] == 'ok').sum()} succeeded, {(summary['status'] == 'error').sum()} failed, "
+                f"{(summary['status'] == 'cancelled').sum()} cancelled.")
+    for _, row in failed[failed["status"] == "error"].iterrows():
+        logger.warning(f"  Record {row['record_id']} ({row['stage']}): {row['error']}")
+
+    if profile is True:
+        logger.info(f"Time per stage:\n{profiler.report().to_string(index=False)}")
+    dataframes = {record_id: dataframes[record_id] for record_id in record_ids if record_id in dataframes}
+    return (dataframes, summary) if return_summary else dataframes
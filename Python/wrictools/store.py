@@ -0,0 +1,422 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from .analysis import default_reducer, is_energy_rate, protocol_dict, row_minutes
+from .io import output_path
+
+# This file includes the study store: an SQLite database with the processed data, metadata and protocol segments of
+# all recordings of a study (output_format="sqlite"). The data is indexed on code, datetime and protocol,
+# so protocol windows, segments and aggregates of the whole cohort are computed by SQLite and only the matching rows are read.
+
+# Format of the datetimes in the store (as text, compared and sorted as strings and understood by the SQLite date functions)
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Columns of each table in front of the columns of the saved DataFrames
+KEY_COLUMNS = {
+    "data": ["code", "subject", "visit", "row", "minutes"],
+    "metadata": ["code", "subject", "visit"],
+    "segments": ["code", "subject", "visit"],
+    "qc": ["code", "subject", "visit"],
+}
+# SQL aggregate of each reducer (see default_reducer()); TOTAL() is 0 for only missing values, like the pandas sum
+SQL_REDUCERS = {"sum": "TOTAL", "mean": "AVG", "min": "MIN", "max": "MAX", "count": "COUNT"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS WRIC_recordings (code TEXT PRIMARY KEY, subject TEXT, visit TEXT, room INTEGER, rows INTEGER);
+CREATE TABLE IF NOT EXISTS WRIC_data (code TEXT, subject TEXT, visit TEXT, row INTEGER, minutes REAL, datetime TEXT, protocol INTEGER);
+CREATE INDEX IF NOT EXISTS WRIC_data_code_datetime ON WRIC_data (code, datetime);
+CREATE INDEX IF NOT EXISTS WRIC_data_protocol ON WRIC_data (protocol);
+CREATE TABLE IF NOT EXISTS WRIC_metadata (code TEXT, subject TEXT, visit TEXT);
+CREATE TABLE IF NOT EXISTS WRIC_segments (code TEXT, subject TEXT, visit TEXT, room INTEGER, protocol INTEGER, occurrence INTEGER,
+                                          start TEXT, "end" TEXT, row_start INTEGER, row_stop INTEGER);
+CREATE INDEX IF NOT EXISTS WRIC_segments_protocol ON WRIC_segments (protocol, occurrence);
+CREATE TABLE IF NOT EXISTS WRIC_qc (code TEXT, subject TEXT, visit TEXT, room INTEGER, channel TEXT, "check" TEXT, row_start INTEGER,
+                                    row_stop INTEGER, start TEXT, "end" TEXT, n_rows INTEGER, value REAL);
+CREATE INDEX IF NOT EXISTS WRIC_qc_code ON WRIC_qc (code);
+"""
+
+def store_path(path_to_save):
+    """
+    Returns the path of the study store in a folder (the current directory if None), see STORE_FILENAME.
+    """
+    return output_path(None, "data", path_to_save, "sqlite")
+
+def split_code(code):
+    """
+    Helper Function that splits a subject code at the first "_" into subject and visit, e.g. "1234_visit1" into
+    ("1234", "visit1"), as in summarize_protocols(). The visit is None if the code has no "_". Not intended for modular use.
+    """
+    subject, _, visit = str(code).partition("_")
+    return subject, visit or None
+
+def quote(name):
+    """
+    Helper Function that quotes a column name for SQL, e.g. 'Energy Expenditure (kcal/min)'. Not intended for modular use.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+def sql_type(dtype):
+    """
+    Helper Function that returns the SQLite column type of a pandas dtype. Not intended for modular use.
+    """
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+def sql_values(values):
+    """
+    Helper Function that converts a column to a list of Python values SQLite can store: datetimes as text
+    (see DATETIME_FORMAT) and missing values as None. Not intended for modular use.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.dt.strftime(DATETIME_FORMAT)
+    elif pd.api.types.is_float_dtype(values) or pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.tolist()  # NaN is stored as NULL
+    return values.astype(object).where(values.notna(), None).tolist()
+
+def parse_store_dates(df):
+    """
+    Helper Function that parses the datetime columns of a query result. Not intended for modular use.
+    """
+    for col in ("datetime", "start", "end"):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+class StudyStore:
+    """
+    Processed recordings of a study in one SQLite database, written by preprocess_WRIC_file() and the other
+    preprocessing functions with output_format="sqlite" (see save_output()) and queried with SQL.
+
+    The tables are 'WRIC_data' (one row per processed row with 'code', 'subject', 'visit', 'row' (position in the
+    recording), 'minutes' (the time the row stands for, see row_minutes()) and the columns of the processed data), 'WRIC_metadata', 'WRIC_segments' (see protocol_segments()),
+    'WRIC_qc' (the intervals flagged by sensor_qc()) and 'WRIC_recordings' (one row per code with its 'room' and number of 'rows'). Datetimes are saved as text
+    (e.g. "2023-11-13 21:14:22"). The rows of a recording are found by its code; the code is also split at the first "_"
+    into subject and visit (e.g. "1234_visit1") to filter by them, so codes like "A" and "A_" are saved separately.
+
+    Parameters:
+    ----------
+    path : str
+        Path to the database file (created if it does not exist), e.g. store_path("./processed").
+    timeout : float, optional
+        Seconds to wait for other processes that write to the store at the same time. Default is 60.
+
+    Examples:
+    --------
+    >>> wric.preprocess_WRIC_folder("./raw", path_to_save="./processed", output_format="sqlite")
+    >>> with wric.StudyStore(wric.store_path("./processed")) as store:
+    ...     windows = store.get_windows("sleep", add_start=30, columns=["VO2", "VCO2"])
+    ...     summary = store.summarize_segments(protocols=["sleep", "eat"])
+    """
+    def __init__(self, path, timeout=60):
+        self.path = path
+        # transactions are started explicitly (see write()), so that concurrent writers wait for each other
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes the connection to the database."""
+        self.connection.close()
+
+    def columns(self, table):
+        """
+        Returns the column names of a table of the store, e.g. "WRIC_data".
+        """
+        return [row[1] for row in self.connection.execute(f"PRAGMA table_info({quote(table)})")]
+
+    def write(self, df, code, kind, first_row=None):
+        """
+        Saves the data, metadata, segments or QC intervals of one subject, replacing what was saved for the code before.
+        Columns that are not in the store yet are added.
+
+        Parameters:
+        ----------
+        df : pd.DataFrame
+            The data, metadata, segments or QC intervals to save.
+        code : str
+            Code of the subject.
+        kind : str
+            "data", "metadata", "segments" or "qc".
+        first_row : int or None, optional
+            Appends the rows of a chunk of the data instead of replacing it, numbered from `first_row` (see OutputStream).
+            Replaces the data if None (default).
+
+        Raises:
+        ------
+        ValueError
+            If `kind` is not "data", "metadata", "segments" or "qc".
+        """
+        if kind not in KEY_COLUMNS:
+            raise ValueError(f"Can not save '{kind}' in the study store. Use data, metadata, segments or qc.")
+        table = f"WRIC_{kind}"
+        code = str(code)
+        subject, visit = split_code(code)
+        columns = [col for col in df.columns if col not in KEY_COLUMNS[kind]]
+        keys = {"code": [code] * len(df), "subject": [subject] * len(df), "visit": [visit] * len(df)}
+        if kind == "data":
+            keys["row"] = np.arange(len(df)) + (first_row or 0)
+            keys["minutes"] = self.row_minutes(df, code, first_row)
+        values = list(keys.values()) + [sql_values(df[col]) for col in columns]
+        placeholders = ", ".join("?" * len(values))
+        names = ", ".join(quote(col) for col in list(keys) + columns)
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            existing = set(self.columns(table))
+            if kind == "data" and "minutes" not in existing:  # a store written by an older version
+                self.connection.execute(f"ALTER TABLE {table} ADD COLUMN minutes REAL")
+            for col in columns:
+                if col not in existing:
+                    self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {quote(col)} {sql_type(df[col].dtype)}")
+            if first_row is None:
+                self.connection.execute(f"DELETE FROM {table} WHERE code = ?", (code,))
+            self.connection.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})",
+                                        zip(*(v.tolist() if isinstance(v, np.ndarray) else v for v in values)))
+            if kind == "data":
+                rows = len(df) + (first_row or 0)
+                self.connection.execute("INSERT INTO WRIC_recordings (code, subject, visit, rows) VALUES (?, ?, ?, ?) "
+                                        "ON CONFLICT (code) DO UPDATE SET rows = excluded.rows", (code, subject, visit, rows))
+            elif kind == "segments" and len(df) and "room" in df.columns and not pd.isna(df["room"].iloc[0]):
+                self.connection.execute("INSERT INTO WRIC_recordings (code, subject, visit, room) VALUES (?, ?, ?, ?) "
+                                        "ON CONFLICT (code) DO UPDATE SET room = excluded.room", (code, subject, visit, int(df["room"].iloc[0])))
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def row_minutes(self, df, code, first_row=None):
+        """
+        Helper Method that returns the minutes of the rows of the data (see row_minutes()). The first row of an appended
+        chunk stands for the time since the latest row saved for the code. Not intended for modular use.
+        """
+        datetimes = pd.to_datetime(df["datetime"]) if "datetime" in df.columns else pd.Series(pd.NaT, index=df.index)
+        previous = None
+        if first_row:
+            previous = self.connection.execute("SELECT MAX(datetime) FROM WRIC_data WHERE code = ?", (code,)).fetchone()[0]
+        if previous is None:
+            return row_minutes(datetimes).tolist()
+        return row_minutes(pd.concat([pd.Series([pd.to_datetime(previous)]), datetimes], ignore_index=True))[1:].tolist()
+
+    def has(self, code, kind):
+        """
+        Returns whether the data, metadata, segments or QC intervals ("data", "metadata", "segments" or "qc") of a code are saved.
+        """
+        return self.connection.execute(f"SELECT 1 FROM WRIC_{kind} WHERE code = ? LIMIT 1", (str(code),)).fetchone() is not None
+
+    def query(self, sql, params=()):
+        """
+        Runs an SQL query on the store, e.g. store.query('SELECT subject, AVG(VO2) FROM WRIC_data WHERE protocol = ? GROUP BY subject', [1]).
+
+        Returns:
+        -------
+        pd.DataFrame
+            The result, with the columns 'datetime', 'start' and 'end' parsed as datetime64.
+        """
+        return parse_store_dates(pd.read_sql_query(sql, self.connection, params=params))
+
+    def recordings(self):
+        """
+        Returns the saved recordings: one row per code with 'code', 'subject', 'visit', 'room' and 'rows'.
+        """
+        return self.query("SELECT code, subject, visit, room, rows FROM WRIC_recordings ORDER BY code")
+
+    def read_data(self, codes=None, subjects=None, visits=None, start=None, end=None, protocols=None, columns=None):
+        """
+        Reads the processed data of the recordings and time range that match all given filters.
+
+        Parameters:
+        ----------
+        codes, subjects, visits : list of str or None, optional
+            Only read these codes, subjects or visits. All if None.
+        start, end : str or datetime-like or None, optional
+            Only read the rows from `start` to `end` (both included).
+        protocols : list of str or None, optional
+            Only read the rows with these protocols of protocol_dict (e.g. ["sleep"]).
+        columns : list of str or None, optional
+            Only read these columns of the data ('code', 'datetime' and 'protocol' are always read). All if None.
+
+        Returns:
+        -------
+        pd.DataFrame
+            The matching rows with a 'code' column, sorted by code and time.
+        """
+        conditions, params = [], []
+        for name, values in [("code", codes), ("subject", subjects), ("visit", visits)]:
+            if values is not None:
+                conditions.append(f"r.{name} IN ({', '.join('?' * len(values))})")
+                params += [str(value) for value in values]
+        if protocols is not None:
+            conditions.append(f"d.protocol IN ({', '.join('?' * len(protocols))})")
+            params += [protocol_dict[protocol] for protocol in protocols]
+        if not pd.isna(start):
+            conditions.append("d.datetime >= ?")
+            params.append(pd.to_datetime(start).strftime(DATETIME_FORMAT))
+        if not pd.isna(end):
+            conditions.append("d.datetime <= ?")
+            params.append(pd.to_datetime(end).strftime(DATETIME_FORMAT))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # the recordings are looked up first, the rows of each recording (and time range) are then found with the index of the data
+        df = self.query(f"""SELECT {self.select_columns(columns)} FROM WRIC_recordings r JOIN WRIC_data d
+                            ON d.code = r.code {where} ORDER BY d.code, d.row""", params)
+        return df.drop(columns="row")
+
+    def select_columns(self, columns, table="d"):
+        """
+        Helper Method that returns the SQL column list of the data: 'code', 'row', 'datetime', 'protocol' and `columns`
+        (all columns of the processed data if None). Not intended for modular use.
+        """
+        if columns is None:
+            columns = [col for col in self.columns("WRIC_data") if col not in KEY_COLUMNS["data"]]
+        columns = ["code", "row", "datetime", "protocol"] + [col for col in columns if col not in ("code", "row", "datetime", "protocol")]
+        return ", ".join(f"{table}.{quote(col)}" for col in columns)
+
+    def segments(self, codes=None, protocols=None):
+        """
+        Reads the protocol segments (see protocol_segments()) of the saved recordings.
+
+        Parameters:
+        ----------
+        codes : list of str or None, optional
+            Only read the segments of these codes. All if None.
+        protocols : list of str or None, optional
+            Only read the segments of these protocols of protocol_dict (e.g. ["sleep", "eat"]). All if None.
+
+        Returns:
+        -------
+        pd.DataFrame
+            One row per segment with 'code', 'subject', 'visit' and the columns of protocol_segments().
+        """
+        conditions, params = [], []
+        if codes is not None:
+            conditions.append(f"code IN ({', '.join('?' * len(codes))})")
+            params += [str(code) for code in codes]
+        if protocols is not None:
+            conditions.append(f"protocol IN ({', '.join('?' * len(protocols))})")
+            params += [protocol_dict[protocol] for protocol in protocols]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.query(f"SELECT * FROM WRIC_segments {where} ORDER BY code, row_start", params)
+
+    def qc(self, codes=None, checks=None):
+        """
+        Reads the intervals flagged by the quality control (see sensor_qc()) of the saved recordings.
+
+        Parameters:
+        ----------
+        codes : list of str or None, optional
+            Only read the intervals of these codes. All if None.
+        checks : list of str or None, optional
+            Only read the intervals of these checks (see QC_CHECKS), e.g. ["flatline", "gap"]. All if None.
+
+        Returns:
+        -------
+        pd.DataFrame
+            One row per interval with 'code', 'subject', 'visit' and the columns of sensor_qc().
+        """
+        conditions, params = [], []
+        if codes is not None:
+            conditions.append(f"code IN ({', '.join('?' * len(codes))})")
+            params += [str(code) for code in codes]
+        if checks is not None:
+            conditions.append(f"\"check\" IN ({', '.join('?' * len(checks))})")
+            params += list(checks)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.query(f"SELECT * FROM WRIC_qc {where} ORDER BY code, \"check\", channel, row_start", params)
+
+    def get_windows(self, protocol, occurence=1, add_start=0, add_end=0, codes=None, columns=None):
+        """
+        Returns the rows of the n-th occurence of a protocol of all (selected) recordings, optionally extended by
+        some minutes before and after, as tmp_func_name() does for a folder of files. Only the rows of the windows
+        are read from the store.
+
+        Parameters:
+        ----------
+        protocol : str
+            One of the protocols in protocol_dict, e.g. "sleep".
+        occurence : int, optional
+            Which occurence of the protocol, counting from 1. Default is 1.
+        add_start, add_end : float, optional
+            Minutes to add before the start and after the end. Default is 0.
+        codes : list of str or None, optional
+            Only these codes. All recordings if None.
+        columns : list of str or None, optional
+            Only read these columns of the data ('code', 'datetime' and 'protocol' are always read). All if None.
+
+        Returns:
+        -------
+        pd.DataFrame
+            The rows of the windows with a 'code' column, sorted by code and time, with 'relative_time[min]' counted
+            from the start of each window. Recordings without the occurence of the protocol are not included.
+        """
+        conditions, params = ["s.protocol = ?", "s.occurrence = ?"], [f"{-add_start:+} minutes", f"{add_end:+} minutes", protocol_dict[protocol], occurence]
+        if codes is not None:
+            conditions.append(f"s.code IN ({', '.join('?' * len(codes))})")
+            params += [str(code) for code in codes]
+        df = self.query(f"""SELECT {self.select_columns(columns)} FROM WRIC_segments s JOIN WRIC_data d
+                            ON d.code = s.code AND d.datetime BETWEEN datetime(s.start, ?) AND datetime(s."end", ?)
+                            WHERE {' AND '.join(conditions)} ORDER BY d.code, d.row""", params)
+        df = df.drop(columns="row")
+        if "relative_time[min]" in df.columns:
+            df["relative_time[min]"] = (df["datetime"] - df.groupby("code")["datetime"].transform("first")).dt.total_seconds() / 60
+        return df
+
+    def summarize_segments(self, protocols=None, columns=None, reducers=None):
+        """
+        Aggregates every protocol segment of all saved recordings in one SQL query: one row per
+        (code, protocol, occurrence) with the time range and the aggregated parameters, as summarize_protocols()
+        does for a folder of files.
+
+        Parameters:
+        ----------
+        protocols : list of str or None, optional
+            Only these protocols of protocol_dict (e.g. ["sleep", "eat"]). All protocols if None.
+        columns : list of str or None, optional
+            Parameters to aggregate. All measurement columns of the data if None.
+        reducers : dict or None, optional
+            Aggregation per parameter ("sum", "mean", "min", "max" or "count"), e.g. {"VO2": "max"}. Parameters not given
+            use default_reducer() (sum for energy expenditure and Activity Monitor, mean for all others). Summed energy
+            expenditure is weighted by the minutes of each row, as in summarize_protocols().
+
+        Returns:
+        -------
+        pd.DataFrame
+            Columns 'code', 'subject', 'visit', 'room', 'protocol', 'protocol_name', 'occurrence', 'start' and 'end'
+            (first and last datetime), 'n_rows', 'minutes' (the time the rows stand for) and one column per parameter.
+
+        Raises:
+        ------
+        ValueError
+            If a reducer is not supported.
+        """
+        if columns is None:
+            columns = [col for col in self.columns("WRIC_data")
+                       if col not in KEY_COLUMNS["data"] + ["datetime", "relative_time[min]", "protocol"]]
+        reducers = {col: (reducers or {}).get(col, default_reducer(col)) for col in columns}
+        unsupported = sorted({reducer for reducer in reducers.values() if reducer not in SQL_REDUCERS})
+        if unsupported:
+            raise ValueError(f"Reducer {', '.join(unsupported)} is not supported in the study store. Use {', '.join(SQL_REDUCERS)}.")
+        # rows saved by an older version without their minutes stand for one minute each
+        minutes = "COALESCE(d.minutes, 1)"
+        values = {col: f"d.{quote(col)} * {minutes}" if reducer == "sum" and is_energy_rate(col) else f"d.{quote(col)}" for col, reducer in reducers.items()}
+        aggregates = "".join(f", {SQL_REDUCERS[reducer]}({values[col]}) AS {quote(col)}" for col, reducer in reducers.items())
+        where, params = "", []
+        if protocols is not None:
+            where = f"WHERE s.protocol IN ({', '.join('?' * len(protocols))})"
+            params = [protocol_dict[protocol] for protocol in protocols]
+        # the datetimes narrow the rows down with the index, the rows of the segment make it exact
+        summary = self.query(f"""SELECT s.code, s.subject, s.visit, s.room, s.protocol, s.occurrence, MIN(d.datetime) AS start,
+                                 MAX(d.datetime) AS "end", COUNT(*) AS n_rows, TOTAL({minutes}) AS minutes{aggregates}
+                                 FROM WRIC_segments s JOIN WRIC_data d
+                                 ON d.code = s.code AND d.datetime BETWEEN s.start AND s."end"
+                                 AND d.row >= s.row_start AND d.row < s.row_stop
+                                 {where} GROUP BY s.code, s.row_start ORDER BY s.code, s.row_start""", params)
+        protocol_names = {num: name for name, num in protocol_dict.items()}
+        summary.insert(5, "protocol_name", summary["protocol"].map(protocol_names))
+        return summary
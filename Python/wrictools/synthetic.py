@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+import os
+
+# This file creates synthetic OmniCal exports and note files, e.g. to test or benchmark the preprocessing with long stays.
+# The data is random (but physiologically plausible) and should not be used for actual analysis!
+
+# Column names of one Room&Set block as written by OmniCal (kJ and kcal are swapped in the export, see WRIC_COLUMNS)
+OMNICAL_HEADER = [
+    "Date (mm/dd/yy)", "Time (HH:MM:SS)", "VO2 (mL/min)", "VCO2 (mL/min)", "RER", "FiO2 (vol%)", "FeO2 (vol%)",
+    "FiCO2 (vol%)", "FeCO2 (vol%)", "Flow (sL/min)", "Activity monitor (counts)", "Energy Expenditure (kJ/min)",
+    "Energy Expenditure (kcal/min)", "Pressure Ambient (mbar)", "Temperature (degC)", "Relative Humidity (%)"
+]
+
+def generate_wric_file(filepath, days=1, interval=60, start="2023-11-13 08:00:00", subject_ids=None, comments=None, seed=0, rooms=2):
+    """
+    Writes a synthetic OmniCal export (as read by preprocess_WRIC_file()) for two (or more) rooms with two sets each.
+
+    Parameters:
+    ----------
+    filepath : str
+        Path of the .txt file to write.
+    days : float, optional
+        Length of the recording in days (e.g. 1 to 14). Default is 1.
+    interval : int, optional
+        Sampling interval in seconds. Default is 60 (the 1-minute export).
+    start : str, optional
+        Datetime of the first row. Default is "2023-11-13 08:00:00".
+    subject_ids, comments : tuple of str or None, optional
+        "Subject ID" and "Comments" of each room in the header. Default is ("XXXX", "YYYY", "ID3", ...) and "Visit 1".
+    seed : int, optional
+        Seed of the random numbers, the same seed writes the same file. Default is 0.
+    rooms : int, optional
+        Number of rooms, e.g. 4 for a facility with more chambers (see preprocess_WRIC_rooms()). Default is 2.
+
+    Returns:
+    -------
+    pd.DatetimeIndex
+        Datetimes of the rows.
+    """
+    rng = np.random.default_rng(seed)
+    datetimes = pd.date_range(start, periods=int(days * 86400 / interval), freq=f"{interval}s")
+    n = len(datetimes)
+    hours = (datetimes.hour + datetimes.minute / 60).to_numpy()
+    asleep = (hours >= 23) | (hours < 7)
+
+    subject_ids = (["XXXX", "YYYY"] + [f"ID{room}" for room in range(3, rooms + 1)])[:rooms] if subject_ids is None else subject_ids
+    comments = ["Visit 1"] * rooms if comments is None else comments
+    layout = [(set_num, room) for set_num in (1, 2) for room in range(1, rooms + 1)]
+
+    blocks = []
+    for _, room in layout:
+        # a daily rhythm with lower VO2 during the night, short bouts of activity and measurement noise
+        room_rng = np.random.default_rng(seed * 4 + room - 1)
+        activity = np.where(asleep, 0, room_rng.poisson(0.05, n) * room_rng.integers(5, 60, n)).astype(float)
+        vo2 = np.where(asleep, 230.0, 300.0) + 4 * activity + room_rng.normal(0, 15, n) + rng.normal(0, 5, n)
+        rer = np.clip(0.85 + 0.05 * np.sin(2 * np.pi * hours / 24) + room_rng.normal(0, 0.02, n), 0.7, 1.1)
+        vco2 = rer * vo2
+        kcal = (3.941 * vo2 + 1.106 * vco2) / 1000
+        flow = 200 + rng.normal(0, 5, n)
+        fio2 = 20.93 + rng.normal(0, 0.01, n)
+        fico2 = 0.04 + rng.normal(0, 0.002, n)
+        blocks.append(pd.DataFrame({
+            "Date": datetimes.strftime("%m/%d/%y"),
+            "Time": datetimes.strftime("%H:%M:%S"),
+            "VO2": vo2,
+            "VCO2": vco2,
+            "RER": rer,
+            "FiO2": fio2,
+            "FeO2": fio2 - vo2 / flow / 10,
+            "FiCO2": fico2,
+            "FeCO2": fico2 + vco2 / flow / 10,
+            "Flow": flow,
+            "Activity Monitor": activity,
+            "Energy Expenditure (kcal/min)": kcal,
+            "Energy Expenditure (kJ/min)": kcal * 4.184,
+            "Pressure Ambient": 1013 + rng.normal(0, 2, n),
+            "Temperature": 21 + rng.normal(0, 0.3, n),
+            "Relative Humidity": 50 + rng.normal(0, 2, n),
+            "": "",  # empty separator column after each block
+        }))
+    data = pd.concat(blocks, axis=1).iloc[:, :-1]
+
+    stamp = datetimes[0].strftime("%Y%m%d%H%M")
+    with open(filepath, "w", newline="") as file:
+        file.write("OmniCal software by ing.P.F.M.Schoffelen, Dept. of Human Biology, Maastricht University\n")
+        file.write(f"file identifier is C:\\MI_Room_Calorimeter\\Results_online\\1_minute\\Results_1m_0101_{stamp}.txt\t\n")
+        file.write("\t\n")
+        for room in range(rooms):
+            file.write(f"Room {room + 1}\tProject\tSubject ID\tExperiment performed by\tComments\n")
+            file.write(f"\tPROJECT\t{subject_ids[room]}\tJANE DOE\t{comments[room]}\n")
+        file.write("\n")
+        file.write("\t".join(f"Room {room} Set {set_num}" + "\t" * 16 for set_num, room in layout).rstrip("\t") + "\n")
+        file.write("\t\t".join("\t".join(OMNICAL_HEADER) for _ in layout) + "\n")
+        data.to_csv(file, sep="\t", header=False, index=False, float_format="%.6f", lineterminator="\n")
+    return datetimes
+
+def generate_note_file(filepath, datetimes, notes_per_day=4, drift=None, seed=0, rooms=2):
+    """
+    Writes a synthetic note file for a recording: entering the chamber, sleeping, waking up, resting energy expenditure
+    measurements, meals and exercise of all participants every day, additional free-text notes and leaving the chamber.
+
+    Parameters:
+    ----------
+    filepath : str
+        Path of the .txt file to write.
+    datetimes : pd.DatetimeIndex
+        Datetimes of the recording (see generate_wric_file()).
+    notes_per_day : int, optional
+        Number of additional free-text notes (without protocol) per day. Default is 4.
+    drift : str or None, optional
+        Time of the clock of the data acquisition (e.g. "08:01:21"), written as first note. No drift note if None.
+    seed : int, optional
+        Seed of the random numbers. Default is 0.
+    rooms : int, optional
+        Number of rooms (participants). Default is 2.
+
+    Returns:
+    -------
+    pd.DataFrame
+        The written notes with the columns 'datetime' and 'Comment'.
+    """
+    rng = np.random.default_rng(seed)
+    first, last = datetimes[0], datetimes[-1]
+    notes = [(first + pd.Timedelta(minutes=10), "Begge deltagere ind i kammer")]
+    schedule = [
+        ("07:00", "{p} deltager vaagen"), ("07:10", "{p} start REE"), ("07:40", "{p} stop REE"),
+        ("08:15", "{p} start maaltid"), ("08:35", "{p} faerdig {time}"), ("10:20", "{p} start step"),
+        ("10:45", "{p} stop step"), ("12:30", "{p} start frokost"), ("12:55", "{p} faerdig maaltid"),
+        ("18:00", "{p} start aftensmad"), ("18:30", "{p} slut maaltid"), ("23:00", "{p} deltager i seng"),
+    ]
+    for day in pd.date_range(first.normalize(), last.normalize(), freq="D"):
+        for participant in range(1, rooms + 1):
+            for clock, comment in schedule:
+                time = day + pd.Timedelta(clock + ":00") + pd.Timedelta(minutes=int(rng.integers(0, 8)))
+                # the note is often written a few minutes later, with the actual time in the text
+                notes.append((time + pd.Timedelta(minutes=int(rng.integers(0, 3))), comment.format(p=participant, time=time.strftime("%H:%M"))))
+        for minute in rng.integers(0, 24 * 60, notes_per_day):
+            notes.append((day + pd.Timedelta(minutes=int(minute), seconds=int(rng.integers(0, 60))), f"{rng.integers(1, rooms + 1)} urin"))
+    notes = [(time, comment) for time, comment in notes if first + pd.Timedelta(minutes=10) <= time <= last - pd.Timedelta(minutes=20)]
+    notes += [(last - pd.Timedelta(minutes=10 + 5 * (rooms - room) / max(rooms - 1, 1)), f"{room} {'ud' if room % 2 else 'exit'}") for room in range(1, rooms + 1)]
+
+    df_note = pd.DataFrame(notes, columns=["datetime", "Comment"]).sort_values("datetime", kind="stable").reset_index(drop=True)
+    with open(filepath, "w", newline="") as file:
+        file.write("OmniCal software by ing.P.F.M.Schoffelen, Dept. of Human Biology, Maastricht University\n")
+        file.write(f"file identifier is C:\\MI_Room_Calorimeter\\Notes\\{os.path.basename(filepath)}\t\n")
+        file.write("Date\tTime\tComment\n")
+        file.write("\n")
+        if drift is not None:
+            file.write(f"{first.strftime('%m/%d/%y')}\t{first.strftime('%H:%M:%S')}\t{drift}\n")
+        for row in df_note.itertuples(index=False):
+            file.write(f"{row.datetime.strftime('%m/%d/%y')}\t{row.datetime.strftime('%H:%M:%S')}\t{row.Comment}\n")
+    return df_note
+
+def generate_recording(folder_path, days=1, interval=60, notes_per_day=4, start="2023-11-13 08:00:00", seed=0, rooms=2):
+    """
+    Writes a synthetic data file and the matching note file, named as exported by OmniCal
+    (e.g. "Results_1m_0101_202311130800.txt" and "note_202311130800.txt", see pair_wric_files()).
+
+    Parameters:
+    ----------
+    folder_path : str
+        Folder to write the files to (created if it does not exist).
+    days, interval, start, seed, rooms :
+        See generate_wric_file().
+    notes_per_day : int, optional
+        See generate_note_file().
+
+    Returns:
+    -------
+    tuple
+        (filepath, notefilepath) of the written files.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    stamp = pd.Timestamp(start).strftime("%Y%m%d%H%M")
+    filepath = os.path.join(folder_path, f"Results_1m_0101_{stamp}.txt")
+    notefilepath = os.path.join(folder_path, f"note_{stamp}.txt")
+    datetimes = generate_wric_file(filepath, days, interval, start, seed=seed, rooms=rooms)
+    generate_note_file(notefilepath, datetimes, notes_per_day, seed=seed, rooms=rooms)
+    return filepath, notefilepath